@@ -0,0 +1,261 @@
+"""
+In-process admission control for CPU-heavy routes.
+
+Each route class has, per key (a user id, or for login the submitted
+username and client address):
+
+- a token bucket: a request costs `cost` tokens (pages of a statement,
+  megabytes of an image) out of `burst`, refilled at `rate` per second;
+- a concurrency cap `per_user` on that key's running requests.
+
+A class also caps how many of its requests run at once in the worker
+(`concurrency`). Requests over either cap wait in a per-key FIFO, and freed
+slots go round-robin across keys, so one client looping on uploads queues
+behind itself instead of in front of everyone else. A request is refused
+with 429 and Retry-After when its bucket is empty, its key already has
+`max_queue` requests waiting, or it waits longer than `max_wait` seconds.
+
+    async with admission("statement", current_user["id"], cost=pdf_pages(data)):
+        ...
+
+With `refund_on_success=True` only attempts that raise keep their tokens
+(login charges failed passwords, not every sign-in).
+
+Limits are per worker process. ADMISSION_ENABLED=0 turns every check off.
+Behind a reverse proxy, list its addresses in TRUSTED_PROXIES so the client
+address comes from X-Forwarded-For instead of the proxy's own.
+"""
+import asyncio
+import collections
+import logging
+import math
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+TRUSTED_PROXIES = {a.strip() for a in os.getenv("TRUSTED_PROXIES", "").split(",") if a.strip()}
+
+RouteLimits = collections.namedtuple("RouteLimits", "rate burst concurrency per_user max_queue max_wait")
+
+LIMITS = {
+    # parse-receipt; cost is megabytes of image
+    "ocr": RouteLimits(rate=0.5, burst=10, concurrency=2, per_user=1, max_queue=2, max_wait=15.0),
+    # parse-pdf; cost is statement pages
+    "statement": RouteLimits(rate=0.5, burst=30, concurrency=2, per_user=1, max_queue=2, max_wait=20.0),
+    # reports/pdf
+    "report": RouteLimits(rate=0.2, burst=5, concurrency=2, per_user=1, max_queue=2, max_wait=15.0),
+    # auth/login, keyed by username and client address; bcrypt is the cost
+    "login": RouteLimits(rate=0.2, burst=10, concurrency=4, per_user=2, max_queue=4, max_wait=5.0),
+}
+
+# Buckets that have refilled carry no state; drop them once a class tracks this many keys
+MAX_TRACKED_KEYS = 10_000
+
+logger = logging.getLogger("app.admission")
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """Takes `cost` tokens and returns 0, or returns the seconds until they would be available."""
+        self.refill(now)
+        cost = min(cost, self.burst)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def give_back(self, cost: float):
+        self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+class RouteClass:
+    def __init__(self, name: str, limits: RouteLimits):
+        self.name = name
+        self.limits = limits
+        self.buckets = {}
+        self.running = collections.Counter()
+        self.waiting = collections.OrderedDict()  # key -> deque of futures, in round-robin order
+        self.service_time = 1.0  # moving average of seconds a request holds a slot
+        self.metrics = collections.Counter()
+        self.wait_seconds = 0.0
+
+    def in_flight(self) -> int:
+        return sum(self.running.values())
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self.waiting.values())
+
+    def _bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= MAX_TRACKED_KEYS:
+                for k in [k for k, b in self.buckets.items() if b.tokens + (now - b.updated) * b.rate >= b.burst]:
+                    del self.buckets[k]
+            bucket = self.buckets[key] = TokenBucket(self.limits.rate, self.limits.burst, now)
+        return bucket
+
+    def _can_run(self, key: str) -> bool:
+        return self.in_flight() < self.limits.concurrency and self.running[key] < self.limits.per_user
+
+    def _queue_retry_after(self) -> float:
+        return self.service_time * (self.queued() + 1) / self.limits.concurrency
+
+    async def acquire(self, key: str, cost: float):
+        now = time.monotonic()
+        bucket = self._bucket(key, now)
+        wait = bucket.take(cost, now)
+        if wait:
+            self.metrics["rejected_rate"] += 1
+            raise Rejected("rate", wait)
+
+        # Nobody else waiting for this key means it may take a free slot directly
+        if key not in self.waiting and self._can_run(key):
+            self.running[key] += 1
+            self.metrics["admitted"] += 1
+            return
+
+        queue = self.waiting.get(key)
+        if queue is not None and len(queue) >= self.limits.max_queue:
+            bucket.give_back(cost)
+            self.metrics["rejected_queue"] += 1
+            raise Rejected("queue", self._queue_retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(key, collections.deque()).append(future)
+        self.metrics["queued"] += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.limits.max_wait)
+        except asyncio.TimeoutError:
+            self._forget(key, future)
+            bucket.give_back(cost)
+            self.metrics["rejected_timeout"] += 1
+            raise Rejected("timeout", self._queue_retry_after())
+        except asyncio.CancelledError:
+            # The client went away; hand the slot on if it had already been granted
+            if future.done() and not future.cancelled():
+                self.release(key)
+            else:
+                self._forget(key, future)
+            raise
+        self.wait_seconds += time.monotonic() - started
+        self.metrics["admitted"] += 1
+
+    def _forget(self, key: str, future):
+        queue = self.waiting.get(key)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self.waiting[key]
+
+    def refund(self, key: str, cost: float):
+        bucket = self.buckets.get(key)
+        if bucket is not None:
+            bucket.give_back(cost)
+
+    def release(self, key: str, held: float = None):
+        self.running[key] -= 1
+        if self.running[key] <= 0:
+            del self.running[key]
+        if held is not None:
+            self.service_time = 0.8 * self.service_time + 0.2 * held
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grants free slots to waiting keys in turn, one request per key per round."""
+        granted = True
+        while granted and self.in_flight() < self.limits.concurrency:
+            granted = False
+            for key in list(self.waiting):
+                if not self._can_run(key):
+                    continue
+                queue = self.waiting.pop(key)
+                future = queue.popleft()
+                if queue:
+                    self.waiting[key] = queue  # back of the round-robin order
+                self.running[key] += 1
+                future.set_result(None)
+                granted = True
+                break
+
+    def snapshot(self) -> dict:
+        return {
+            **self.limits._asdict(),
+            "in_flight": self.in_flight(),
+            "queued": self.queued(),
+            "waiting_keys": len(self.waiting),
+            "tracked_keys": len(self.buckets),
+            "avg_service_s": round(self.service_time, 3),
+            "total_wait_s": round(self.wait_seconds, 3),
+            **{name: self.metrics[name] for name in ("admitted", "queued", "rejected_rate", "rejected_queue", "rejected_timeout")},
+        }
+
+_classes = {name: RouteClass(name, limits) for name, limits in LIMITS.items()}
+
+@asynccontextmanager
+async def admission(route_class: str, key: str, cost: float = 1, refund_on_success: bool = False):
+    """Holds one of the class's slots for the body; raises HTTPException 429 when refused."""
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    limiter = _classes[route_class]
+    try:
+        await limiter.acquire(key, cost)
+    except Rejected as e:
+        logger.info("admission rejected", extra={"route_class": route_class, "reason": e.reason, "cost": cost})
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many {route_class} requests, retry later",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    started = time.monotonic()
+    try:
+        yield
+        if refund_on_success:
+            limiter.refund(key, cost)
+    finally:
+        limiter.release(key, time.monotonic() - started)
+
+def client_address(request) -> str:
+    """The caller's address: the peer's, or behind a TRUSTED_PROXIES proxy the nearest untrusted X-Forwarded-For hop."""
+    peer = request.client.host if request.client else "unknown"
+    if peer not in TRUSTED_PROXIES:
+        return peer
+    hops = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+    for hop in reversed(hops):
+        if hop not in TRUSTED_PROXIES:
+            return hop
+    return peer
+
+def admission_metrics() -> dict:
+    return {"enabled": ADMISSION_ENABLED, "classes": {name: c.snapshot() for name, c in _classes.items()}}
+
+def base64_megabytes(data: str) -> float:
+    """Decoded size of a base64 payload in MB, without decoding it."""
+    return len(data or "") * 3 / 4 / (1024 * 1024)
+
+def pdf_pages(pdf_base64: str) -> int:
+    """Page count from the page objects in a base64 PDF, falling back to one page per 100KB."""
+    import base64
+    try:
+        data = base64.b64decode(pdf_base64)
+    except Exception:
+        return 1
+    pages = len(re.findall(rb"/Type\s*/Page(?![a-zA-Z])", data))
+    return max(1, pages or math.ceil(len(data) / (100 * 1024)))
@@ -0,0 +1,241 @@
+"""
+Cold tier for old expenses.
+
+Expenses older than ARCHIVE_AFTER_DAYS are compacted into one document per
+(user, month) in `db.expense_archive`: each expense field is stored as a
+parallel array ("columns"), and the month's non-duplicate spend is
+pre-summed per (category, currency, day) in "totals" so summaries and
+budgets never expand the rows. Receipt images and OCR payloads move to
+`db.expense_blobs`, keyed by expense id.
+
+Read paths combine `db.expenses` with the helpers below. Archived months are
+usually older than the hot expenses, but not always (an expense can be
+created with an old date, or restored by an edit), so date-ordered listings
+merge both sides rather than appending the archive after the hot rows.
+
+    python -m app.archive_utils [--days N]   # archive every user's old months
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+from app.currency import BASE_CURRENCY, total_in
+from app.http_utils import bump_data_version
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
+# Expense fields kept in a bucket, one array each
+COLUMNS = (
+    "id", "amount", "date", "category", "currency", "vendor", "description", "platform", "payment_mode",
+    "tax_amount", "tax_type", "items", "line_items", "gst_details", "is_tax_deductible", "source",
+    "created_at", "duplicate_of", "duplicate_score",
+)
+# Large, rarely read fields that go to db.expense_blobs instead
+BLOB_FIELDS = ("receipt_image_base64", "original_ocr_data")
+
+def archive_cutoff(now: datetime = None, days: int = ARCHIVE_AFTER_DAYS) -> datetime:
+    """First day of the oldest month that stays hot; only whole months are archived."""
+    edge = (now or datetime.utcnow()) - timedelta(days=days)
+    return datetime(edge.year, edge.month, 1)
+
+def bucket_id(user_id: str, year: int, month: int) -> str:
+    return f"{user_id}:{year:04d}-{month:02d}"
+
+def build_bucket(user_id: str, year: int, month: int, expenses) -> dict:
+    """Bucket document for one month from expense dicts (hot documents or rows of an older bucket)."""
+    expenses = sorted(expenses, key=lambda e: e["date"])
+    columns = {name: [e.get(name) for e in expenses] for name in COLUMNS}
+    columns["has_receipt"] = [bool(e.get("has_receipt") or e.get("receipt_image_base64")) for e in expenses]
+
+    totals = {}
+    for e in expenses:
+        if e.get("duplicate_of"):
+            continue
+        key = (e["category"], e.get("currency") or BASE_CURRENCY, e["date"].strftime("%Y-%m-%d"))
+        totals[key] = totals.get(key, 0.0) + e["amount"]
+
+    return {
+        "id": bucket_id(user_id, year, month),
+        "user_id": user_id,
+        "year": year,
+        "month": month,
+        "start": datetime(year, month, 1),
+        "count": len(expenses),
+        "receipt_count": sum(columns["has_receipt"]),
+        "columns": columns,
+        "totals": [
+            {"category": c, "currency": cur, "day": day, "amount": amount}
+            for (c, cur, day), amount in sorted(totals.items())
+        ],
+        "archived_at": datetime.utcnow(),
+    }
+
+def bucket_rows(bucket: dict) -> list:
+    """Expands a bucket back into expense dicts, oldest first, without the cold blobs."""
+    columns = bucket["columns"]
+    names = list(columns)
+    rows = [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+    for row in rows:
+        row["user_id"] = bucket["user_id"]
+    return rows
+
+def _month_query(user_id: str, start: datetime = None, end: datetime = None) -> dict:
+    query = {"user_id": user_id}
+    if start or end:
+        query["start"] = {}
+        if start:
+            # A bucket covers [start, next month); include the one containing `start`
+            query["start"]["$gte"] = datetime(start.year, start.month, 1)
+        if end:
+            query["start"]["$lt"] = end
+    return query
+
+async def archive_user(db, user_id: str, cutoff: datetime = None) -> dict:
+    """
+    Moves a user's expenses dated before `cutoff` into monthly buckets.
+    Blobs and buckets are written before the hot documents are deleted, and
+    buckets merge by expense id, so an interrupted run is safe to repeat.
+    """
+    cutoff = cutoff or archive_cutoff()
+    expenses = await db.expenses.find({"user_id": user_id, "date": {"$lt": cutoff}}).to_list(length=None)
+    if not expenses:
+        return {"archived": 0, "buckets": 0}
+
+    blobs = [
+        ReplaceOne(
+            {"expense_id": e["id"]},
+            {"expense_id": e["id"], "user_id": user_id, **{f: e.get(f) for f in BLOB_FIELDS}},
+            upsert=True,
+        )
+        for e in expenses if any(e.get(f) for f in BLOB_FIELDS)
+    ]
+    if blobs:
+        await db.expense_blobs.bulk_write(blobs, ordered=False)
+
+    months = {}
+    for e in expenses:
+        months.setdefault((e["date"].year, e["date"].month), []).append(e)
+    for (year, month), group in months.items():
+        existing = await db.expense_archive.find_one({"id": bucket_id(user_id, year, month)})
+        ids = {e["id"] for e in group}
+        rows = [r for r in bucket_rows(existing) if r["id"] not in ids] if existing else []
+        await db.expense_archive.replace_one(
+            {"id": bucket_id(user_id, year, month)}, build_bucket(user_id, year, month, rows + group), upsert=True
+        )
+
+    await db.expenses.delete_many({"user_id": user_id, "id": {"$in": [e["id"] for e in expenses]}})
+    # Archived rows are listed without their blobs
+    await bump_data_version(db, user_id)
+    return {"archived": len(expenses), "buckets": len(months)}
+
+async def archive_all(db, cutoff: datetime = None) -> dict:
+    cutoff = cutoff or archive_cutoff()
+    archived, buckets = 0, 0
+    for user_id in await db.expenses.distinct("user_id", {"date": {"$lt": cutoff}}):
+        result = await archive_user(db, user_id, cutoff)
+        archived += result["archived"]
+        buckets += result["buckets"]
+    return {"archived": archived, "buckets": buckets}
+
+async def _restore(db, user_id: str, bucket: dict, ids: set) -> list:
+    """Moves the rows of `bucket` whose id is in `ids` back into db.expenses, with their blobs."""
+    rows = bucket_rows(bucket)
+    moving = [r for r in rows if r["id"] in ids]
+    blobs = {
+        b["expense_id"]: b
+        async for b in db.expense_blobs.find({"user_id": user_id, "expense_id": {"$in": [r["id"] for r in moving]}})
+    }
+    docs = []
+    for row in moving:
+        doc = {k: v for k, v in row.items() if k != "has_receipt"}
+        blob = blobs.get(row["id"], {})
+        for field in BLOB_FIELDS:
+            doc[field] = blob.get(field)
+        docs.append(doc)
+    await db.expenses.insert_many(docs)
+    if blobs:
+        await db.expense_blobs.delete_many({"user_id": user_id, "expense_id": {"$in": list(blobs)}})
+
+    rows = [r for r in rows if r["id"] not in ids]
+    if rows:
+        await db.expense_archive.replace_one({"id": bucket["id"]}, build_bucket(user_id, bucket["year"], bucket["month"], rows))
+    else:
+        await db.expense_archive.delete_one({"id": bucket["id"]})
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs
+
+async def restore_expense(db, user_id: str, expense_id: str):
+    """Moves one archived expense back into db.expenses (before it is edited or deleted)."""
+    bucket = await db.expense_archive.find_one({"user_id": user_id, "columns.id": expense_id})
+    if bucket is None:
+        return None
+    return (await _restore(db, user_id, bucket, {expense_id}))[0]
+
+async def restore_expenses(db, user_id: str, ids) -> set:
+    """Moves whichever of `ids` are archived back into db.expenses, one write per bucket; returns those ids."""
+    ids = set(ids)
+    restored = set()
+    async for bucket in db.expense_archive.find({"user_id": user_id, "columns.id": {"$in": list(ids)}}):
+        restored.update(doc["id"] for doc in await _restore(db, user_id, bucket, ids))
+    return restored
+
+async def archived_total(db, user_id: str, target: str, start: datetime = None, end: datetime = None, category: str = None) -> float:
+    """Non-duplicate archived spend in `target`, from the precomputed totals only."""
+    buckets = await db.expense_archive.find(_month_query(user_id, start, end), {"_id": 0, "totals": 1}).to_list(length=None)
+    rows = [
+        {"amount": t["amount"], "currency": t["currency"], "date": t["day"]}
+        for b in buckets for t in b["totals"] if category is None or t["category"] == category
+    ]
+    return total_in(rows, target)
+
+async def archived_expenses(db, user_id: str, start: datetime = None, end: datetime = None) -> list:
+    """Archived rows in [start, end), oldest first."""
+    cursor = db.expense_archive.find(_month_query(user_id, start, end), {"_id": 0, "totals": 0}).sort("start", 1)
+    rows = []
+    async for bucket in cursor:
+        rows.extend(r for r in bucket_rows(bucket) if (not start or r["date"] >= start) and (not end or r["date"] < end))
+    return rows
+
+async def newest_archived(db, user_id: str, limit: int, receipts_only: bool = False, since: datetime = None) -> list:
+    """
+    Archived rows newest first (only those dated after `since`, if given),
+    for merging into a date-descending listing of the hot collection.
+    """
+    cursor = db.expense_archive.find(_month_query(user_id, since), {"_id": 0, "totals": 0}).sort("start", -1)
+    rows = []
+    async for bucket in cursor:
+        rows.extend(
+            r for r in reversed(bucket_rows(bucket))
+            if (not receipts_only or r["has_receipt"]) and (since is None or r["date"] > since)
+        )
+        if len(rows) >= limit:
+            break
+    return rows[:limit]
+
+async def archived_receipt_count(db, user_id: str) -> int:
+    result = await db.expense_archive.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "n": {"$sum": "$receipt_count"}}},
+    ]).to_list(length=1)
+    return result[0]["n"] if result else 0
+
+async def archived_blob(db, user_id: str, expense_id: str):
+    return await db.expense_blobs.find_one({"expense_id": expense_id, "user_id": user_id}, {"_id": 0})
+
+def main():
+    from app.database import get_database, ensure_indexes
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+
+    async def run():
+        db = get_database()
+        await ensure_indexes()
+        return await archive_all(db, archive_cutoff(days=args.days))
+
+    print(asyncio.run(run()))
+
+if __name__ == "__main__":
+    main()
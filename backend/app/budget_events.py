@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from app.currency import BASE_CURRENCY, aggregate_total, get_fx_table
+from app.archive_utils import archived_total
+from app.cache_utils import WORKER_ID
+from app.http_utils import bump_data_versions
+from app.task_utils import enqueue, handler, settled
+
+THRESHOLDS = (50, 80, 100)
+KEEPALIVE_SECONDS = 15
+# Between an expense write and its queued rollup, and clock skew across workers
+SEED_MARGIN = timedelta(seconds=1)
+BUDGET_EVENTS_POLL_SECONDS = float(os.getenv("BUDGET_EVENTS_POLL_SECONDS", "1.0"))
+EVENTS_POLL_OVERLAP = timedelta(seconds=5)
+
+logger = logging.getLogger("app.budgets")
+
+# user_id -> queues of connected /budgets/stream clients (this worker only).
+# Events published here are also written to db.budget_events, which every
+# other worker follows (relay_events) to reach the clients connected to it.
+_subscribers = {}
+
+def subscribe(user_id: str) -> asyncio.Queue:
+    queue = asyncio.Queue(maxsize=100)
+    _subscribers.setdefault(user_id, set()).add(queue)
+    return queue
+
+def unsubscribe(user_id: str, queue: asyncio.Queue):
+    queues = _subscribers.get(user_id)
+    if queues:
+        queues.discard(queue)
+        if not queues:
+            del _subscribers[user_id]
+
+def publish(user_id: str, event: dict):
+    for queue in _subscribers.get(user_id, ()):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass  # slow client; it will resync from GET /budgets/
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def event_stream(request, user_id: str):
+    queue = subscribe(user_id)
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        unsubscribe(user_id, queue)
+
+def month_range(month: int, year: int):
+    start_date = datetime(year, month, 1)
+    if month == 12:
+        end_date = datetime(year + 1, 1, 1)
+    else:
+        end_date = datetime(year, month + 1, 1)
+    return start_date, end_date
+
+def crossed_thresholds(before: float, after: float, limit: float):
+    if limit <= 0:
+        return []
+    return [t for t in THRESHOLDS if before < limit * t / 100 <= after]
+
+async def recompute_spent(db, budget: dict, currency: str = BASE_CURRENCY) -> float:
+    """Full recomputation, used once per budget to seed the incremental counter."""
+    # Rollups queued before this point are in the total (see apply_rollups)
+    seeded_at = datetime.utcnow()
+    start_date, end_date = month_range(budget["month"], budget["year"])
+    spent = await aggregate_total(db.expenses, {
+        "user_id": budget["user_id"],
+        "category": budget["category"],
+        "date": {"$gte": start_date, "$lt": end_date},
+        "duplicate_of": None
+    }, currency)
+    spent += await archived_total(db, budget["user_id"], currency, start_date, end_date, budget["category"])
+    update = {"current_spent": spent, "spent_synced": True, "spent_seeded_at": seeded_at}
+    await db.budgets.update_one({"id": budget["id"]}, {"$set": update})
+    budget.update(update)
+    return spent
+
+async def _apply_delta(db, budget: dict, delta: float, currency: str) -> list:
+    """Applies one budget's change and publishes it here; returns the events for other workers."""
+    if not delta:
+        return []
+    if budget.get("spent_synced"):
+        after_doc = await db.budgets.find_one_and_update(
+            {"id": budget["id"], "spent_synced": True, "spent_seeded_at": budget.get("spent_seeded_at")},
+            {"$inc": {"current_spent": delta}},
+            return_document=ReturnDocument.AFTER
+        )
+        if after_doc is None:
+            # Recomputed or invalidated since it was read; that total has the change
+            return []
+        after = after_doc["current_spent"]
+        before = after - delta
+    else:
+        # The expense write already happened, so the recomputed total includes it
+        after = await recompute_spent(db, budget, currency)
+        before = after - delta
+
+    event = {
+        "type": "budget_update",
+        "budget_id": budget["id"],
+        "category": budget["category"],
+        "month": budget["month"],
+        "year": budget["year"],
+        "monthly_limit": budget["monthly_limit"],
+        "current_spent": after,
+    }
+    events = [event] + [
+        dict(event, type="budget_threshold", threshold=threshold)
+        for threshold in crossed_thresholds(before, after, budget["monthly_limit"])
+    ]
+    for e in events:
+        publish(budget["user_id"], e)
+    return [(budget["user_id"], e) for e in events]
+
+def _counted(expense) -> bool:
+    return expense is not None and not expense.get("duplicate_of")
+
+def on_expense_change(user_id: str, old: dict = None, new: dict = None, currency: str = BASE_CURRENCY):
+    """
+    Queues the update of budgets' current_spent (in the user's currency) for an
+    expense create (old=None), update or delete (new=None); `apply_rollups`
+    applies it after the response and pushes threshold crossings.
+    """
+    fx = get_fx_table()
+    # Net the old and new amounts per budget so an edit cannot fake a crossing
+    deltas = {}
+    for expense, sign in ((old, -1), (new, 1)):
+        if _counted(expense):
+            key = (expense["category"], expense["date"].month, expense["date"].year)
+            amount = fx.convert_one(expense["amount"], expense.get("currency"), expense["date"], currency)
+            deltas[key] = deltas.get(key, 0.0) + sign * amount
+    if any(deltas.values()):
+        rollup = {"user_id": user_id, "currency": currency, "deltas": deltas, "queued_at": datetime.utcnow()}
+        enqueue("budget_rollup", rollup, key=user_id)
+
+async def rollups_settled(user_id: str) -> bool:
+    """Waits for the user's queued budget updates, so a read sees the user's own writes; True if there were any."""
+    return await settled("budget_rollup", user_id)
+
+async def resync_rollups(db, rollups: list):
+    """Retry for a failed batch: some $incs may have landed, so recompute those users' budgets on next read."""
+    user_ids = list({r["user_id"] for r in rollups})
+    await db.budgets.update_many({"user_id": {"$in": user_ids}}, {"$set": {"spent_synced": False}})
+    await bump_data_versions(db, user_ids)
+
+@handler("budget_rollup", retry=resync_rollups)
+async def apply_rollups(db, rollups: list):
+    """
+    Nets a batch of expense changes per budget and applies each budget's total
+    with one $inc. A budget recomputed (on any worker) after a change was
+    queued already counts it, so that change is left out; one recomputed
+    about when the change was queued is recomputed again instead.
+    """
+    netted = {}
+    for rollup in rollups:
+        for (category, month, year), delta in rollup["deltas"].items():
+            key = (rollup["user_id"], category, month, year)
+            netted.setdefault(key, []).append((delta, rollup["queued_at"], rollup["currency"]))
+    user_ids = list({r["user_id"] for r in rollups})
+    budgets = {
+        (b["user_id"], b["category"], b["month"], b["year"]): b
+        async for b in db.budgets.find({"user_id": {"$in": user_ids}}, {"_id": 0})
+    }
+    events = []
+    for key, changes in netted.items():
+        budget = budgets.get(key)
+        if budget is None:
+            continue
+        seeded_at = budget.get("spent_seeded_at")
+        if seeded_at is not None and any(abs(seeded_at - queued_at) < SEED_MARGIN for _, queued_at, _ in changes):
+            budget["spent_synced"] = False
+        delta = sum(
+            d for d, queued_at, _ in changes
+            if not budget.get("spent_synced") or seeded_at is None or seeded_at < queued_at
+        )
+        events += await _apply_delta(db, budget, delta, changes[-1][2])
+    await _share(db, events)
+    # The request bumped the version before this landed
+    await bump_data_versions(db, user_ids)
+
+async def invalidate_user_budgets(db, user_id: str):
+    """Forces the next read to recompute every budget (duplicate flags or the user's currency changed)."""
+    await db.budgets.update_many({"user_id": user_id}, {"$set": {"spent_synced": False}})
+
+async def _share(db, events: list):
+    """Hands events published on this worker to the /budgets/stream clients of the others."""
+    if not events:
+        return
+    now = datetime.utcnow()
+    try:
+        await db.budget_events.insert_many([
+            {"user_id": user_id, "event": event, "worker": WORKER_ID, "created_at": now} for user_id, event in events
+        ])
+    except Exception:
+        logger.warning("Budget events not shared with other workers", exc_info=True)
+
+async def _watch_events(db):
+    """Events from a change stream; raises where Mongo has none (standalone servers)."""
+    pipeline = [{"$match": {"operationType": "insert", "fullDocument.worker": {"$ne": WORKER_ID}}}]
+    async with db.budget_events.watch(pipeline) as stream:
+        logger.info("Budget events following the budget_events change stream")
+        async for change in stream:
+            doc = change["fullDocument"]
+            publish(doc["user_id"], doc["event"])
+
+async def _poll_events(db):
+    logger.info("Budget events polling", extra={"interval_s": BUDGET_EVENTS_POLL_SECONDS})
+    since = datetime.utcnow()
+    seen = {}  # _id -> created_at, so the overlap does not deliver twice
+    while True:
+        await asyncio.sleep(BUDGET_EVENTS_POLL_SECONDS)
+        if not _subscribers:
+            since = datetime.utcnow()
+            continue
+        try:
+            cursor = db.budget_events.find({
+                "created_at": {"$gt": since - EVENTS_POLL_OVERLAP},
+                "worker": {"$ne": WORKER_ID},
+                "user_id": {"$in": list(_subscribers)},
+            }).sort("created_at", 1)
+            async for doc in cursor:
+                if doc["_id"] not in seen:
+                    seen[doc["_id"]] = doc["created_at"]
+                    publish(doc["user_id"], doc["event"])
+                since = max(since, doc["created_at"])
+        except Exception:
+            logger.warning("Budget events poll failed", exc_info=True)
+        cutoff = since - EVENTS_POLL_OVERLAP
+        seen = {k: t for k, t in seen.items() if t > cutoff}
+
+async def relay_events(db):
+    """Runs for the life of the worker (started at startup)."""
+    try:
+        await _watch_events(db)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.info("No change stream, falling back to polling budget events", extra={"error": str(e)})
+    await _poll_events(db)
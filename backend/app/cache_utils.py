@@ -0,0 +1,218 @@
+"""
+Two-tier cache shared by the workers of a deployment.
+
+A namespace is declared once, next to what it caches:
+
+    statements = namespace("statements", max_entries=128, ttl=7 * 86400, shared=True)
+
+    rows = await statements.get(key)
+    if rows is None:
+        rows = parse(...)
+        await statements.set(key, rows)
+
+- The local tier is an LRU per worker process (`max_entries`, `ttl` seconds).
+- The shared tier (`shared=True`) is the Mongo `cache` collection: one
+  document per entry, removed by a TTL index once expired, so a value one
+  worker computed is a hit in every other. Values must be BSON (dicts,
+  lists, datetimes, bytes) and well under the 16 MB document limit. A
+  failing shared tier counts as a miss; it never fails the request.
+
+Keys are strings. A value derived from a user's data should carry the
+user's data_version in its key (see app.http_utils): it then cannot be
+served stale and needs no invalidation. Namespaces of per-user state kept
+current in place (`by_user=True`, keyed by user id, such as the vendor
+search index) are dropped in every other worker when that user's data
+changes. bump_data_version stamps the user with `data_changed_at` and the
+writing worker; each worker follows the stamps through a change stream on
+`users` where Mongo supports one (replica sets), else by polling the
+indexed stamp every CACHE_POLL_SECONDS.
+
+`cache_metrics()` reports, per namespace and for this worker, hits per
+tier, misses, hit rate, evictions, the age of values served and, for
+by_user namespaces, how long invalidations took to arrive (staleness).
+CACHE_SHARED=0 turns the shared tier off.
+"""
+import asyncio
+import collections
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+CACHE_SHARED = os.getenv("CACHE_SHARED", "1") == "1"
+CACHE_POLL_SECONDS = float(os.getenv("CACHE_POLL_SECONDS", "1.0"))
+POLL_OVERLAP = timedelta(seconds=5)   # writes stamped just before a poll may commit just after it
+
+# Stamped on users by this process's writes, which update their own local entries
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+logger = logging.getLogger("app.cache")
+
+_namespaces = {}
+
+class Namespace:
+    def __init__(self, name: str, max_entries: int, ttl: float, shared: bool, by_user: bool):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared and CACHE_SHARED
+        self.by_user = by_user
+        self.entries = collections.OrderedDict()  # key -> (value, stored_at monotonic)
+        self.counters = collections.Counter()
+        self.max_age = 0.0
+        self.max_lag = 0.0
+
+    def peek(self, key: str):
+        """The local value, without counting a hit or refreshing its position."""
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def get_local(self, key: str):
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age <= self.ttl:
+                self.entries.move_to_end(key)
+                self._served(age)
+                self.counters["local_hits"] += 1
+                return entry[0]
+            del self.entries[key]
+            self.counters["expired"] += 1
+        if not self.shared:
+            self.counters["misses"] += 1
+        return None
+
+    def set_local(self, key: str, value, age: float = 0.0):
+        self.counters["sets"] += 1
+        self.entries[key] = (value, time.monotonic() - age)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get(self, key: str):
+        value = self.get_local(key)
+        if value is not None or not self.shared:
+            return value
+        from app.database import get_database
+        now = datetime.utcnow()
+        try:
+            doc = await get_database().cache.find_one({"_id": f"{self.name}:{key}", "expires_at": {"$gt": now}})
+        except Exception:
+            logger.warning("Shared cache read failed", extra={"namespace": self.name}, exc_info=True)
+            doc = None
+        if doc is None:
+            self.counters["misses"] += 1
+            return None
+        age = (now - doc["stored_at"]).total_seconds()
+        self.counters["shared_hits"] += 1
+        self._served(age)
+        self.set_local(key, doc["value"], age)
+        return doc["value"]
+
+    async def set(self, key: str, value):
+        self.set_local(key, value)
+        if not self.shared:
+            return
+        from app.database import get_database
+        now = datetime.utcnow()
+        doc = {"value": value, "stored_at": now, "expires_at": now + timedelta(seconds=self.ttl)}
+        try:
+            await get_database().cache.replace_one({"_id": f"{self.name}:{key}"}, doc, upsert=True)
+        except Exception:
+            logger.warning("Shared cache write failed", extra={"namespace": self.name}, exc_info=True)
+
+    def drop(self, key: str, lag: float = None):
+        if self.entries.pop(key, None) is not None:
+            self.counters["invalidations"] += 1
+            if lag is not None:
+                self.max_lag = max(self.max_lag, lag)
+
+    def _served(self, age: float):
+        self.counters["served_age_total"] += age
+        self.max_age = max(self.max_age, age)
+
+    def snapshot(self) -> dict:
+        c = self.counters
+        hits = c["local_hits"] + c["shared_hits"]
+        lookups = hits + c["misses"]
+        return {
+            "entries": len(self.entries),
+            "shared": self.shared,
+            **{k: c[k] for k in ("local_hits", "shared_hits", "misses", "sets", "evictions", "expired", "invalidations")},
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "served_age_avg_s": round(c["served_age_total"] / hits, 3) if hits else None,
+            "served_age_max_s": round(self.max_age, 3),
+            "invalidation_lag_max_s": round(self.max_lag, 3) if self.by_user else None,
+        }
+
+def namespace(name: str, max_entries: int, ttl: float, shared: bool = False, by_user: bool = False) -> Namespace:
+    """Declares (once per process) the cache namespace `name`."""
+    if name not in _namespaces:
+        _namespaces[name] = Namespace(name, max_entries, ttl, shared, by_user)
+    return _namespaces[name]
+
+def cache_metrics() -> dict:
+    return {"worker": WORKER_ID, "shared_tier": CACHE_SHARED, "namespaces": {n: ns.snapshot() for n, ns in _namespaces.items()}}
+
+def data_changed_stamp() -> dict:
+    """The $set bump_data_version adds to the user, for other workers to invalidate on."""
+    return {"data_changed_at": datetime.utcnow(), "data_changed_by": WORKER_ID}
+
+def _user_changed(user_id: str, changed_at: datetime):
+    lag = max(0.0, (datetime.utcnow() - changed_at).total_seconds())
+    for ns in _namespaces.values():
+        if ns.by_user:
+            ns.drop(user_id, lag)
+
+async def _watch(db):
+    """Invalidations from a change stream; raises where Mongo has none (standalone servers)."""
+    pipeline = [{"$match": {
+        "operationType": "update",
+        "updateDescription.updatedFields.data_changed_at": {"$exists": True},
+        "updateDescription.updatedFields.data_changed_by": {"$ne": WORKER_ID},
+    }}]
+    async with db.users.watch(pipeline, full_document="updateLookup") as stream:
+        logger.info("Cache invalidation following the users change stream")
+        async for change in stream:
+            user = change.get("fullDocument") or {}
+            if user.get("id"):
+                _user_changed(user["id"], user.get("data_changed_at") or datetime.utcnow())
+
+async def _poll(db):
+    logger.info("Cache invalidation polling users", extra={"interval_s": CACHE_POLL_SECONDS})
+    since = datetime.utcnow()
+    handled = {}  # user id -> last stamp applied, so the overlap does not drop twice
+    while True:
+        await asyncio.sleep(CACHE_POLL_SECONDS)
+        if not any(ns.by_user and ns.entries for ns in _namespaces.values()):
+            since = datetime.utcnow()
+            continue
+        try:
+            cursor = db.users.find(
+                {"data_changed_at": {"$gt": since - POLL_OVERLAP}, "data_changed_by": {"$ne": WORKER_ID}},
+                {"_id": 0, "id": 1, "data_changed_at": 1},
+            )
+            async for user in cursor:
+                stamp = user["data_changed_at"]
+                if handled.get(user["id"]) != stamp:
+                    handled[user["id"]] = stamp
+                    _user_changed(user["id"], stamp)
+                since = max(since, stamp)
+        except Exception:
+            logger.warning("Cache invalidation poll failed", exc_info=True)
+        cutoff = since - POLL_OVERLAP
+        handled = {u: s for u, s in handled.items() if s > cutoff}
+
+async def follow_invalidations(db):
+    """Runs for the life of the worker (started at startup)."""
+    try:
+        await _watch(db)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.info("No change stream, falling back to polling", extra={"error": str(e)})
+    await _poll(db)
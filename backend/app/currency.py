@@ -0,0 +1,144 @@
+import csv
+import functools
+import logging
+import os
+from datetime import datetime, date
+import numpy as np
+
+FX_RATES_FILE = os.getenv("FX_RATES_FILE", os.path.join(os.path.dirname(__file__), "data", "fx_rates.csv"))
+BASE_CURRENCY = "INR"
+
+logger = logging.getLogger("app.currency")
+
+CURRENCY_SYMBOLS = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "SGD": "S$", "AED": "AED "}
+
+def currency_symbol(code: str) -> str:
+    return CURRENCY_SYMBOLS.get((code or BASE_CURRENCY).upper(), f"{code} ")
+
+def _ordinal(value) -> int:
+    if isinstance(value, (datetime, date)):
+        return value.toordinal()
+    return datetime.fromisoformat(str(value)).toordinal()
+
+class FxTable:
+    """
+    Dated exchange rates held as one float64 array of shape (currencies, days),
+    each cell the value of one unit of that currency in BASE_CURRENCY.
+    Gaps (weekends, holidays) are forward-filled at load time so a lookup is a
+    single fancy-indexing operation for any number of amounts.
+    """
+
+    def __init__(self, rows):
+        rows = [(c.upper(), _ordinal(d), float(r)) for c, d, r in rows]
+        codes = sorted({c for c, _, _ in rows} | {BASE_CURRENCY})
+        self.index = {c: i for i, c in enumerate(codes)}
+        ordinals = [d for _, d, _ in rows] or [date.today().toordinal()]
+        self.first_day = min(ordinals)
+        n_days = max(ordinals) - self.first_day + 1
+
+        rates = np.full((len(codes), n_days), np.nan)
+        for c, d, r in rows:
+            rates[self.index[c], d - self.first_day] = r
+        rates[self.index[BASE_CURRENCY], :] = 1.0
+
+        # Forward fill along days, then back fill anything before the first quote
+        for row in rates:
+            known = ~np.isnan(row)
+            if not known.any():
+                row[:] = 1.0
+                continue
+            positions = np.where(known, np.arange(n_days), 0)
+            np.maximum.accumulate(positions, out=positions)
+            row[:] = row[positions]
+            row[:np.argmax(known)] = row[np.argmax(known)]
+        self.rates = rates
+
+    def _day_index(self, ordinals):
+        return np.clip(np.asarray(ordinals, dtype=np.int64) - self.first_day, 0, self.rates.shape[1] - 1)
+
+    def _currency_index(self, currencies):
+        # Currencies without a rate table are treated as already being in the target currency
+        return np.array([self.index.get((c or BASE_CURRENCY).upper(), -1) for c in currencies], dtype=np.int64)
+
+    def convert(self, amounts, currencies, dates, target: str = BASE_CURRENCY):
+        """
+        Vectorized conversion of parallel amount/currency/date sequences into
+        `target`, or into BASE_CURRENCY when the table has no rates for it
+        (a currency stored before requests were checked against the table).
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if amounts.size == 0:
+            return amounts
+        target_index = self.index.get((target or BASE_CURRENCY).upper())
+        if target_index is None:
+            logger.warning("no FX rates for target currency, converting to base", extra={"currency": target, "base": BASE_CURRENCY})
+            target_index = self.index[BASE_CURRENCY]
+        days = self._day_index([_ordinal(d) for d in dates])
+        src = self._currency_index(currencies)
+
+        src_rate = np.where(src >= 0, self.rates[np.maximum(src, 0), days], np.nan)
+        dst_rate = self.rates[target_index, days]
+        factor = np.where(np.isnan(src_rate), 1.0, src_rate / dst_rate)
+        return amounts * factor
+
+    def supports(self, currency: str) -> bool:
+        return (currency or BASE_CURRENCY).upper() in self.index
+
+    def convert_one(self, amount: float, currency: str, when, target: str = BASE_CURRENCY) -> float:
+        if (currency or BASE_CURRENCY).upper() == (target or BASE_CURRENCY).upper():
+            return float(amount)
+        return float(self.convert([amount], [currency], [when], target)[0])
+
+def load_fx_table(path: str = FX_RATES_FILE) -> FxTable:
+    rows = []
+    if os.path.exists(path):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(line for line in f if not line.startswith("#")):
+                rows.append((row["currency"], row["date"], row["rate"]))
+    return FxTable(rows)
+
+@functools.lru_cache(maxsize=1)
+def get_fx_table() -> FxTable:
+    return load_fx_table()
+
+def supported_currency(code: str) -> str:
+    """The upper-cased code; ValueError when the FX table cannot convert it."""
+    code = code.strip().upper()
+    if not get_fx_table().supports(code):
+        raise ValueError(f"Unsupported currency {code}; expected one of {', '.join(sorted(get_fx_table().index))}")
+    return code
+
+def total_in(expenses, target: str) -> float:
+    """Sum of expense dicts (amount/currency/date) in the target currency."""
+    if not expenses:
+        return 0.0
+    converted = get_fx_table().convert(
+        [e["amount"] for e in expenses],
+        [e.get("currency") for e in expenses],
+        [e["date"] for e in expenses],
+        target,
+    )
+    return float(converted.sum())
+
+def grouped_total_pipeline(match: dict) -> list:
+    """
+    Aggregation that collapses matching expenses to one row per (currency, day),
+    so only a handful of rows leave Mongo and conversion runs on those.
+    """
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "currency": {"$ifNull": ["$currency", BASE_CURRENCY]},
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+            },
+            "amount": {"$sum": "$amount"},
+        }},
+    ]
+
+async def aggregate_total(collection, match: dict, target: str) -> float:
+    groups = await collection.aggregate(grouped_total_pipeline(match)).to_list(length=None)
+    return total_in(
+        [{"amount": g["amount"], "currency": g["_id"]["currency"], "date": g["_id"]["day"]} for g in groups],
+        target,
+    )
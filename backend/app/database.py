@@ -12,3 +12,41 @@ db = client[DB_NAME]
 
 def get_database():
     return db
+
+async def ensure_indexes():
+    # get_current_user on every request, data_version bumps on every write
+    await db.users.create_index("email")
+    await db.users.create_index("id")
+    # Workers without a change stream poll this for cache invalidation
+    await db.users.create_index("data_changed_at", sparse=True)
+    # Shared cache tier; Mongo removes entries once expires_at passes
+    await db.cache.create_index("expires_at", expireAfterSeconds=0)
+    # Budget SSE events relayed between workers; only minutes old ones are ever read
+    await db.budget_events.create_index("created_at", expireAfterSeconds=300)
+    # Duplicate detection blocks on (user, amount, date)
+    await db.expenses.create_index([("user_id", 1), ("amount", 1), ("date", 1)])
+    await db.expenses.create_index([("user_id", 1), ("date", -1)])
+    # Lookups by expense id: edits, deletes, and matching rows on import
+    await db.expenses.create_index("id")
+    await db.recurring.create_index([("user_id", 1), ("next_expected_date", 1)])
+    await db.budgets.create_index([("user_id", 1), ("category", 1), ("year", 1), ("month", 1)])
+    await db.receipt_derivatives.create_index([("expense_id", 1), ("size", 1)], unique=True)
+    # Learning entries are inserted with ids fixed at capture, so a retried batch skips the ones that landed
+    await db.ocr_learning.create_index("id", unique=True)
+    await db.expense_archive.create_index("id", unique=True)
+    await db.expense_archive.create_index([("user_id", 1), ("start", -1)])
+    await db.expense_archive.create_index([("user_id", 1), ("columns.id", 1)])
+    await db.expense_blobs.create_index("expense_id", unique=True)
+    # GET /expenses/search; vendor names are not English, so no stemming or stop words
+    await db.expenses.create_index(
+        [("user_id", 1), ("vendor", "text"), ("description", "text"), ("items", "text"), ("line_items.name", "text")],
+        weights={"vendor": 10, "items": 4, "line_items.name": 4, "description": 2},
+        default_language="none",
+        name="expense_search",
+    )
+    await db.expenses.create_index([("user_id", 1), ("vendor", 1)])
+    await db.forecasts.create_index("user_id", unique=True)
+    await db.groups.create_index("id", unique=True)
+    await db.groups.create_index("members.user_id")
+    await db.group_expenses.create_index("id", unique=True)
+    await db.group_expenses.create_index([("group_id", 1), ("date", -1)])
@@ -0,0 +1,160 @@
+import re
+from datetime import datetime, timedelta, timezone
+from difflib import SequenceMatcher
+from app.currency import BASE_CURRENCY
+
+# Statement rows usually post 1-2 days after the SMS/receipt for the same purchase
+DATE_WINDOW_DAYS = 3
+AMOUNT_TOLERANCE = 1.0  # currency units, absorbs rounding in SMS ("Rs 499") vs receipt ("499.00")
+AMOUNT_TOLERANCE_RATIO = 0.02  # ...but at most 2% of the amount, so small purchases must match closely
+DUPLICATE_THRESHOLD = 0.75
+
+# Placeholder vendors emitted by the parsers when nothing better was found
+GENERIC_VENDORS = {"", "UNKNOWNVENDOR", "SMSTRANSACTION", "STATEMENTITEM", "STATEMENTTRANSACTION", "RECEIPTEXPENSE"}
+
+VENDOR_NOISE = re.compile(r"\b(?:PVT|PRIVATE|LTD|LIMITED|INC|CORP|LLP|UPI|POS|PAYMENT|PAYMENTS|PAID|TO|M/S|THE|INDIA)\b")
+
+# Sources that re-import the same bank data and may collide with themselves
+IMPORT_SOURCES = {"sms", "pdf"}
+
+def normalize_vendor(vendor) -> str:
+    """
+    Reduces a vendor string from any parser to a comparable key,
+    e.g. "Paid to SWIGGY PVT LTD UPI" and "swiggy.in" both become "SWIGGY".
+    """
+    if not vendor:
+        return ""
+    v = str(vendor).upper()
+    v = re.sub(r"\.(?:COM|IN|CO|NET|ORG)\b", " ", v)
+    v = re.sub(r"\(.*?\)", " ", v)  # "(HDFC)" bank suffix from SMS descriptions
+    v = VENDOR_NOISE.sub(" ", v)
+    return re.sub(r"[^A-Z0-9]", "", v)
+
+def vendor_similarity(a: str, b: str) -> float:
+    """Similarity in [0, 1] between two normalized vendors. Unknown vendors score neutral."""
+    if a in GENERIC_VENDORS or b in GENERIC_VENDORS:
+        return 0.5
+    if a == b:
+        return 1.0
+    if a in b or b in a:
+        return 0.9
+    return SequenceMatcher(None, a, b).ratio()
+
+def _as_datetime(value) -> datetime:
+    """Naive UTC, as dates come back from Mongo."""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _source(expense: dict) -> str:
+    source = expense.get("source") or "manual"
+    return getattr(source, "value", source)
+
+def _raw_text(expense: dict):
+    return (expense.get("original_ocr_data") or {}).get("raw_text")
+
+def amount_tolerance(amount) -> float:
+    return min(AMOUNT_TOLERANCE, abs(float(amount)) * AMOUNT_TOLERANCE_RATIO)
+
+def is_comparable(a: dict, b: dict) -> bool:
+    if (a.get("currency") or BASE_CURRENCY) != (b.get("currency") or BASE_CURRENCY):
+        return False
+    sa, sb = _source(a), _source(b)
+    if sa != sb:
+        return True
+    # Same-source rows for the same amount a few days apart are usually genuine repeat
+    # purchases; only a re-import of the same SMS or statement line repeats the exact
+    # timestamp or text.
+    if sa not in IMPORT_SOURCES:
+        return False
+    return _as_datetime(a["date"]) == _as_datetime(b["date"]) or (bool(_raw_text(a)) and _raw_text(a) == _raw_text(b))
+
+def duplicate_score(a: dict, b: dict) -> float:
+    amount_diff = abs(float(a["amount"]) - float(b["amount"]))
+    tolerance = amount_tolerance(max(float(a["amount"]), float(b["amount"])))
+    if amount_diff > tolerance:
+        return 0.0
+    day_diff = abs((_as_datetime(a["date"]) - _as_datetime(b["date"])).total_seconds()) / 86400
+    if day_diff > DATE_WINDOW_DAYS:
+        return 0.0
+
+    vendor_score = vendor_similarity(normalize_vendor(a.get("vendor")), normalize_vendor(b.get("vendor")))
+    date_score = 1 - day_diff / (DATE_WINDOW_DAYS + 1)
+    amount_score = 1 - amount_diff / (tolerance * 2) if tolerance else 1.0
+    return round(0.6 * vendor_score + 0.25 * date_score + 0.15 * amount_score, 3)
+
+def candidate_query(user_id: str, expense: dict) -> dict:
+    """Mongo filter selecting the insert-time blocking candidates for an expense."""
+    amount = float(expense["amount"])
+    date = _as_datetime(expense["date"])
+    window = timedelta(days=DATE_WINDOW_DAYS)
+    # The widest tolerance; duplicate_score applies the one for the pair
+    return {
+        "user_id": user_id,
+        "amount": {"$gte": amount - AMOUNT_TOLERANCE, "$lte": amount + AMOUNT_TOLERANCE},
+        "date": {"$gte": date - window, "$lte": date + window},
+        "duplicate_of": None,
+    }
+
+def best_match(expense: dict, candidates):
+    """Returns (candidate, score) for the strongest duplicate above threshold, or (None, 0.0)."""
+    best, best_score = None, 0.0
+    for c in candidates:
+        if c.get("id") == expense.get("id") or not is_comparable(expense, c):
+            continue
+        score = duplicate_score(expense, c)
+        if score > best_score:
+            best, best_score = c, score
+    if best_score >= DUPLICATE_THRESHOLD:
+        return best, best_score
+    return None, 0.0
+
+class DuplicateIndex:
+    """
+    Blocking index over (amount bucket, date bucket). Each expense is only scored
+    against the handful of entries in its neighbouring blocks, so a full history
+    is deduplicated in roughly linear time instead of comparing every pair.
+    """
+
+    def __init__(self):
+        self.blocks = {}
+
+    @staticmethod
+    def _keys(expense: dict):
+        amount_bucket = int(float(expense["amount"]) // AMOUNT_TOLERANCE)
+        day_bucket = _as_datetime(expense["date"]).toordinal() // DATE_WINDOW_DAYS
+        return amount_bucket, day_bucket
+
+    def candidates(self, expense: dict):
+        amount_bucket, day_bucket = self._keys(expense)
+        for da in (-1, 0, 1):
+            for dd in (-1, 0, 1):
+                yield from self.blocks.get((amount_bucket + da, day_bucket + dd), ())
+
+    def add(self, expense: dict):
+        self.blocks.setdefault(self._keys(expense), []).append(expense)
+
+def find_duplicates(expenses):
+    """
+    Scans expenses in date order and yields (duplicate, original, score) triples.
+    The first-seen expense of each cluster stays canonical.
+    """
+    index = DuplicateIndex()
+    for expense in expenses:
+        original, score = best_match(expense, index.candidates(expense))
+        if original is not None:
+            yield expense, original, score
+        else:
+            index.add(expense)
+
+MERGEABLE_FIELDS = ["vendor", "description", "receipt_image_base64", "items", "line_items", "gst_details", "tax_amount", "tax_type"]
+
+def merge_fields(original: dict, duplicate: dict) -> dict:
+    """Fields the duplicate can fill in on the original (e.g. a receipt image for a statement row)."""
+    updates = {}
+    for field in MERGEABLE_FIELDS:
+        if not original.get(field) and duplicate.get(field):
+            updates[field] = duplicate[field]
+    return updates
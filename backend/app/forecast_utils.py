@@ -0,0 +1,261 @@
+"""
+Month-end spend forecasts per budget category.
+
+A batch job (`python -m app.forecast_utils`, nightly) fits, for every user
+and category, one expected spend per weekday from the last HISTORY_DAYS of
+history, in the user's currency:
+
+- days are weighted by recency (half-life HALF_LIFE_DAYS);
+- each weekday's rate is shrunk toward the category's flat daily rate by
+  PRIOR_DAYS of weight, so a weekday seen a few times does not dominate;
+- a user's history starts at their first expense in the window, so new
+  accounts are not averaged over days before they existed;
+- charges found by app.recurring_utils are taken out of the rates (their
+  average daily share) and added back on the dates they are next due.
+
+All users of a chunk are fitted together: rows become flat (user, category,
+weekday) indices and the sums are single bincounts. The result is one
+`forecasts` document per user with the seven rates and upcoming recurring
+charges per category. Projection happens at read time against the live
+current_spent, so it stays correct between runs as the month goes on:
+
+    projected = spent so far + rates over the days left + recurring charges still due
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+import numpy as np
+from pymongo import ReplaceOne
+from app.currency import BASE_CURRENCY, get_fx_table
+from app.archive_utils import archive_cutoff
+from app.budget_events import month_range
+from app.http_utils import bump_data_versions
+
+HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "182"))
+HALF_LIFE_DAYS = 60
+PRIOR_DAYS = 4            # per weekday, in days of weight
+HORIZON_DAYS = 62         # how far ahead recurring charges are kept
+MAX_AGE = timedelta(days=int(os.getenv("FORECAST_MAX_AGE_DAYS", "3")))
+BATCH_USERS = 2000
+
+def fit_rates(user_idx, cat_idx, day_idx, amounts, n_users: int, n_categories: int, start: date, today: date):
+    """
+    Weekday spend rates, shape (n_users, n_categories, 7), indexed by
+    date.weekday(). Rows are parallel arrays; day_idx counts days from
+    `start`, and rows on `today` (not yet complete) are ignored.
+    """
+    n_days = (today - start).days
+    user_idx = np.asarray(user_idx, dtype=np.int64)
+    cat_idx = np.asarray(cat_idx, dtype=np.int64)
+    day_idx = np.asarray(day_idx, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if n_days <= 0:
+        return np.zeros((n_users, n_categories, 7))
+
+    weekday = (start.weekday() + np.arange(n_days)) % 7
+    weight = 0.5 ** ((n_days - 1 - np.arange(n_days)) / HALF_LIFE_DAYS)
+
+    # Each user's history starts at their first row in the window
+    first = np.full(n_users, n_days, dtype=np.int64)
+    np.minimum.at(first, user_idx, day_idx)
+    first = np.minimum(first, n_days)
+
+    done = day_idx < n_days
+    user_idx, cat_idx, day_idx, amounts = user_idx[done], cat_idx[done], day_idx[done], amounts[done]
+    key = (user_idx * n_categories + cat_idx) * 7 + weekday[day_idx]
+    sums = np.bincount(key, weights=amounts * weight[day_idx], minlength=n_users * n_categories * 7)
+    sums = sums.reshape(n_users, n_categories, 7)
+
+    # exposure[u, w]: weighted number of days with weekday w from the user's first day on
+    per_day = np.zeros((n_days + 1, 7))
+    per_day[np.arange(n_days), weekday] = weight
+    after = per_day[::-1].cumsum(axis=0)[::-1]
+    exposure = after[first]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flat = sums.sum(axis=2) / exposure.sum(axis=1)[:, None]
+    flat = np.nan_to_num(flat, nan=0.0, posinf=0.0)
+    return (sums + PRIOR_DAYS * flat[:, :, None]) / (exposure[:, None, :] + PRIOR_DAYS)
+
+def upcoming_charges(recurring: dict, today: date, horizon_days: int = HORIZON_DAYS) -> list:
+    """(date, amount) for each expected occurrence of a recurring doc after today, within the horizon."""
+    nominal = recurring.get("interval_days") or 0
+    when = recurring["next_expected_date"]
+    when = when.date() if isinstance(when, datetime) else when
+    end = today + timedelta(days=horizon_days)
+    charges = []
+    if nominal <= 0:
+        return charges
+    while when < end:
+        if when > today:
+            charges.append((when, float(recurring["expected_amount"])))
+        when += timedelta(days=round(nominal))
+    return charges
+
+def remaining_days(month: int, year: int, today: date):
+    """Days of the month still to come after today (none for past months)."""
+    start, end = month_range(month, year)
+    first = max(start.date(), today + timedelta(days=1))
+    return [first + timedelta(days=i) for i in range((end.date() - first).days)]
+
+def projected_spent(forecast: dict, category: str, month: int, year: int, spent: float, today: date = None):
+    """Month-end projection for one budget category, or None without a usable forecast."""
+    if not forecast:
+        return None
+    today = today or datetime.utcnow().date()
+    entry = forecast["categories"].get(category)
+    if entry is None:
+        return round(spent, 2)
+    days = remaining_days(month, year, today)
+    if not days:
+        return round(spent, 2)
+    rates = entry["weekday_rates"]
+    total = spent + sum(rates[d.weekday()] for d in days)
+    first, last = days[0], days[-1]
+    for when, amount in entry.get("recurring", ()):
+        when = when.date() if isinstance(when, datetime) else date.fromisoformat(str(when)[:10])
+        if first <= when <= last:
+            total += amount
+    return round(total, 2)
+
+def current(forecast: dict, user: dict, now: datetime = None) -> bool:
+    """Whether a stored forecast is recent and in the user's present currency."""
+    now = now or datetime.utcnow()
+    return (
+        bool(forecast)
+        and forecast.get("currency") == user.get("currency", BASE_CURRENCY)
+        and now - forecast["computed_at"] <= MAX_AGE
+    )
+
+async def _history(db, user_ids: list, start: datetime, end: datetime) -> list:
+    """(user_id, category, currency, day, amount) rows, summed per day in Mongo."""
+    pipeline = [
+        {"$match": {"user_id": {"$in": user_ids}, "date": {"$gte": start, "$lt": end}, "duplicate_of": None}},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "category": "$category",
+                "currency": {"$ifNull": ["$currency", BASE_CURRENCY]},
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+            },
+            "amount": {"$sum": "$amount"},
+        }},
+    ]
+    rows = [
+        (g["_id"]["user_id"], g["_id"]["category"], g["_id"]["currency"], g["_id"]["day"], g["amount"])
+        async for g in db.expenses.aggregate(pipeline)
+    ]
+    if start < archive_cutoff(end):
+        # The window reaches into the archive tier (a short ARCHIVE_AFTER_DAYS); buckets carry daily totals
+        first_day = start.strftime("%Y-%m-%d")
+        query = {"user_id": {"$in": user_ids}, "start": {"$gte": datetime(start.year, start.month, 1)}}
+        async for bucket in db.expense_archive.find(query, {"_id": 0, "user_id": 1, "totals": 1}):
+            rows.extend(
+                (bucket["user_id"], t["category"], t["currency"], t["day"], t["amount"])
+                for t in bucket["totals"] if t["day"] >= first_day
+            )
+    return rows
+
+def build_forecasts(users: list, rows: list, recurring: list, now: datetime) -> list:
+    """Forecast documents for `users` from history rows and their recurring docs."""
+    today = now.date()
+    start = today - timedelta(days=HISTORY_DAYS)
+    users_index = {u["id"]: i for i, u in enumerate(users)}
+    currencies = [u.get("currency", BASE_CURRENCY) for u in users]
+    rows = [r for r in rows if r[0] in users_index]
+    categories = sorted({r[1] for r in rows} | {r["category"] for r in recurring if r["user_id"] in users_index})
+    categories_index = {c: i for i, c in enumerate(categories)}
+
+    user_idx = np.array([users_index[r[0]] for r in rows], dtype=np.int64)
+    cat_idx = np.array([categories_index[r[1]] for r in rows], dtype=np.int64)
+    day_idx = (np.array([r[3] for r in rows], dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64)
+    amounts = np.array([r[4] for r in rows], dtype=np.float64)
+    # Only rows not already in their user's currency need converting
+    row_currencies = np.array([r[2] for r in rows], dtype=object)
+    targets = np.array(currencies, dtype=object)[user_idx]
+    foreign = np.flatnonzero(row_currencies != targets)
+    fx = get_fx_table()
+    for target in set(targets[foreign]):
+        picked = foreign[targets[foreign] == target]
+        amounts[picked] = fx.convert(amounts[picked], row_currencies[picked], [rows[i][3] for i in picked], target)
+
+    rates = fit_rates(user_idx, cat_idx, day_idx, amounts, len(users), len(categories), start, today)
+
+    # Recurring charges come out of the rates and back in on their due dates.
+    # Their amounts are as charged, normally already in the user's currency.
+    charges = {}
+    for r in recurring:
+        u, c = users_index.get(r["user_id"]), categories_index.get(r["category"])
+        if u is None or c is None:
+            continue
+        rates[u, c, :] -= r["expected_amount"] / max(r.get("interval_days") or 30.4, 1.0)
+        charges.setdefault((u, c), []).extend((when.isoformat(), amount) for when, amount in upcoming_charges(r, today))
+    np.maximum(rates, 0, out=rates)
+
+    active = np.zeros((len(users), len(categories)), dtype=bool)
+    active[user_idx, cat_idx] = True
+    for u, c in charges:
+        active[u, c] = True
+    rates = np.round(rates, 2)
+
+    # Users without history get an empty forecast, so they are not refreshed on every read
+    docs = []
+    for u, user in enumerate(users):
+        cats = np.flatnonzero(active[u])
+        docs.append({
+            "user_id": user["id"],
+            "currency": currencies[u],
+            "computed_at": now,
+            "categories": {
+                categories[c]: {"weekday_rates": rates[u, c].tolist(), "recurring": sorted(charges.get((u, c), []))}
+                for c in cats
+            },
+        })
+    return docs
+
+async def refresh_forecasts(db, users: list, now: datetime = None) -> int:
+    """Recomputes and stores forecasts for `users`; returns how many were written."""
+    now = now or datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    start = today - timedelta(days=HISTORY_DAYS)
+    user_ids = [u["id"] for u in users]
+    rows = await _history(db, user_ids, start, today + timedelta(days=1))
+    recurring = await db.recurring.find(
+        {"user_id": {"$in": user_ids}}, {"_id": 0, "user_id": 1, "category": 1, "expected_amount": 1, "interval_days": 1, "next_expected_date": 1}
+    ).to_list(length=None)
+    docs = build_forecasts(users, rows, recurring, now)
+    if docs:
+        await db.forecasts.bulk_write([ReplaceOne({"user_id": d["user_id"]}, d, upsert=True) for d in docs], ordered=False)
+        # Budgets show the projection
+        await bump_data_versions(db, [d["user_id"] for d in docs])
+    return len(docs)
+
+async def forecast_all(db, now: datetime = None) -> dict:
+    """The batch job: every user, BATCH_USERS at a time."""
+    written = 0
+    batch = []
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "currency": 1}):
+        batch.append(user)
+        if len(batch) >= BATCH_USERS:
+            written += await refresh_forecasts(db, batch, now)
+            batch = []
+    if batch:
+        written += await refresh_forecasts(db, batch, now)
+    return {"forecasts": written}
+
+async def get_forecast(db, user: dict):
+    """The stored forecast for `user` (possibly stale), or None."""
+    return await db.forecasts.find_one({"user_id": user["id"]}, {"_id": 0})
+
+def main():
+    from app.database import get_database, ensure_indexes
+
+    async def run():
+        db = get_database()
+        await ensure_indexes()
+        return await forecast_all(db)
+
+    print(asyncio.run(run()))
+
+if __name__ == "__main__":
+    main()
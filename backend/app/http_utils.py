@@ -0,0 +1,222 @@
+"""
+Conditional GETs and response compression.
+
+Every user document carries a `data_version` counter. Writes that change
+what a GET returns call `bump_data_version` once the write has landed, so a
+version is never paired with older data. ETags for the user's GETs are a
+hash of (user, data_version, path and query, deployment), which needs only
+the user document already loaded for authentication: a matching
+If-None-Match is answered 304 before the route runs its query.
+
+    etag = data_etag(request, current_user)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    ...
+    return ORJSONResponse(body, headers=etag_headers(etag))
+
+CompressionMiddleware encodes text responses of at least COMPRESS_MIN_BYTES
+with brotli (when the `brotli` package is installed) or gzip, whichever the
+client prefers. A compressed response is a different representation, so its
+ETag gets an encoding suffix; `etag_matches` accepts any suffix.
+"""
+import hashlib
+import os
+import zlib
+from app.currency import FX_RATES_FILE
+from app.cache_utils import data_changed_stamp
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 11 is several times slower for a few percent on JSON
+
+COMPRESSIBLE_TYPES = ("application/json", "text/csv", "text/plain", "text/html")
+ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+def _deployment_tag() -> str:
+    # Converted totals depend on the FX table, which only changes with a deploy
+    try:
+        stat = os.stat(FX_RATES_FILE)
+        fx = f"{stat.st_mtime_ns}:{stat.st_size}"
+    except OSError:
+        fx = ""
+    return f"{os.getenv('ETAG_SALT', '')}:{fx}"
+
+_DEPLOYMENT = _deployment_tag()
+
+async def bump_data_version(db, user_id: str):
+    # The stamp is what other workers drop their per-user cache entries on (app.cache_utils)
+    await db.users.update_one({"id": user_id}, {"$inc": {"data_version": 1}, "$set": data_changed_stamp()})
+
+async def bump_data_versions(db, user_ids: list):
+    """bump_data_version for many users (batch jobs) in one write."""
+    await db.users.update_many({"id": {"$in": user_ids}}, {"$inc": {"data_version": 1}, "$set": data_changed_stamp()})
+
+def data_etag(request, user: dict, extra: str = "") -> str:
+    """`extra` is for bodies that also change without a write, such as ones that depend on today's date."""
+    key = f"{user['id']}:{user.get('data_version', 0)}:{request.url.path}?{request.url.query}:{_DEPLOYMENT}:{extra}"
+    return f'"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        for suffix in ENCODING_SUFFIXES.values():
+            if tag.endswith(suffix + '"'):
+                tag = tag[:-len(suffix) - 1] + '"'
+                break
+        if tag == etag:
+            return True
+    return False
+
+def etag_headers(etag: str) -> dict:
+    # Clients may reuse the body only after revalidating it
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def negotiate_encoding(accept_encoding: str):
+    """"br", "gzip" or None from an Accept-Encoding header; brotli wins ties."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    star = weights.get("*", 0.0)
+    candidates = [(weights.get("br", star), 1, "br")] if brotli is not None else []
+    candidates.append((weights.get("gzip", star), 0, "gzip"))
+    q, _, encoding = max(candidates)
+    return encoding if q > 0 else None
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """`flush` sends out everything so far, so a streamed body is not held back."""
+        if self.encoding == "br":
+            return self.compressor.process(data) + (self.compressor.flush() if flush else b"")
+        return self.compressor.compress(data) + (self.compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self) -> bytes:
+        return self.compressor.finish() if self.encoding == "br" else self.compressor.flush()
+
+class CompressionMiddleware:
+    """
+    Pure ASGI. Buffers the body until it reaches `minimum_size` (or ends),
+    then either sends it as is or compresses it and every following chunk.
+    Event streams, already encoded bodies and binary types pass through.
+    Every compressible response carries Vary: Accept-Encoding, whether or not
+    this one was compressed, so shared caches keep the variants apart.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = negotiate_encoding(accept) if accept else None
+        if encoding is None:
+            async def varying_send(message):
+                if message["type"] == "http.response.start" and self._compressible(message):
+                    message = {**message, "headers": self._vary(message.get("headers", ()))}
+                await send(message)
+            return await self.app(scope, receive, varying_send)
+
+        start = None
+        buffered = []
+        size = 0
+        encoder = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, size, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                passthrough = not self._compressible(message)
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                buffered.append(body)
+                size += len(body)
+                if size < self.minimum_size:
+                    if more:
+                        return
+                    # Too small to be worth it; send the original response
+                    await send({**start, "headers": self._vary(start.get("headers", ()))})
+                    return await send({"type": "http.response.body", "body": b"".join(buffered)})
+                encoder = _Encoder(encoding)
+                body = b"".join(buffered)
+                data = encoder.compress(body, flush=more) + (b"" if more else encoder.finish())
+                await send({**start, "headers": self._headers(start, encoding, None if more else len(data))})
+                return await send({"type": "http.response.body", "body": data, "more_body": more})
+
+            data = encoder.compress(body, flush=more) + (b"" if more else encoder.finish())
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, compressing_send)
+
+    @staticmethod
+    def _compressible(start) -> bool:
+        headers = dict((k.lower(), v) for k, v in start.get("headers", ()))
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        return not (
+            start["status"] < 200 or start["status"] in (204, 304)
+            or b"content-encoding" in headers
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    @staticmethod
+    def _vary(headers) -> list:
+        vary = None
+        kept = []
+        for name, value in headers:
+            if name.lower() == b"vary":
+                vary = value
+            else:
+                kept.append((name, value))
+        if vary and b"accept-encoding" in vary.lower():
+            kept.append((b"vary", vary))
+        else:
+            kept.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        return kept
+
+    @classmethod
+    def _headers(cls, start, encoding: str, length):
+        headers = []
+        for name, value in cls._vary(start.get("headers", ())):
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"etag" and value.endswith(b'"'):
+                value = value[:-1] + ENCODING_SUFFIXES[encoding].encode() + b'"'
+            headers.append((name, value))
+        headers.append((b"content-encoding", encoding.encode()))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return headers
@@ -0,0 +1,126 @@
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from bson import Binary
+from pymongo import ReplaceOne
+from app.loaders import pil
+from app.http_utils import bump_data_versions
+from app.task_utils import enqueue, handler
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each stored derivative
+DERIVATIVE_SIZES = {"thumb": 192, "medium": 960}
+QUALITY = {"thumb": 70, "medium": 80}
+
+# Pillow releases the GIL while decoding, resizing and encoding, so a small
+# thread pool gives real parallelism without pickling images between processes
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("IMAGE_WORKERS", "2")), thread_name_prefix="receipt-img")
+
+def _output_format():
+    from PIL import features
+    return ("WEBP", "image/webp") if features.check("webp") else ("JPEG", "image/jpeg")
+
+def decode_base64_image(image_base64: str) -> bytes:
+    # Clients sometimes send a data URL rather than bare base64
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.split(",", 1)[1]
+    return base64.b64decode(image_base64)
+
+def make_derivatives(image_bytes: bytes) -> dict:
+    """Returns {size_name: {"data", "mime", "width", "height", "etag"}} for every DERIVATIVE_SIZES entry."""
+    imaging = pil()
+    fmt, mime = _output_format()
+    image = imaging.ImageOps.exif_transpose(imaging.Image.open(io.BytesIO(image_bytes)))
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    derivatives = {}
+    # Largest first so each step downsamples the previous result instead of the full original
+    for name, edge in sorted(DERIVATIVE_SIZES.items(), key=lambda kv: -kv[1]):
+        image.thumbnail((edge, edge), imaging.Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "WEBP":
+            image.save(out, format=fmt, quality=QUALITY[name], method=4)
+        else:
+            image.save(out, format=fmt, quality=QUALITY[name], optimize=True)
+        data = out.getvalue()
+        derivatives[name] = {
+            "data": data,
+            "mime": mime,
+            "width": image.width,
+            "height": image.height,
+            "etag": hashlib.sha1(data).hexdigest()[:16],
+        }
+    return derivatives
+
+async def render_derivatives(expense: dict) -> dict:
+    """Thumbnail/medium renditions of an expense's receipt, built off the event loop; {} if there is none or it fails."""
+    image_base64 = expense.get("receipt_image_base64")
+    if not image_base64:
+        return {}
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_pool, make_derivatives, decode_base64_image(image_base64))
+    except Exception:
+        logger.exception("Receipt derivative generation failed", extra={"expense_id": expense["id"]})
+        return {}
+
+def _derivative_writes(expense: dict, derivatives: dict) -> list:
+    return [
+        ReplaceOne(
+            {"expense_id": expense["id"], "size": name},
+            {
+                "expense_id": expense["id"],
+                "user_id": expense["user_id"],
+                "size": name,
+                "mime": d["mime"],
+                "width": d["width"],
+                "height": d["height"],
+                "etag": d["etag"],
+                "data": Binary(d["data"]),
+                "created_at": datetime.utcnow(),
+            },
+            upsert=True,
+        )
+        for name, d in derivatives.items()
+    ]
+
+async def generate_receipt_derivatives(db, expense: dict):
+    """Builds and stores the derivatives of one receipt now (first view of an older receipt)."""
+    derivatives = await render_derivatives(expense)
+    if derivatives:
+        # No data_version bump: a gallery page of older receipts would invalidate every
+        # ETag once per image. The listing keeps the unversioned URL, which revalidates,
+        # until the user's next write refreshes it.
+        await db.receipt_derivatives.bulk_write(_derivative_writes(expense, derivatives), ordered=False)
+    return derivatives
+
+def queue_receipt_derivatives(expense: dict):
+    """Renders the derivatives after the response, batched with other saves."""
+    payload = {k: expense[k] for k in ("id", "user_id", "receipt_image_base64")}
+    enqueue("receipt_derivatives", payload, key=expense["user_id"])
+
+@handler("receipt_derivatives")
+async def store_receipt_derivatives(db, expenses: list):
+    # An expense saved twice in one batch is rendered once, from its latest image
+    latest = list({e["id"]: e for e in expenses}.values())
+    rendered = await asyncio.gather(*(render_derivatives(e) for e in latest))
+    # Receipts removed while queued or rendering get nothing
+    live = {
+        e["id"] async for e in db.expenses.find(
+            {"id": {"$in": [e["id"] for e in latest]}, "receipt_image_base64": {"$nin": [None, ""]}}, {"_id": 0, "id": 1}
+        )
+    }
+    done = [(e, derivatives) for e, derivatives in zip(latest, rendered) if derivatives and e["id"] in live]
+    if done:
+        await db.receipt_derivatives.bulk_write([w for e, d in done for w in _derivative_writes(e, d)], ordered=False)
+        await bump_data_versions(db, list({e["user_id"] for e, _ in done}))
+
+async def delete_receipt_derivatives(db, expense_id: str):
+    await db.receipt_derivatives.delete_many({"expense_id": expense_id})
@@ -0,0 +1,126 @@
+"""
+Shared-expense ledger for groups.
+
+Money is kept in integer minor units (paise, cents) so that balances built
+from thousands of splits add up exactly. Every group document carries
+`balances`, member id -> minor units owed to that member (negative: the
+member owes). A shared expense changes balances by its `deltas`: the payer
+is credited the amount and every participant is debited their share. A
+write applies the deltas with one $inc on the group, and an edit applies the
+old deltas negated together with the new ones, so reading balances never
+touches the expenses.
+
+`settle` turns balances into transfers: exactly matching debts and credits
+first, then repeatedly the largest debtor pays the largest creditor, with
+both sides held in heaps. That needs at most n - 1 transfers for n
+members with a balance, in O(n log n). A true minimum is NP-hard (it is a
+subset-sum partition); greedy is what the usual bill-splitting apps do.
+"""
+import heapq
+import math
+from app.models import SplitType
+
+class SplitError(ValueError):
+    """A split that does not add up or names someone outside the group."""
+
+def to_minor(amount: float) -> int:
+    return int(round(amount * 100))
+
+def to_major(minor: int) -> float:
+    return minor / 100
+
+def _apportion(total: int, weights: dict) -> dict:
+    """Splits `total` minor units by weight; leftover units go to the largest remainders."""
+    weight_sum = sum(weights.values())
+    exact = {m: total * w / weight_sum for m, w in weights.items()}
+    shares = {m: int(v) for m, v in exact.items()}
+    leftover = total - sum(shares.values())
+    for m in sorted(exact, key=lambda m: exact[m] - shares[m], reverse=True)[:leftover]:
+        shares[m] += 1
+    return shares
+
+def compute_shares(amount: float, split_type: SplitType, member_ids: list, participants: list = None, split: dict = None) -> dict:
+    """Member id -> minor units owed for one expense."""
+    total = to_minor(amount)
+    known = set(member_ids)
+    if split_type == SplitType.EQUAL:
+        participants = list(dict.fromkeys(participants or member_ids))
+        unknown = [m for m in participants if m not in known]
+        if unknown:
+            raise SplitError(f"Not members of this group: {', '.join(unknown)}")
+        return _apportion(total, {m: 1 for m in participants})
+
+    if not split:
+        raise SplitError(f"A {split_type.value} split needs `split`")
+    unknown = [m for m in split if m not in known]
+    if unknown:
+        raise SplitError(f"Not members of this group: {', '.join(unknown)}")
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in split.values()):
+        raise SplitError("Split values must be finite numbers")
+    if any(v < 0 for v in split.values()):
+        raise SplitError("Split values cannot be negative")
+    if split_type == SplitType.EXACT:
+        shares = {m: to_minor(v) for m, v in split.items()}
+        if sum(shares.values()) != total:
+            raise SplitError(f"Exact split adds up to {to_major(sum(shares.values())):.2f}, not {to_major(total):.2f}")
+        return shares
+    if not sum(split.values()):
+        raise SplitError("Split weights add up to zero")
+    return _apportion(total, split)
+
+def deltas(expense: dict, sign: int = 1) -> dict:
+    """Balance changes, in minor units, from a stored group expense (sign=-1 undoes it)."""
+    changes = {expense["paid_by"]: sign * to_minor(expense["amount"])}
+    for member, share in expense["shares"].items():
+        changes[member] = changes.get(member, 0) - sign * share
+    return {m: v for m, v in changes.items() if v}
+
+def merge(*changes: dict) -> dict:
+    merged = {}
+    for change in changes:
+        for member, value in change.items():
+            merged[member] = merged.get(member, 0) + value
+    return {m: v for m, v in merged.items() if v}
+
+def inc_update(changes: dict) -> dict:
+    return {"$inc": {f"balances.{member}": value for member, value in changes.items()}}
+
+def rebuild_balances(expenses) -> dict:
+    """Balances from scratch, for checking the incremental ones."""
+    balances = {}
+    for expense in expenses:
+        for member, value in deltas(expense).items():
+            balances[member] = balances.get(member, 0) + value
+    return balances
+
+def settle(balances: dict) -> list:
+    """(from member, to member, minor units) transfers that clear `balances`."""
+    transfers = []
+    owed = {m: v for m, v in balances.items() if v > 0}
+    owing = {m: -v for m, v in balances.items() if v < 0}
+
+    # A debt that exactly matches a credit clears both with one transfer
+    by_amount = {}
+    for member, amount in owing.items():
+        by_amount.setdefault(amount, []).append(member)
+    for creditor, amount in list(owed.items()):
+        debtors = by_amount.get(amount)
+        if debtors:
+            debtor = debtors.pop()
+            transfers.append((debtor, creditor, amount))
+            del owed[creditor], owing[debtor]
+
+    creditors = [(-amount, member) for member, amount in owed.items()]
+    debtors = [(-amount, member) for member, amount in owing.items()]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
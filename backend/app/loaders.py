@@ -0,0 +1,65 @@
+"""
+Deferred imports for the heavy rendering/parsing libraries.
+
+ReportLab, pdfplumber, PIL and pytesseract together cost a large share of
+worker startup time and idle memory, but only a few requests need them.
+Callers fetch them through these accessors at the point of use; `preload()`
+imports everything up front for deployments that prefer warm workers.
+"""
+import functools
+import importlib
+import os
+from types import SimpleNamespace
+
+HEAVY_MODULES = {
+    "reportlab": [
+        "reportlab.lib.pagesizes", "reportlab.lib.colors", "reportlab.lib.styles",
+        "reportlab.platypus", "reportlab.graphics.shapes",
+        "reportlab.graphics.charts.piecharts", "reportlab.graphics.charts.legends",
+    ],
+    "pdfplumber": ["pdfplumber"],
+    "pil": ["PIL.Image", "PIL.ImageOps", "PIL.ImageEnhance"],
+    "pytesseract": ["pytesseract"],
+}
+
+@functools.lru_cache(maxsize=None)
+def reportlab() -> SimpleNamespace:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.charts.legends import Legend
+    return SimpleNamespace(
+        A4=A4, colors=colors, getSampleStyleSheet=getSampleStyleSheet, ParagraphStyle=ParagraphStyle,
+        SimpleDocTemplate=SimpleDocTemplate, Table=Table, TableStyle=TableStyle, Paragraph=Paragraph,
+        Spacer=Spacer, Image=Image, Drawing=Drawing, Pie=Pie, Legend=Legend,
+    )
+
+@functools.lru_cache(maxsize=None)
+def pdfplumber():
+    import pdfplumber
+    return pdfplumber
+
+@functools.lru_cache(maxsize=None)
+def pil() -> SimpleNamespace:
+    from PIL import Image, ImageOps, ImageEnhance
+    return SimpleNamespace(Image=Image, ImageOps=ImageOps, ImageEnhance=ImageEnhance)
+
+@functools.lru_cache(maxsize=None)
+def pytesseract():
+    import pytesseract
+    return pytesseract
+
+def preload(groups=None):
+    """Imports the given groups (default: PRELOAD_HEAVY_LIBS, comma separated, or "all")."""
+    if groups is None:
+        setting = os.getenv("PRELOAD_HEAVY_LIBS", "")
+        groups = list(HEAVY_MODULES) if setting == "all" else [g for g in setting.split(",") if g]
+    loaded = []
+    for group in groups:
+        for module in HEAVY_MODULES[group]:
+            importlib.import_module(module)
+        loaded.append(group)
+    return loaded
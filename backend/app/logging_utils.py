@@ -0,0 +1,166 @@
+import collections
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+LOG_SINKS = os.getenv("LOG_SINKS", "stdout")  # comma separated: stdout, stderr, file:/path/to/app.log
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.05"))
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra=` and is a structured field
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class ContextFilter(logging.Filter):
+    """Stamps the current request id on the record while still on the request's task."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class DebugSampler(logging.Filter):
+    """Keeps only a fraction of DEBUG records; higher levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Appends records to a bounded buffer for the listener thread without ever
+    blocking the event loop. When the buffer is full the record is dropped and counted.
+    """
+
+    dropped = 0
+
+    def __init__(self, buffer: collections.deque, capacity: int):
+        super().__init__(buffer)
+        self.capacity = capacity
+
+    def enqueue(self, record):
+        if len(self.queue) >= self.capacity:
+            DroppingQueueHandler.dropped += 1
+        else:
+            self.queue.append(record)
+
+    def prepare(self, record):
+        # Format args into msg here but keep extra fields for the JSON formatter
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_text = logging.Formatter().formatException(record.exc_info) if record.exc_info else None
+        record.exc_info = None
+        return record
+
+class BufferedListener(threading.Thread):
+    """
+    Drains the buffer into the sinks every LOG_FLUSH_INTERVAL seconds.
+    Polling instead of waking per record keeps the listener from competing
+    with request handlers for the GIL on every log call.
+    """
+
+    def __init__(self, buffer: collections.deque, handlers, interval: float):
+        super().__init__(name="log-listener", daemon=True)
+        self.buffer = buffer
+        self.handlers = handlers
+        self.interval = interval
+        self.stopping = threading.Event()
+
+    def flush(self):
+        while self.buffer:
+            record = self.buffer.popleft()
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        for handler in self.handlers:
+            handler.flush()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+        for handler in self.handlers:
+            handler.close()
+
+def _build_sinks(spec: str):
+    handlers = []
+    for sink in [s.strip() for s in spec.split(",") if s.strip()]:
+        if sink == "stdout":
+            handlers.append(logging.StreamHandler(sys.stdout))
+        elif sink == "stderr":
+            handlers.append(logging.StreamHandler(sys.stderr))
+        elif sink.startswith("file:"):
+            handlers.append(logging.handlers.WatchedFileHandler(sink[len("file:"):]))
+        else:
+            raise ValueError(f"Unknown log sink: {sink}")
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+    )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+_listener = None
+
+def setup_logging(level: str = LOG_LEVEL, sinks: str = LOG_SINKS, sample_rate: float = LOG_DEBUG_SAMPLE_RATE):
+    """
+    Routes the "app" logger tree through a bounded buffer to a background
+    listener thread that owns the (possibly slow) sinks.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    buffer = collections.deque()
+    queue_handler = DroppingQueueHandler(buffer, LOG_QUEUE_SIZE)
+    queue_handler.addFilter(DebugSampler(sample_rate))
+    queue_handler.addFilter(ContextFilter())
+
+    logger = logging.getLogger("app")
+    logger.setLevel(level)
+    logger.handlers = [queue_handler]
+    logger.propagate = False
+
+    _listener = BufferedListener(buffer, _build_sinks(sinks), LOG_FLUSH_INTERVAL)
+    _listener.start()
+    return _listener
+
+def shutdown_logging():
+    """Flushes queued records to the sinks; call on application shutdown."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
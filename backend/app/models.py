@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Dict, Optional, List
+from datetime import datetime, timezone
 from enum import Enum
+from app.currency import supported_currency
 
 class ExpenseSource(str, Enum):
     MANUAL = "manual"
@@ -18,11 +19,22 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+    @field_validator("currency")
+    @classmethod
+    def known_currency(cls, value: str) -> str:
+        # Totals are converted into the user's currency, so it needs FX rates
+        return supported_currency(value)
+
 class UserUpdate(BaseModel):
     name: Optional[str] = None
     phone: Optional[str] = None
     currency: Optional[str] = None
 
+    @field_validator("currency")
+    @classmethod
+    def known_currency(cls, value: Optional[str]) -> Optional[str]:
+        return value if value is None else supported_currency(value)
+
 class UserInDB(UserBase):
     id: str
     created_at: datetime
@@ -46,13 +58,42 @@ class ExpenseBase(BaseModel):
     source: ExpenseSource = ExpenseSource.MANUAL
     currency: str = "INR"
 
+    @field_validator("date")
+    @classmethod
+    def naive_utc(cls, value: datetime) -> datetime:
+        # Clients send "...Z" (Date.toISOString()); stored dates are naive UTC, as Mongo returns them
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
 class ExpenseCreate(ExpenseBase):
-    pass
+    @field_validator("currency")
+    @classmethod
+    def known_currency(cls, value: str) -> str:
+        # Checked on input only; Expense reads back whatever was stored before
+        return supported_currency(value)
 
 class Expense(ExpenseBase):
     id: str
     user_id: str
     created_at: datetime
+    duplicate_of: Optional[str] = None # id of the expense this one duplicates
+    duplicate_score: Optional[float] = None
+
+class RecurringExpense(BaseModel):
+    id: str
+    user_id: str
+    vendor: Optional[str] = None
+    category: Optional[str] = None
+    period: str # weekly, monthly, quarterly, yearly
+    interval_days: float
+    occurrences: int
+    average_amount: float
+    expected_amount: float
+    last_date: datetime
+    next_expected_date: datetime
+    confidence: float
+    analyzed_at: datetime
 
 class BudgetBase(BaseModel):
     category: str
@@ -67,6 +108,7 @@ class Budget(BudgetBase):
     id: str
     user_id: str
     current_spent: float = 0.0
+    projected_spent: Optional[float] = None  # month-end forecast, see app.forecast_utils
 
 class Token(BaseModel):
     access_token: str
@@ -74,3 +116,58 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+
+class GroupMemberCreate(BaseModel):
+    name: str
+    email: Optional[EmailStr] = None  # links the member to that account when it exists
+
+class GroupMember(GroupMemberCreate):
+    id: str
+    user_id: Optional[str] = None
+
+class GroupCreate(BaseModel):
+    name: str
+    currency: str = "INR"
+    members: List[GroupMemberCreate] = []  # besides the creator
+
+class Group(BaseModel):
+    id: str
+    name: str
+    currency: str
+    owner_id: str
+    members: List[GroupMember]
+    balances: dict = {}  # member id -> amount owed to them (negative: they owe)
+    created_at: datetime
+
+class SplitType(str, Enum):
+    EQUAL = "equal"    # among `participants`, all members by default
+    EXACT = "exact"    # `split` maps member id -> amount
+    SHARES = "shares"  # `split` maps member id -> weight
+
+class GroupExpenseCreate(BaseModel):
+    amount: float = Field(gt=0)
+    description: Optional[str] = None
+    date: datetime
+    paid_by: str
+    split_type: SplitType = SplitType.EQUAL
+    participants: Optional[List[str]] = None
+    split: Optional[Dict[str, float]] = None
+
+class GroupExpense(GroupExpenseCreate):
+    id: str
+    group_id: str
+    kind: str = "expense"  # or "payment", a recorded settlement transfer
+    shares: dict = {}      # member id -> amount owed for this expense
+    created_by: str
+    created_at: datetime
+
+class GroupPaymentCreate(BaseModel):
+    from_member: str
+    to_member: str
+    amount: float = Field(gt=0)
+    date: Optional[datetime] = None
+
+class Transfer(BaseModel):
+    from_member: str
+    to_member: str
+    amount: float
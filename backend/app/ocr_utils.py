@@ -1,21 +1,29 @@
-import pytesseract
-from PIL import Image, ImageOps, ImageEnhance
+from app.loaders import pil, pytesseract
+from app.task_utils import enqueue, handler
+from app.cache_utils import namespace
+from pymongo.errors import BulkWriteError
 import io
+import os
+import hashlib
+import uuid
 import re
 import base64
-import os
+import logging
+import time
 
-LOG_FILE = "/Users/suryansh/ExpenseTracker/ExpenseTracker/backend/ocr_debug.log"
+logger = logging.getLogger(__name__)
 
-def log_debug(msg):
-    with open(LOG_FILE, "a") as f:
-        f.write(f"{msg}\n")
+# OCR results by image hash, shared by the workers; the learning lookup below only logs, so a result depends on the image alone
+_results = namespace("receipt_ocr", max_entries=int(os.getenv("OCR_CACHE_SIZE", "64")), ttl=86400, shared=True)
 
-def preprocess_image(image: Image.Image) -> Image.Image:
+def preprocess_image(image):
     """
     Simulates a document scanner effect by converting to grayscale,
     increasing contrast, and sharpening.
     """
+    imaging = pil()
+    Image, ImageOps, ImageEnhance = imaging.Image, imaging.ImageOps, imaging.ImageEnhance
+
     # Resize if too large (improves OCR speed and prevents timeouts)
     max_size = 1280
     if max(image.size) > max_size:
@@ -36,13 +44,24 @@ def preprocess_image(image: Image.Image) -> Image.Image:
     
     return image
 
+def receipt_key(image_base64: str) -> str:
+    return hashlib.sha256(image_base64.encode()).hexdigest()
+
+async def cached_receipt(key: str):
+    return await _results.get(key)
+
+async def remember_receipt(key: str, data: dict):
+    if not data.get("error"):
+        await _results.set(key, data)
+
 async def extract_receipt_data(image_base64: str, db=None):
-    log_debug("extract_receipt_data started")
+    started = time.perf_counter()
+    logger.debug("extract_receipt_data started")
     try:
         # Decode base64 image
-        log_debug("Decoding base64...")
+        logger.debug("Decoding base64")
         image_data = base64.decodebytes(image_base64.encode('utf-8'))
-        image = Image.open(io.BytesIO(image_data))
+        image = pil().Image.open(io.BytesIO(image_data))
         
         # Preprocess to look like a "Scan"
         scanned_image = preprocess_image(image)
@@ -53,9 +72,9 @@ async def extract_receipt_data(image_base64: str, db=None):
         scanned_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
         
         # Perform OCR on the preprocessed image
-        log_debug("Starting Tesseract...")
-        text = pytesseract.image_to_string(scanned_image)
-        log_debug(f"Tesseract complete. Text length: {len(text)}")
+        ocr_started = time.perf_counter()
+        text = pytesseract().image_to_string(scanned_image)
+        logger.debug("Tesseract complete", extra={"text_length": len(text), "ocr_ms": round((time.perf_counter() - ocr_started) * 1000, 2)})
         
         # Regex patterns for total amount
         # Looks for "Total", "Grand Total", POS "Sale", etc.
@@ -185,11 +204,11 @@ async def extract_receipt_data(image_base64: str, db=None):
             
         # ML Learning: Apply Previous Corrections
         if db is not None and vendor:
-            log_debug(f"Checking learning DB for vendor: {vendor}")
+            logger.debug("Checking learning DB", extra={"vendor": vendor})
             try:
                 # Look for most recent corrections for this vendor
                 prev_corrections = await db.ocr_learning.find({"vendor": vendor.upper()}).sort("created_at", -1).to_list(length=5)
-                log_debug(f"Found {len(prev_corrections)} previous corrections")
+                logger.debug("Previous corrections found", extra={"vendor": vendor, "count": len(prev_corrections)})
                 if prev_corrections:
                     # If we found corrections, we could use them for smarter regex or direct replacement
                     # For now, let's just flag higher accuracy if we see consistent manual overrides
@@ -200,7 +219,7 @@ async def extract_receipt_data(image_base64: str, db=None):
                             # amount = disc["amount"]["corrected"] # High risk to auto-apply, better to flag
                             pass
             except Exception as e:
-                print(f"Learning Lookup Error: {e}")
+                logger.warning("Learning lookup failed", extra={"vendor": vendor, "error": str(e)})
             
         # Date extraction
         date_patterns = [
@@ -263,9 +282,7 @@ async def extract_receipt_data(image_base64: str, db=None):
             }
         }
     except Exception as e:
-        log_debug(f"CRITICAL OCR ERROR: {str(e)}")
-        import traceback
-        log_debug(traceback.format_exc())
+        logger.exception("Receipt OCR failed", extra={"duration_ms": round((time.perf_counter() - started) * 1000, 2)})
         return {
             "amount": None, 
             "description": "Error parsing receipt", 
@@ -273,3 +290,56 @@ async def extract_receipt_data(image_base64: str, db=None):
             "items": [],
             "error": str(e)
         }
+
+def ocr_corrections(original: dict, amount: float, gst_details: dict) -> dict:
+    """Fields where the saved expense differs from what OCR read, as {field: {original, corrected}}."""
+    discrepancies = {}
+    if original.get("amount") != amount:
+        discrepancies["amount"] = {"original": original.get("amount"), "corrected": amount}
+
+    if original.get("gst_details"):
+        orig_gst = original["gst_details"]
+        new_gst = gst_details or {}
+        for key in ["cgst", "sgst", "igst", "total_gst"]:
+            if orig_gst.get(key) != new_gst.get(key):
+                discrepancies.setdefault("gst_details", {})[key] = {"original": orig_gst.get(key), "corrected": new_gst.get(key)}
+    return discrepancies
+
+def capture_corrections(user_id: str, expense):
+    """ML Learning: queues what the user fixed in an OCR'd receipt; compared and stored after the response."""
+    from datetime import datetime
+    if not (expense.original_ocr_data and expense.vendor):
+        return
+    enqueue("ocr_learning", {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "vendor": expense.vendor,
+        "original": expense.original_ocr_data,
+        "amount": expense.amount,
+        "gst_details": expense.gst_details,
+        "created_at": datetime.utcnow(),
+    }, key=user_id)
+
+@handler("ocr_learning")
+async def store_corrections(db, captures: list):
+    """Learning entries for saved receipts, one insert_many per batch. Ids are fixed at capture, so a retry only re-inserts what is missing."""
+    entries = []
+    for capture in captures:
+        discrepancies = ocr_corrections(capture["original"], capture["amount"], capture["gst_details"])
+        if discrepancies:
+            entries.append({
+                "id": capture["id"],
+                "user_id": capture["user_id"],
+                "vendor": capture["vendor"].upper(),
+                "raw_text": capture["original"].get("raw_text"),
+                "discrepancies": discrepancies,
+                "created_at": capture["created_at"],
+            })
+    if not entries:
+        return
+    try:
+        await db.ocr_learning.insert_many(entries, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", ())
+        if e.details.get("writeConcernErrors") or any(err.get("code") != 11000 for err in errors):
+            raise
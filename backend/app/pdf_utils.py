@@ -1,140 +1,352 @@
-import pdfplumber
+"""
+Bank statement extraction.
+
+Statements are tables: a header row naming the columns, then one row per
+transaction, sometimes with a wrapped second line for the reference. The
+parser reads each page once with `extract_words`, groups words into lines by
+position, and finds the header line using the column labels of a template
+(picked by the bank name on the first page, or the generic one). The header
+fixes column boundaries and the date format for the rest of the document;
+each following line with a date in the date column starts a transaction.
+
+Documents without a recognisable header (chat-style UPI exports) fall back
+to the text scan, as do the pages before the header first appears. Results
+are cached by the hash of the PDF in the shared cache (app.cache_utils), so
+a re-upload of the same statement, to any worker, skips parsing entirely.
+"""
+from app.loaders import pdfplumber
 import re
 import io
 import base64
+import bisect
+import hashlib
+import logging
+import os
+from collections import namedtuple
 from datetime import datetime
+from app.cache_utils import namespace
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_CACHE_SIZE = int(os.getenv("STATEMENT_CACHE_SIZE", "128"))
+STATEMENT_CACHE_TTL = 7 * 86400
+LINE_TOLERANCE = 3  # points of vertical drift within one printed line
+
+StatementTemplate = namedtuple("StatementTemplate", "name marker headers date_formats")
+
+# Normalized header label -> column role. Roles other than date, details,
+# type, amount, debit and credit are recognised only so their words are not
+# read as part of a neighbouring column.
+COMMON_HEADERS = {
+    "date": "date", "transaction date": "date", "value date": "value_date",
+    "transaction details": "details", "details": "details", "description": "details",
+    "narration": "details", "particulars": "details",
+    "type": "type", "amount": "amount",
+    "debit": "debit", "withdrawal": "debit", "withdrawals": "debit",
+    "credit": "credit", "deposit": "credit", "deposits": "credit",
+    "balance": "balance",
+}
+BANK_HEADERS = {
+    "HDFC": {"withdrawal amt": "debit", "deposit amt": "credit", "chq/ref no": "ref", "value dt": "value_date", "closing balance": "balance"},
+    "ICICI": {"transaction remarks": "details", "withdrawal amount": "debit", "deposit amount": "credit", "cheque number": "ref", "s no": "serial"},
+    "SBI": {"txn date": "date", "ref no/cheque no": "ref"},
+    "Axis": {"tran date": "date", "chq no": "ref", "init br": "branch"},
+    "Kotak": {"chq/ref no": "ref", "dr/cr": "type"},
+}
+GENERIC_DATE_FORMATS = (
+    "%d %b %Y", "%d %B %Y", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d-%m-%y",
+    "%d-%b-%Y", "%d-%b-%y", "%d.%m.%Y", "%Y-%m-%d",
+)
+
+# Every template knows every label, so an unexpected column is never read
+# as part of its neighbour; a bank's own labels win where they disagree, and
+# its date formats are tried first (dd/mm/yy against dd/mm/yyyy)
+ALL_HEADERS = {k: v for headers in [COMMON_HEADERS, *BANK_HEADERS.values()] for k, v in headers.items()}
+
+GENERIC = StatementTemplate("generic", None, ALL_HEADERS, GENERIC_DATE_FORMATS)
+TEMPLATES = [
+    StatementTemplate("HDFC", re.compile(r"\bHDFC\b"), {**ALL_HEADERS, **BANK_HEADERS["HDFC"]}, ("%d/%m/%y", "%d/%m/%Y")),
+    StatementTemplate("ICICI", re.compile(r"\bICICI\b"), {**ALL_HEADERS, **BANK_HEADERS["ICICI"]}, ("%d/%m/%Y", "%d-%m-%Y")),
+    StatementTemplate("SBI", re.compile(r"\bSBI\b|State Bank of India"), {**ALL_HEADERS, **BANK_HEADERS["SBI"]}, ("%d %b %Y", "%d/%m/%Y")),
+    StatementTemplate("Axis", re.compile(r"\bAxis\b"), {**ALL_HEADERS, **BANK_HEADERS["Axis"]}, ("%d-%m-%Y", "%d/%m/%Y")),
+    StatementTemplate("Kotak", re.compile(r"\bKotak\b"), {**ALL_HEADERS, **BANK_HEADERS["Kotak"]}, ("%d %b %Y", "%d/%m/%Y")),
+]
+MAX_LABEL_WORDS = max(len(label.split()) for label in GENERIC.headers)
+
+VENDOR_PATTERNS = [
+    r'Paid to\s+(.*?)(?:\s+UPI|$)',
+    r'To\s+(.*?)(?:\s+UPI|$)',
+    r'M/S\.\s+(.*?)(?:\s+UPI|$)',
+    r'Transaction details\s+(.*?)(?:\s+UPI|$)',
+    r'^UPI[-/](.*?)[-/]',
+    r'^POS\s+\S*\d\S*\s+(.*?)(?:\s+\d|$)',
+]
+TIME_PATTERN = re.compile(r'\d{1,2}:\d{2}\s?(?:AM|PM)', re.IGNORECASE)
+
+# Parsed rows by statement_key, shared by the workers
+_statements = namespace("statements", max_entries=STATEMENT_CACHE_SIZE, ttl=STATEMENT_CACHE_TTL, shared=True)
+
+def _normalize_label(text: str) -> str:
+    text = re.sub(r'\(.*?\)', ' ', text.lower())
+    text = re.sub(r'[^a-z0-9/ ]', ' ', text)
+    return re.sub(r'\s*/\s*', '/', " ".join(text.split()))
+
+def _guess_vendor(block_text: str) -> str:
+    # Skip things that look like times (08:43 PM)
+    block_text = " ".join(TIME_PATTERN.sub(' ', block_text).split())
+    for vp in VENDOR_PATTERNS:
+        vm = re.search(vp, block_text, re.IGNORECASE)
+        if vm and vm.group(1).strip():
+            return vm.group(1).strip()
+    # Fallback: the first words of the block
+    v_part = block_text.strip()
+    return v_part[:50] if v_part else "Statement Item"
+
+def _guess_category(description: str) -> str:
+    desc_lower = description.lower()
+    if any(kw in desc_lower for kw in ['swiggy', 'zomato', 'restaurant', 'food', 'hotel', 'pharmacy', 'homoeo', 'store', 'mart', 'kirana']):
+        return "Health" if any(kw in desc_lower for kw in ['pharmacy', 'homoeo', 'clinic', 'hospital']) else "Food"
+    if any(kw in desc_lower for kw in ['amazon', 'flipkart', 'myntra', 'shopping', 'lifestyle', 'mall']):
+        return "Shopping"
+    if any(kw in desc_lower for kw in ['uber', 'ola', 'taxi', 'fuel', 'petrol', 'transport', 'metro']):
+        return "Transport"
+    if any(kw in desc_lower for kw in ['starbucks', 'cafe', 'coffee', 'chai', 'tea']):
+        return "Coffee"
+    if any(kw in desc_lower for kw in ['jio', 'recharge', 'bill', 'electricity', 'water', 'gas', 'airtel']):
+        return "Bills"
+    return "Other"
+
+def _guess_payment_mode(text: str) -> str:
+    upper = text.upper()
+    if any(kw in upper for kw in ["CARD", "RUPAY", "VISA", "MASTERCARD", "POS "]):
+        return "card"
+    if "CASH" in upper or "ATM" in upper:
+        return "cash"
+    return "upi"  # Default for bank statements/UPI extracts
+
+def _expense(amount: float, block_text: str, when: datetime, mode_text: str = None) -> dict:
+    vendor = _guess_vendor(block_text)
+    return {
+        "amount": amount,
+        "description": vendor,
+        "vendor": vendor,
+        "category": _guess_category(vendor),
+        "date": when.isoformat(),
+        "source": "pdf",
+        "payment_mode": _guess_payment_mode(mode_text if mode_text is not None else block_text),
+    }
+
+def _parse_amount(text: str):
+    """(amount, is_credit) from a cell like "₹1,234.50", "1,234.50 Dr" or "INR 99"; None when not a number."""
+    text = text.replace("₹", "").replace(",", "").strip()
+    credit = None
+    suffix = re.search(r'\s*\b(Dr|Cr)\.?$', text, re.IGNORECASE)
+    if suffix:
+        credit = suffix.group(1).lower() == "cr"
+        text = text[:suffix.start()]
+    text = re.sub(r'^(?:INR|Rs\.?)\s*', '', text, flags=re.IGNORECASE)
+    try:
+        return abs(float(text)), credit
+    except ValueError:
+        return None, credit
+
+def _parse_date(text: str, formats: list):
+    """Parses the start of a date cell, moving the format that worked to the front of `formats`."""
+    tokens = text.replace(",", " ").split()
+    for n in dict.fromkeys((len(tokens), 3, 1)):
+        candidate = " ".join(tokens[:n])
+        if not candidate:
+            continue
+        for i, fmt in enumerate(formats):
+            try:
+                parsed = datetime.strptime(candidate, fmt)
+            except ValueError:
+                continue
+            if parsed.year < 1970:  # "%Y" also accepts "26"
+                continue
+            if i:
+                formats.insert(0, formats.pop(i))
+            return parsed
+    return None
+
+def _lines(words: list) -> list:
+    """Groups extract_words output into lines, top to bottom, each sorted left to right."""
+    lines = []
+    for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if lines and word["top"] - lines[-1][0]["top"] <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    for line in lines:
+        line.sort(key=lambda w: w["x0"])
+    return lines
+
+class _Layout:
+    """Column boundaries and roles read from a header line."""
+
+    def __init__(self, columns: list, header_text: str):
+        # columns: [(x0, x1, role)] left to right
+        self.roles = [role for _, _, role in columns]
+        self.bounds = [(left[1] + right[0]) / 2 for left, right in zip(columns, columns[1:])]
+        self.header_text = header_text
+
+    def cells(self, line: list) -> dict:
+        cells = {}
+        for word in line:
+            role = self.roles[bisect.bisect(self.bounds, (word["x0"] + word["x1"]) / 2)]
+            cells.setdefault(role, []).append(word["text"])
+        return {role: " ".join(texts) for role, texts in cells.items()}
+
+def _find_header(lines: list, template: StatementTemplate):
+    """(index of the header line, _Layout) or (None, None)."""
+    for index, line in enumerate(lines):
+        texts = [_normalize_label(w["text"]) for w in line]
+        columns = []
+        i = 0
+        while i < len(line):
+            for n in range(min(MAX_LABEL_WORDS, len(line) - i), 0, -1):
+                role = template.headers.get(" ".join(t for t in texts[i:i + n] if t))
+                if role:
+                    columns.append((line[i]["x0"], line[i + n - 1]["x1"], role))
+                    i += n
+                    break
+            else:
+                i += 1
+        roles = {role for _, _, role in columns}
+        if "date" in roles and roles & {"amount", "debit"} and len(columns) >= 3:
+            return index, _Layout(columns, " ".join(w["text"] for w in line))
+    return None, None
+
+def _pick_template(first_lines: list) -> StatementTemplate:
+    heading = " ".join(w["text"] for line in first_lines[:8] for w in line)
+    return next((t for t in TEMPLATES if t.marker.search(heading)), GENERIC)
+
+def _parse_table_page(lines: list, layout: _Layout, formats: list, rows: list):
+    current = None
+    previous_bottom = None
+    for line in lines:
+        cells = layout.cells(line)
+        when = _parse_date(cells["date"], formats) if "date" in cells else None
+        if when is not None:
+            current = {"when": when, "cells": cells, "details": [cells.get("details", "")]}
+            rows.append(current)
+        elif current is not None and previous_bottom is not None and line[0]["top"] - previous_bottom <= line[0]["bottom"] - line[0]["top"]:
+            # A wrapped line of the row above (time, reference, rest of the narration)
+            if cells.get("details"):
+                current["details"].append(cells["details"])
+        else:
+            current = None
+        previous_bottom = max(w["bottom"] for w in line)
+
+def _table_expenses(rows: list) -> list:
+    expenses = []
+    for row in rows:
+        cells = row["cells"]
+        type_text = cells.get("type", "").upper()
+        amount, credit = _parse_amount(cells.get("amount", ""))
+        if amount is None:
+            debit, _ = _parse_amount(cells.get("debit", ""))
+            deposit, _ = _parse_amount(cells.get("credit", ""))
+            amount, credit = (debit, False) if debit else (deposit, True)
+        if credit is None:
+            credit = type_text.startswith("CR")
+        if not amount or credit:
+            continue
+        details = " ".join(t for t in row["details"] if t).strip()
+        expenses.append(_expense(amount, details, row["when"], mode_text=details))
+    return expenses
+
+def _parse_text_page(text: str, expenses: list, last_date: list):
+    """The free-text scan, for statements without a column header."""
+    # Normalize text: convert all whitespace to single spaces and standardize line endings
+    normalized_text = re.sub(r'\s+', ' ', text)
+
+    # Pattern: Date (e.g. 27 Dec, 2025) ... (vendor/info) ... (₹/Amount)
+    # We use a non-greedy catch-all in between.
+    pattern = r'(\d{1,2}\s[A-Za-z]{3,},?\s\d{4})\s+(.*?)\s*[₹\u20b9]\s?([\d,]+(?:\.\d{0,2})?)'
+    found_in_page = False
+    for match in re.finditer(pattern, normalized_text):
+        when = _parse_date(match.group(1), list(GENERIC_DATE_FORMATS))
+        if when is None:
+            logger.debug("Statement date parsing failed", extra={"date_str": match.group(1)})
+            continue
+        found_in_page = True
+        last_date[0] = when
+        expenses.append(_expense(float(match.group(3).replace(',', '')), match.group(2).strip(), when))
+    if found_in_page:
+        return
+
+    # Line by line amount search, dated by the closest date printed above
+    date_pattern = re.compile(r'\d{1,2}[\s/.-](?:[A-Za-z]{3,9},?|\d{1,2})[\s/.-]\d{2,4}')
+    for line in text.split('\n'):
+        dm = date_pattern.search(line)
+        if dm:
+            last_date[0] = _parse_date(dm.group(0), list(GENERIC_DATE_FORMATS)) or last_date[0]
+        amt_match = re.search(r'(?:[₹\u20b9]|INR)\s?([\d,]+(?:\.\d{0,2})?)', line)
+        if not amt_match or last_date[0] is None:
+            continue
+        val = float(amt_match.group(1).replace(',', ''))
+        if val > 0:
+            expense = _expense(val, "", last_date[0], mode_text=line)
+            expense.update(description="Statement Transaction", vendor="Unknown Vendor", category="Other")
+            expenses.append(expense)
+
+def _parse(pdf_bytes: bytes) -> list:
+    expenses = []
+    rows = []
+    with pdfplumber().open(io.BytesIO(pdf_bytes)) as pdf:
+        template = layout = None
+        formats = None
+        text_pages = []
+        for page in pdf.pages:
+            lines = _lines(page.extract_words())
+            if not lines:
+                continue
+            if template is None:
+                template = _pick_template(lines)
+                formats = list(template.date_formats) + [f for f in GENERIC_DATE_FORMATS if f not in template.date_formats]
+            header_index, page_layout = _find_header(lines, template)
+            if page_layout is not None:
+                layout = page_layout
+                lines = lines[header_index + 1:]
+            if layout is None:
+                text_pages.append(page)
+                continue
+            _parse_table_page(lines, layout, formats, rows)
+
+        # Pages before the first header (all of them when there is none), such as
+        # a summary page whose transactions are printed as text
+        last_date = [None]
+        for page in text_pages:
+            text = page.extract_text()
+            if text:
+                _parse_text_page(text, expenses, last_date)
+    return expenses + _table_expenses(rows)
+
+def statement_key(pdf_base64: str):
+    """Cache key of a statement: the SHA-256 of the PDF, or None if it is not base64."""
+    try:
+        return hashlib.sha256(base64.b64decode(pdf_base64)).hexdigest()
+    except ValueError:
+        return None
+
+async def cached_statement(key: str):
+    """The parsed rows of a statement seen before by any worker, or None."""
+    rows = await _statements.get(key)
+    return None if rows is None else [dict(e) for e in rows]
+
+async def remember_statement(key: str, rows: list):
+    await _statements.set(key, rows)
 
 def parse_bank_statement_pdf(pdf_base64: str):
     """
-    Parses a bank statement PDF and extracts transaction data.
+    Parses a bank statement PDF into expense dicts (debits only).
     Heuristics:
-    - Look for rows that contain a date, a description, and an amount.
-    - Specifically look for debit amounts.
+    - Find the column header and read each transaction row by position.
+    - Without a header, look for date ... details ... ₹amount runs in the text.
     """
-    expenses = []
-    
     try:
-        pdf_bytes = base64.b64decode(pdf_base64)
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text:
-                    continue
-                
-                # Normalize text: convert all whitespace to single spaces and standardize line endings
-                normalized_text = re.sub(r'\s+', ' ', text)
-                
-                # Very flexible pattern to find transaction blocks
-                # 1. Date like "27 Dec, 2025"
-                # 2. Text in between
-                # 3. Rupee symbol (literal or unicode) followed by amount
-                # Pattern: Date (e.g. 27 Dec, 2025) ... (vendor/info) ... (₹/Amount)
-                # We use a non-greedy catch-all in between.
-                
-                pattern = r'(\d{1,2}\s[A-Za-z]{3,},?\s\d{4})\s+(.*?)\s*[₹\u20b9]\s?([\d,]+(?:\.\d{0,2})?)'
-                matches = re.finditer(pattern, normalized_text)
-                
-                found_in_page = False
-                for match in matches:
-                    found_in_page = True
-                    date_str = match.group(1).strip()
-                    block_text = match.group(2).strip()
-                    amount_str = match.group(3).replace(',', '')
-                    
-                    # Extract vendor from block_text
-                    vendor = "Unknown Vendor"
-                    # Look for common prefixes in modern statements
-                    vendor_patterns = [
-                        r'Paid to\s+(.*?)(?:\s+UPI|$)',
-                        r'To\s+(.*?)(?:\s+UPI|$)',
-                        r'M/S\.\s+(.*?)(?:\s+UPI|$)',
-                        r'Transaction details\s+(.*?)(?:\s+UPI|$)'
-                    ]
-                    
-                    for vp in vendor_patterns:
-                        vm = re.search(vp, block_text, re.IGNORECASE)
-                        if vm:
-                            vendor = vm.group(1).strip()
-                            break
-                    
-                    if vendor == "Unknown Vendor" and block_text:
-                        # Fallback: Just take the first few words of the block if no pattern matches
-                        # but skip things that look like times (08:43 PM)
-                        v_part = re.sub(r'\d{1,2}:\d{2}\s?(?:AM|PM)', '', block_text, flags=re.IGNORECASE).strip()
-                        vendor = v_part[:50] if v_part else "Statement Item"
-
-                    description = vendor
-                    
-                    # Try to parse the date
-                    parsed_date = datetime.now()
-                    try:
-                        # Format like "27 Dec, 2025" or "27 Dec 2025"
-                        clean_date_str = date_str.replace(',', '').strip()
-                        parsed_date = datetime.strptime(clean_date_str, "%d %b %Y")
-                    except Exception as de:
-                        print(f"Date parsing error: {de}")
-
-                    category = "Other"
-                    desc_lower = description.lower()
-                    
-                    # Enhanced category guessing
-                    if any(kw in desc_lower for kw in ['swiggy', 'zomato', 'restaurant', 'food', 'hotel', 'pharmacy', 'homoeo', 'store', 'mart', 'kirana']):
-                        category = "Health" if any(kw in desc_lower for kw in ['pharmacy', 'homoeo', 'clinic', 'hospital']) else "Food"
-                    elif any(kw in desc_lower for kw in ['amazon', 'flipkart', 'myntra', 'shopping', 'lifestyle', 'mall']):
-                        category = "Shopping"
-                    elif any(kw in desc_lower for kw in ['uber', 'ola', 'taxi', 'fuel', 'petrol', 'transport', 'metro']):
-                        category = "Transport"
-                    elif any(kw in desc_lower for kw in ['starbucks', 'cafe', 'coffee', 'chai', 'tea']):
-                        category = "Coffee"
-                    elif any(kw in desc_lower for kw in ['jio', 'recharge', 'bill', 'electricity', 'water', 'gas', 'airtel']):
-                        category = "Bills"
-
-                    # Guess Payment Mode
-                    payment_mode = "upi" # Default for bank statements/UPI extracts
-                    block_upper = block_text.upper()
-                    if any(kw in block_upper for kw in ["CARD", "RUPAY", "VISA", "MASTERCARD", "DEBIT", "CREDIT"]):
-                        payment_mode = "card"
-                    elif "CASH" in block_upper:
-                        payment_mode = "cash"
-
-                    expenses.append({
-                        "amount": float(amount_str),
-                        "description": description,
-                        "vendor": vendor,
-                        "category": category,
-                        "date": parsed_date.isoformat(),
-                        "source": "pdf",
-                        "payment_mode": payment_mode
-                    })
-                
-                # Fallback: if block parsing failed, try a line-by-line amount search
-                if not found_in_page:
-                    lines = text.split('\n')
-                    for line in lines:
-                        if '₹' in line or '\u20b9' in line or 'INR' in line:
-                            amt_match = re.search(r'[₹\u20b9INR]\s?([\d,]+(?:\.\d{0,2})?)', line)
-                            if amt_match:
-                                val = float(amt_match.group(1).replace(',', ''))
-                                if val > 0:
-                                    # Guess Payment Mode for fallback
-                                    fallback_mode = "upi"
-                                    lu = line.upper()
-                                    if any(kw in lu for kw in ["CARD", "RUPAY", "VISA", "MASTERCARD"]):
-                                        fallback_mode = "card"
-                                    elif "CASH" in lu:
-                                        fallback_mode = "cash"
-                                        
-                                    expenses.append({
-                                        "amount": val,
-                                        "description": "Statement Transaction",
-                                        "vendor": "Unknown Vendor",
-                                        "category": "Other",
-                                        "date": datetime.now().isoformat(),
-                                        "source": "pdf",
-                                        "payment_mode": fallback_mode
-                                    })
-                    
-        return expenses
+        return _parse(base64.b64decode(pdf_base64))
     except Exception as e:
-        print(f"Error parsing PDF: {e}")
+        logger.exception("Error parsing PDF")
         return []
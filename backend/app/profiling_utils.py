@@ -0,0 +1,229 @@
+"""
+Opt-in request profiling (PROFILE_ENABLED=1).
+
+A request is profiled when it is picked by PROFILE_SAMPLE_RATE, when it
+carries a valid signed X-Profile header (see `sign_profile_token`), or,
+after the fact, when it took longer than PROFILE_SLOW_MS. The slow
+trigger works because every in-flight request is stack-sampled while a
+threshold is set, and the samples are kept only if the request turns out
+to be slow.
+
+Stack samples come from one background thread that reads the event loop
+thread's current stack every PROFILE_INTERVAL_MS and credits it to the
+request whose frames are on it, so concurrent requests do not bleed into
+each other. Samples taken while a request was awaiting (Mongo, another
+request holding the loop) are counted under "[waiting]". With
+PROFILE_MODE=cprofile, requests picked up front are additionally run under
+cProfile, one at a time; cProfile sees the whole loop thread, so work of
+other requests interleaved with it is included.
+
+Captured profiles go to a per-process ring buffer of PROFILE_BUFFER_SIZE
+entries, downloadable from /api/admin/profiles as collapsed stacks
+(flamegraph.pl, speedscope) or pstats (snakeviz).
+"""
+import collections
+import cProfile
+import hashlib
+import hmac
+import logging
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from app.auth.utils import SECRET_KEY
+from app.logging_utils import request_id_var
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")  # sample | cprofile
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))  # 0 disables the slow trigger
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+
+PROFILE_HEADER = "x-profile"
+WAITING = "[waiting]"
+
+logger = logging.getLogger("app.profiling")
+
+# Most recent captured profiles, oldest first
+_profiles = collections.deque(maxlen=PROFILE_BUFFER_SIZE)
+
+def sign_profile_token(expires: int) -> str:
+    """X-Profile header value that triggers profiling until `expires` (unix seconds)."""
+    digest = hmac.new(SECRET_KEY.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{digest}"
+
+def verify_profile_token(token: str) -> bool:
+    expires, _, _ = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(token, sign_profile_token(int(expires)))
+
+_labels = {}
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for prefix in sys.path:
+            if prefix and filename.startswith(prefix):
+                filename = filename[len(prefix):].lstrip(os.sep)
+                break
+        label = _labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, trigger: str = None):
+        self.id = request_id_var.get() or uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = datetime.utcnow()
+        self.samples = collections.Counter()
+        self.stats = None
+        self.status = None
+        self.duration_ms = None
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "trigger": self.trigger,
+            "duration_ms": self.duration_ms,
+            "started_at": self.started_at,
+            "samples": sum(self.samples.values()),
+            "has_pstats": self.stats is not None,
+        }
+
+    def collapsed(self) -> str:
+        """One "root;...;leaf count" line per distinct stack."""
+        return "".join(f"{';'.join(stack)} {n}\n" for stack, n in self.samples.most_common())
+
+    def pstats(self) -> bytes:
+        # The format cProfile.Profile.dump_stats writes
+        return marshal.dumps(self.stats)
+
+class StackSampler(threading.Thread):
+    """
+    Samples the event loop thread's stack and credits each sample to the
+    request whose marker frame (registered in `active`) is on it.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.active = {}
+
+    def sample(self):
+        active = dict(self.active)
+        if not active:
+            return
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        running = None
+        while frame is not None:
+            if frame in active:
+                running = active[frame]
+                break
+            stack.append(_label(frame.f_code))
+            frame = frame.f_back
+        for profile in active.values():
+            if profile is running:
+                profile.samples[tuple(reversed(stack))] += 1
+            else:
+                profile.samples[(WAITING,)] += 1
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sample()
+
+def recent_profiles() -> list:
+    return [p.summary() for p in reversed(_profiles)]
+
+def get_profile(profile_id: str):
+    return next((p for p in _profiles if p.id == profile_id), None)
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI so the route runs on the same task (and so under the same
+    frames) as the middleware; it must sit inside any BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, slow_ms: float = PROFILE_SLOW_MS,
+                 mode: str = PROFILE_MODE, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.sampler = None
+        self.cprofile_busy = False
+
+    def _trigger(self, scope) -> str:
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER.encode() and verify_profile_token(value.decode("latin-1")):
+                return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trigger = self._trigger(scope)
+        if trigger is None and not self.slow_ms:
+            return await self.app(scope, receive, send)
+
+        if self.sampler is None:
+            self.sampler = StackSampler(threading.get_ident(), self.interval)
+            self.sampler.start()
+        profile = RequestProfile(scope["method"], scope["path"], trigger)
+        await self._profiled(profile, scope, receive, send)
+
+    async def _profiled(self, profile: RequestProfile, scope, receive, send):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if profile.trigger:
+                    message["headers"] = [*message.get("headers", ()), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        profiler = None
+        if profile.trigger and self.mode == "cprofile" and not self.cprofile_busy:
+            self.cprofile_busy = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        # The sampler recognises this request by this coroutine's frame
+        marker = sys._getframe()
+        self.sampler.active[marker] = profile
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.sampler.active.pop(marker, None)
+            if profiler is not None:
+                profiler.disable()
+                profiler.create_stats()
+                profile.stats = profiler.stats
+                self.cprofile_busy = False
+
+            if profile.trigger is None and profile.duration_ms >= self.slow_ms:
+                profile.trigger = "slow"
+            if profile.trigger:
+                _profiles.append(profile)
+                logger.info("profile captured", extra={
+                    "profile_id": profile.id,
+                    "path": profile.path,
+                    "trigger": profile.trigger,
+                    "duration_ms": profile.duration_ms,
+                })
@@ -0,0 +1,156 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+from app.dedupe_utils import normalize_vendor, GENERIC_VENDORS
+from app.archive_utils import archived_expenses
+from app.http_utils import bump_data_version
+
+# (name, nominal interval in days, tolerance in days)
+PERIODS = [
+    ("weekly", 7, 1.5),
+    ("monthly", 30.4, 4),
+    ("quarterly", 91.3, 10),
+    ("yearly", 365.2, 20),
+]
+
+MIN_OCCURRENCES = 3
+MAX_INTERVAL_CV = 0.25  # spread of the gaps between charges
+MAX_AMOUNT_CV = 0.30    # recharges/subscriptions drift a little with taxes and plan changes
+HISTORY_DAYS = 3 * 365
+TIME_BUDGET_SECONDS = 5.0
+
+def _classify(mean_interval: float):
+    for name, days, tolerance in PERIODS:
+        if abs(mean_interval - days) <= tolerance:
+            return name, days
+    return None, None
+
+def _next_date(last: datetime, period: str, nominal: float, interval: float) -> datetime:
+    # 28-day recharge packs are "monthly" but do not follow the calendar
+    if period in ("monthly", "quarterly", "yearly") and abs(interval - nominal) <= 2:
+        # Keep the billing day of month (rent on the 1st stays on the 1st)
+        step = {"monthly": 1, "quarterly": 3, "yearly": 12}[period]
+        month_index = last.month - 1 + step
+        year, month = last.year + month_index // 12, month_index % 12 + 1
+        for day in (last.day, 30, 29, 28):
+            try:
+                return last.replace(year=year, month=month, day=day)
+            except ValueError:
+                continue
+    return last + timedelta(days=round(interval))
+
+def detect_recurring(expenses, user_id: str, time_budget: float = TIME_BUDGET_SECONDS):
+    """
+    Groups expenses by normalized vendor and finds periodic charges.
+    Interval and amount statistics are computed for all groups at once with
+    segment reductions, so the per-group Python work is only result assembly.
+    """
+    started = time.monotonic()
+    vendors, names, categories, days, amounts = [], [], [], [], []
+    keys = {}
+    for e in expenses:
+        raw = e.get("vendor") or e.get("description")
+        key = keys.get(raw)
+        if key is None:
+            key = keys[raw] = normalize_vendor(raw)
+        if key in GENERIC_VENDORS:
+            continue
+        date = e["date"] if isinstance(e["date"], datetime) else datetime.fromisoformat(str(e["date"]))
+        vendors.append(key)
+        names.append(raw)
+        categories.append(e.get("category"))
+        days.append(date.toordinal() + date.hour / 24)
+        amounts.append(float(e["amount"]))
+
+    if not vendors:
+        return []
+
+    codes, inverse = np.unique(np.array(vendors), return_inverse=True)
+    days = np.array(days)
+    amounts = np.array(amounts)
+    order = np.lexsort((days, inverse))
+    group = inverse[order]
+    days = days[order]
+    amounts = amounts[order]
+
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    counts = np.diff(np.r_[starts, len(group)])
+
+    # Per-group amount mean / CV
+    amount_sum = np.add.reduceat(amounts, starts)
+    amount_sq = np.add.reduceat(amounts ** 2, starts)
+    amount_mean = amount_sum / counts
+    amount_std = np.sqrt(np.maximum(amount_sq / counts - amount_mean ** 2, 0))
+    amount_cv = np.divide(amount_std, amount_mean, out=np.full_like(amount_mean, np.inf), where=amount_mean > 0)
+
+    # Gaps between consecutive charges; the first row of each group has no gap
+    gaps = np.diff(days, prepend=days[0])
+    gaps[starts] = 0
+    n_gaps = counts - 1
+    gap_sum = np.add.reduceat(gaps, starts)
+    gap_sq = np.add.reduceat(gaps ** 2, starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap_mean = gap_sum / n_gaps
+        gap_std = np.sqrt(np.maximum(gap_sq / n_gaps - gap_mean ** 2, 0))
+        gap_cv = gap_std / gap_mean
+
+    candidates = np.flatnonzero(
+        (counts >= MIN_OCCURRENCES) & (gap_mean > 0) & (gap_cv <= MAX_INTERVAL_CV) & (amount_cv <= MAX_AMOUNT_CV)
+    )
+
+    now = datetime.utcnow()
+    results = []
+    for g in candidates:
+        if time.monotonic() - started > time_budget:
+            break
+        period, nominal = _classify(gap_mean[g])
+        if period is None:
+            continue
+        last_row = starts[g] + counts[g] - 1
+        # Display name/category from the latest occurrence of each vendor
+        last_source = order[last_row]
+        last_date = datetime.fromordinal(int(days[last_row]))
+        recent = amounts[max(starts[g], last_row - 2): last_row + 1]
+        confidence = (1 - gap_cv[g] / MAX_INTERVAL_CV) * 0.6 + (1 - amount_cv[g] / MAX_AMOUNT_CV) * 0.4
+        results.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "vendor": names[last_source],
+            "vendor_key": str(codes[g]),
+            "category": categories[last_source],
+            "period": period,
+            "interval_days": round(float(gap_mean[g]), 1),
+            "occurrences": int(counts[g]),
+            "average_amount": round(float(amount_mean[g]), 2),
+            "expected_amount": round(float(np.median(recent)), 2),
+            "last_date": last_date,
+            "next_expected_date": _next_date(last_date, period, nominal, float(gap_mean[g])),
+            "confidence": round(float(min(max(confidence, 0.0), 1.0)), 2),
+            "analyzed_at": now,
+        })
+
+    results.sort(key=lambda r: r["next_expected_date"])
+    return results
+
+async def refresh_recurring(db, user_id: str):
+    """Background job: re-analyse a user's history and replace their `recurring` documents."""
+    # Stamped up front so reads arriving during the scan do not queue another
+    await db.users.update_one({"id": user_id}, {"$set": {"recurring_analyzed_at": datetime.utcnow()}})
+    since = datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+    cursor = db.expenses.find(
+        {"user_id": user_id, "date": {"$gte": since}, "duplicate_of": None},
+        {"_id": 0, "amount": 1, "date": 1, "vendor": 1, "description": 1, "category": 1}
+    )
+    expenses = await cursor.to_list(length=None)
+    expenses += [e for e in await archived_expenses(db, user_id, start=since) if not e["duplicate_of"]]
+    results = detect_recurring(expenses, user_id)
+    if not results and not await db.recurring.count_documents({"user_id": user_id}, limit=1):
+        # Nothing found again; leave data_version (and so every ETag) alone
+        return results
+
+    await db.recurring.delete_many({"user_id": user_id})
+    if results:
+        await db.recurring.insert_many(results)
+    await bump_data_version(db, user_id)
+    return results
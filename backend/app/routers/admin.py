@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from app.routers.expenses import get_current_user
+from app.json_utils import ORJSONResponse
+from app.admission_utils import admission_metrics
+from app.task_utils import task_metrics
+from app.cache_utils import cache_metrics
+from app.profiling_utils import (
+    PROFILE_ENABLED, PROFILE_HEADER, PROFILE_MODE, get_profile, recent_profiles, sign_profile_token,
+)
+from datetime import datetime
+import os
+import time
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user["email"].lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+@router.get("/profiles")
+async def list_profiles(admin: dict = Depends(get_admin_user)):
+    """Captured profiles in this worker, newest first."""
+    return ORJSONResponse({"enabled": PROFILE_ENABLED, "mode": PROFILE_MODE, "profiles": recent_profiles()})
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|pstats)$"),
+    admin: dict = Depends(get_admin_user)
+):
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        if profile.stats is None:
+            raise HTTPException(status_code=404, detail="No cProfile data for this request")
+        return Response(
+            content=profile.pstats(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+        )
+    return Response(
+        content=profile.collapsed(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+    )
+
+@router.post("/profile-token")
+async def create_profile_token(minutes: int = Query(15, ge=1, le=24 * 60), admin: dict = Depends(get_admin_user)):
+    """Signed header value that makes any client's requests profiled until it expires."""
+    expires = int(time.time()) + minutes * 60
+    return {
+        "header": PROFILE_HEADER,
+        "value": sign_profile_token(expires),
+        "expires_at": datetime.utcfromtimestamp(expires),
+    }
+
+@router.get("/admission")
+async def get_admission_metrics(admin: dict = Depends(get_admin_user)):
+    """Admission counters and current queues per route class, for this worker."""
+    return admission_metrics()
+
+@router.get("/tasks")
+async def get_task_metrics(admin: dict = Depends(get_admin_user)):
+    """Background task counters per kind and the current queue length, for this worker."""
+    return task_metrics()
+
+@router.get("/cache")
+async def get_cache_metrics(admin: dict = Depends(get_admin_user)):
+    """Hit rates, evictions and staleness per cache namespace, for this worker."""
+    return cache_metrics()
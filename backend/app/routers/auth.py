@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.models import UserCreate, UserInDB, Token, TokenData, UserUpdate
 from app.database import get_database
 from app.auth.utils import verify_password, get_password_hash, create_access_token
+from app.admission_utils import admission, client_address
+from app.http_utils import bump_data_version, data_etag, etag_headers, etag_matches
 from datetime import datetime
 import uuid
 
@@ -25,14 +27,18 @@ async def register(user: UserCreate):
     return user_dict
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = await db.users.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user["password_hash"]):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # Failed attempts are limited per (username, client address); a NAT or proxy full of
+    # users does not share one bucket, and successful sign-ins cost nothing
+    key = f"{form_data.username.strip().lower()}|{client_address(request)}"
+    async with admission("login", key, refund_on_success=True):
+        user = await db.users.find_one({"email": form_data.username})
+        if not user or not verify_password(form_data.password, user["password_hash"]):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect email or password",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
     
     access_token = create_access_token(data={"sub": user["email"]})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -69,7 +75,7 @@ async def reset_password(payload: dict, token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 @router.get("/me", response_model=UserInDB)
-async def get_me(token: str = Depends(oauth2_scheme)):
+async def get_me(request: Request, response: Response, token: str = Depends(oauth2_scheme)):
     from jose import jwt, JWTError
     from app.auth.utils import SECRET_KEY, ALGORITHM
     
@@ -83,6 +89,10 @@ async def get_me(token: str = Depends(oauth2_scheme)):
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
+        etag = data_etag(request, user)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=etag_headers(etag))
+        response.headers.update(etag_headers(etag))
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -104,6 +114,11 @@ async def update_profile(user_update: UserUpdate, token: str = Depends(oauth2_sc
         update_data = {k: v for k, v in user_update.dict().items() if v is not None}
         if update_data:
             await db.users.update_one({"email": email}, {"$set": update_data})
+            await bump_data_version(db, user["id"])
+            if update_data.get("currency") and update_data["currency"] != user.get("currency"):
+                # Budget totals are stored in the user's currency
+                from app.budget_events import invalidate_user_budgets
+                await invalidate_user_budgets(db, user["id"])
             user = await db.users.find_one({"email": email})
             
         return user
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from app.models import BudgetCreate, Budget
 from app.database import get_database
 from app.routers.expenses import get_current_user
+from app.budget_events import recompute_spent, event_stream, rollups_settled
+from app.currency import BASE_CURRENCY
+from app.json_utils import ORJSONResponse, trusted, trusted_list
+from app.http_utils import bump_data_version, data_etag, etag_headers, etag_matches
+from app.forecast_utils import current, get_forecast, projected_spent, refresh_forecasts
 from datetime import datetime
 from typing import List
 import uuid
@@ -11,6 +17,8 @@ db = get_database()
 
 @router.post("/", response_model=Budget)
 async def create_budget(budget: BudgetCreate, current_user: dict = Depends(get_current_user)):
+    # A seeded total must not be followed by a queued $inc for an expense it already counts
+    await rollups_settled(current_user["id"])
     # Check if budget for this category/month/year already exists
     existing = await db.budgets.find_one({
         "user_id": current_user["id"],
@@ -23,42 +31,62 @@ async def create_budget(budget: BudgetCreate, current_user: dict = Depends(get_c
     if existing:
         await db.budgets.update_one({"id": existing["id"]}, {"$set": {"monthly_limit": budget.monthly_limit}})
         existing["monthly_limit"] = budget.monthly_limit
-        return existing
+        await bump_data_version(db, current_user["id"])
+        return ORJSONResponse(trusted(existing, Budget))
     
     budget_dict["id"] = str(uuid.uuid4())
     budget_dict["user_id"] = current_user["id"]
     budget_dict["current_spent"] = 0.0
     
     await db.budgets.insert_one(budget_dict)
-    return budget_dict
+    await recompute_spent(db, budget_dict, current_user.get("currency", BASE_CURRENCY))
+    await bump_data_version(db, current_user["id"])
+    return ORJSONResponse(trusted(budget_dict, Budget))
 
 @router.get("/", response_model=List[Budget])
-async def get_budgets(current_user: dict = Depends(get_current_user)):
+async def get_budgets(request: Request, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    # Expense writes update current_spent in the background; wait for this user's own,
+    # which also bump data_version
+    if await rollups_settled(current_user["id"]):
+        current_user = await db.users.find_one({"id": current_user["id"]})
+    # Projections shrink toward current_spent day by day without any write
+    today = datetime.utcnow().date()
+    etag = data_etag(request, current_user, today.isoformat())
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
     cursor = db.budgets.find({"user_id": current_user["id"]})
     budgets = await cursor.to_list(length=100)
     
-    # Enrich budgets with current spending
+    # current_spent is maintained incrementally on expense writes; budgets
+    # created before that (or invalidated) are recomputed once here
     for b in budgets:
-        # Calculate spending for this category and month
-        start_date = datetime(b["year"], b["month"], 1)
-        if b["month"] == 12:
-            end_date = datetime(b["year"] + 1, 1, 1)
-        else:
-            end_date = datetime(b["year"], b["month"] + 1, 1)
-            
-        cursor = db.expenses.find({
-            "user_id": current_user["id"],
-            "category": b["category"],
-            "date": {"$gte": start_date, "$lt": end_date}
-        })
-        expenses = await cursor.to_list(length=None)
-        b["current_spent"] = sum(e["amount"] for e in expenses)
+        if not b.get("spent_synced"):
+            await recompute_spent(db, b, current_user.get("currency", BASE_CURRENCY))
+
+    # The nightly job keeps forecasts fresh; fill in for new users or a missed run
+    forecast = await get_forecast(db, current_user)
+    if not current(forecast, current_user):
+        background_tasks.add_task(refresh_forecasts, db, [current_user])
+        if forecast and forecast.get("currency") != current_user.get("currency", BASE_CURRENCY):
+            forecast = None
+    for b in budgets:
+        b["projected_spent"] = projected_spent(forecast, b["category"], b["month"], b["year"], b.get("current_spent", 0.0), today)
         
-    return budgets
+    return ORJSONResponse(trusted_list(budgets, Budget), headers=etag_headers(etag))
+
+@router.get("/stream")
+async def stream_budget_events(request: Request, current_user: dict = Depends(get_current_user)):
+    # Server-sent events: budget_update on every change, budget_threshold at 50/80/100%
+    return StreamingResponse(
+        event_stream(request, current_user["id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.delete("/{budget_id}")
 async def delete_budget(budget_id: str, current_user: dict = Depends(get_current_user)):
     result = await db.budgets.delete_one({"id": budget_id, "user_id": current_user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Budget not found")
+    await bump_data_version(db, current_user["id"])
     return {"status": "deleted"}
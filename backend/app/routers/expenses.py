@@ -1,10 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.models import ExpenseCreate, Expense, ExpenseSource
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request, Response, status
+from pymongo import UpdateOne
+from app.models import ExpenseCreate, Expense, ExpenseSource, RecurringExpense
 from app.database import get_database
+from app.dedupe_utils import candidate_query, best_match, merge_fields, find_duplicates
+from app.budget_events import on_expense_change, invalidate_user_budgets
+from app.currency import BASE_CURRENCY, aggregate_total
+from app.image_utils import queue_receipt_derivatives, delete_receipt_derivatives
+from app.ocr_utils import capture_corrections
+from app.json_utils import ORJSONResponse, projection, trusted, trusted_list
+from app.archive_utils import BLOB_FIELDS, archived_total, newest_archived, restore_expense
+from app.search_utils import MAX_CANDIDATES, get_vendor_index, note_vendor, rank, text_query
+from app.admission_utils import admission, base64_megabytes, pdf_pages
+from app.http_utils import bump_data_version, data_etag, etag_headers, etag_matches
 from app.routers.auth import oauth2_scheme
 from jose import jwt, JWTError
 from app.auth.utils import SECRET_KEY, ALGORITHM
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List
 import uuid
 
@@ -25,59 +36,111 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 @router.post("/", response_model=Expense)
-async def create_expense(expense: ExpenseCreate, current_user: dict = Depends(get_current_user)):
+async def create_expense(
+    expense: ExpenseCreate,
+    dedupe: str = Query("flag", pattern="^(flag|merge|off)$"),
+    current_user: dict = Depends(get_current_user)
+):
     expense_dict = expense.dict()
     expense_dict["id"] = str(uuid.uuid4())
     expense_dict["user_id"] = current_user["id"]
     expense_dict["created_at"] = datetime.utcnow()
     
-    # ML Learning: Capture Feedback
-    if expense.original_ocr_data and expense.vendor:
-        original = expense.original_ocr_data
-        discrepancies = {}
-        
-        # Check for core field discrepancies
-        if original.get("amount") != expense.amount:
-            discrepancies["amount"] = {"original": original.get("amount"), "corrected": expense.amount}
-        
-        if original.get("gst_details"):
-            orig_gst = original["gst_details"]
-            new_gst = expense.gst_details or {}
-            for key in ["cgst", "sgst", "igst", "total_gst"]:
-                if orig_gst.get(key) != new_gst.get(key):
-                    if "gst_details" not in discrepancies: discrepancies["gst_details"] = {}
-                    discrepancies["gst_details"][key] = {"original": orig_gst.get(key), "corrected": new_gst.get(key)}
-
-        if discrepancies:
-            learning_entry = {
-                "id": str(uuid.uuid4()),
-                "vendor": expense.vendor.upper(),
-                "raw_text": original.get("raw_text"),
-                "discrepancies": discrepancies,
-                "created_at": datetime.utcnow()
-            }
-            await db.ocr_learning.insert_one(learning_entry)
+    # Same purchase arriving again via SMS / statement / receipt
+    if dedupe != "off":
+        candidates = await db.expenses.find(candidate_query(current_user["id"], expense_dict)).to_list(length=50)
+        original, score = best_match(expense_dict, candidates)
+        if original is not None:
+            if dedupe == "merge":
+                updates = merge_fields(original, expense_dict)
+                if updates:
+                    await db.expenses.update_one({"id": original["id"], "user_id": current_user["id"]}, {"$set": updates})
+                    original.update(updates)
+                    await bump_data_version(db, current_user["id"])
+                    if "receipt_image_base64" in updates:
+                        queue_receipt_derivatives(original)
+                capture_corrections(current_user["id"], expense)
+                return ORJSONResponse(trusted(original, Expense))
+            expense_dict["duplicate_of"] = original["id"]
+            expense_dict["duplicate_score"] = score
 
     await db.expenses.insert_one(expense_dict)
-    return expense_dict
+    note_vendor(current_user["id"], expense_dict.get("vendor"))
+    await bump_data_version(db, current_user["id"])
+    # Budget counters, gallery thumbnails and OCR learning land after the response
+    on_expense_change(current_user["id"], new=expense_dict, currency=current_user.get("currency", BASE_CURRENCY))
+    if expense_dict.get("receipt_image_base64"):
+        queue_receipt_derivatives(expense_dict)
+    capture_corrections(current_user["id"], expense)
+    # Built from a validated ExpenseCreate, so skip response_model re-validation
+    return ORJSONResponse(trusted(expense_dict, Expense))
 
 @router.get("/", response_model=List[Expense])
-async def get_expenses(current_user: dict = Depends(get_current_user)):
-    cursor = db.expenses.find({"user_id": current_user["id"]}).sort("date", -1)
+async def get_expenses(request: Request, current_user: dict = Depends(get_current_user)):
+    etag = data_etag(request, current_user)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    cursor = db.expenses.find({"user_id": current_user["id"]}, projection(Expense)).sort("date", -1)
     expenses = await cursor.to_list(length=1000)
-    return expenses
+    # Older history continues in the monthly archive; a backdated hot expense can
+    # sort below archived ones, so merge rather than append
+    since = expenses[-1]["date"] if len(expenses) == 1000 else None
+    archived = await newest_archived(db, current_user["id"], 1000, since=since)
+    if archived:
+        expenses = sorted(expenses + archived, key=lambda e: e["date"], reverse=True)[:1000]
+    # Every stored expense went through ExpenseCreate on write
+    return ORJSONResponse(trusted_list(expenses, Expense), headers=etag_headers(etag))
+
+# Search results leave out the receipt image and OCR payload; clients fetch those per expense
+SEARCH_FIELDS = {k: v for k, v in projection(Expense).items() if k not in ("receipt_image_base64", "original_ocr_data")}
+
+@router.get("/search")
+async def search_expenses(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = current_user["id"]
+    # Words in vendor, description, items and line item names via the text index
+    cursor = db.expenses.find(
+        text_query(user_id, q), {**SEARCH_FIELDS, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).limit(MAX_CANDIDATES)
+    text_hits = [(doc, doc.pop("score")) async for doc in cursor]
+
+    # Misspelt or OCR-mangled vendor names via the trigram index
+    index = await get_vendor_index(db, user_id)
+    vendor_scores = dict(index.match(q))
+    fuzzy_hits = []
+    if vendor_scores:
+        fuzzy_hits = await db.expenses.find(
+            {"user_id": user_id, "vendor": {"$in": list(vendor_scores)}}, SEARCH_FIELDS
+        ).sort("date", -1).limit(MAX_CANDIDATES).to_list(length=MAX_CANDIDATES)
+
+    ranked = rank(text_hits, fuzzy_hits, vendor_scores)
+    start = (page - 1) * page_size
+    items = [dict(trusted(doc, Expense), score=score) for doc, score in ranked[start:start + page_size]]
+    return ORJSONResponse({"items": items, "page": page, "page_size": page_size, "total": len(ranked)})
 
 @router.delete("/{expense_id}")
 async def delete_expense(expense_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.expenses.delete_one({"id": expense_id, "user_id": current_user["id"]})
-    if result.deleted_count == 0:
+    deleted = await db.expenses.find_one_and_delete({"id": expense_id, "user_id": current_user["id"]})
+    if deleted is None and await restore_expense(db, current_user["id"], expense_id):
+        deleted = await db.expenses.find_one_and_delete({"id": expense_id, "user_id": current_user["id"]})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Expense not found")
+    on_expense_change(current_user["id"], old=deleted, currency=current_user.get("currency", BASE_CURRENCY))
+    if deleted.get("receipt_image_base64"):
+        await delete_receipt_derivatives(db, expense_id)
+    await bump_data_version(db, current_user["id"])
     return {"status": "deleted"}
 
 @router.put("/{expense_id}", response_model=Expense)
 async def update_expense(expense_id: str, expense: ExpenseCreate, current_user: dict = Depends(get_current_user)):
     # Check if expense exists and belongs to user
     existing = await db.expenses.find_one({"id": expense_id, "user_id": current_user["id"]})
+    if not existing:
+        existing = await restore_expense(db, current_user["id"], expense_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Expense not found")
     
@@ -87,26 +150,109 @@ async def update_expense(expense_id: str, expense: ExpenseCreate, current_user:
     expense_dict["updated_at"] = datetime.utcnow()
     # Preserve created_at
     expense_dict["created_at"] = existing.get("created_at") or datetime.utcnow()
+    # Edits keep the dedupe flag; POST /expenses/dedupe/backfill re-evaluates it
+    expense_dict["duplicate_of"] = existing.get("duplicate_of")
+    expense_dict["duplicate_score"] = existing.get("duplicate_score")
+    # Archived rows and search results come without the receipt and OCR payload; null keeps them
+    for field in BLOB_FIELDS:
+        if expense_dict.get(field) is None:
+            expense_dict[field] = existing.get(field)
     
-    await db.expenses.replace_one({"id": expense_id}, expense_dict)
-    return expense_dict
+    await db.expenses.replace_one({"id": expense_id, "user_id": current_user["id"]}, expense_dict)
+    note_vendor(current_user["id"], expense_dict.get("vendor"))
+    on_expense_change(current_user["id"], old=existing, new=expense_dict, currency=current_user.get("currency", BASE_CURRENCY))
+    if expense_dict.get("receipt_image_base64") != existing.get("receipt_image_base64"):
+        await delete_receipt_derivatives(db, expense_id)
+        if expense_dict.get("receipt_image_base64"):
+            queue_receipt_derivatives(expense_dict)
+    await bump_data_version(db, current_user["id"])
+    return ORJSONResponse(trusted(expense_dict, Expense))
 
 @router.get("/summary")
-async def get_summary(current_user: dict = Depends(get_current_user)):
-    # Simple summary of total spent
-    cursor = db.expenses.find({"user_id": current_user["id"]})
+async def get_summary(request: Request, current_user: dict = Depends(get_current_user)):
+    etag = data_etag(request, current_user)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    # Total spent in the user's currency; Mongo pre-sums per (currency, day)
+    currency = current_user.get("currency", BASE_CURRENCY)
+    total = await aggregate_total(db.expenses, {"user_id": current_user["id"], "duplicate_of": None}, currency)
+    total += await archived_total(db, current_user["id"], currency)
+    return ORJSONResponse({"total_spent": total, "currency": currency}, headers=etag_headers(etag))
+
+@router.post("/archive")
+async def archive_old_expenses(background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    from app.archive_utils import archive_user, archive_cutoff
+    cutoff = archive_cutoff()
+    background_tasks.add_task(archive_user, db, current_user["id"], cutoff)
+    return {"status": "scheduled", "before": cutoff}
+
+@router.post("/dedupe/backfill")
+async def backfill_duplicates(current_user: dict = Depends(get_current_user)):
+    # Re-scan the whole history; flags are recomputed from scratch
+    cursor = db.expenses.find(
+        {"user_id": current_user["id"]},
+        {"_id": 0, "id": 1, "amount": 1, "date": 1, "vendor": 1, "source": 1, "currency": 1, "original_ocr_data.raw_text": 1, "duplicate_of": 1}
+    ).sort("date", 1)
     expenses = await cursor.to_list(length=None)
-    total = sum(e["amount"] for e in expenses)
-    return {"total_spent": total}
+
+    ops = []
+    flagged = set()
+    for duplicate, original, score in find_duplicates(expenses):
+        flagged.add(duplicate["id"])
+        ops.append(UpdateOne({"id": duplicate["id"], "user_id": current_user["id"]}, {"$set": {"duplicate_of": original["id"], "duplicate_score": score}}))
+
+    # Clear stale flags left by an earlier scan or insert-time check
+    ops.extend(
+        UpdateOne({"id": e["id"], "user_id": current_user["id"]}, {"$set": {"duplicate_of": None, "duplicate_score": None}})
+        for e in expenses if e.get("duplicate_of") and e["id"] not in flagged
+    )
+    for i in range(0, len(ops), 1000):
+        await db.expenses.bulk_write(ops[i:i + 1000], ordered=False)
+    if ops:
+        await invalidate_user_budgets(db, current_user["id"])
+        await bump_data_version(db, current_user["id"])
+
+    return {"scanned": len(expenses), "flagged": len(flagged)}
+
+RECURRING_REFRESH_AFTER = timedelta(hours=24)
+
+@router.get("/recurring", response_model=List[RecurringExpense])
+async def get_recurring(request: Request, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    from app.recurring_utils import refresh_recurring
+    etag = data_etag(request, current_user)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    cursor = db.recurring.find({"user_id": current_user["id"]}, projection(RecurringExpense)).sort("next_expected_date", 1)
+    recurring = await cursor.to_list(length=200)
+
+    # Serve the last analysis and re-run the job after the response if it is stale;
+    # the stamp is on the user, since most users have no recurring documents at all
+    analyzed_at = current_user.get("recurring_analyzed_at")
+    if analyzed_at is None or analyzed_at < datetime.utcnow() - RECURRING_REFRESH_AFTER:
+        background_tasks.add_task(refresh_recurring, db, current_user["id"])
+    return ORJSONResponse(trusted_list(recurring, RecurringExpense), headers=etag_headers(etag))
+
+@router.post("/recurring/refresh")
+async def refresh_recurring_now(background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    from app.recurring_utils import refresh_recurring
+    background_tasks.add_task(refresh_recurring, db, current_user["id"])
+    return {"status": "scheduled"}
 
 @router.post("/parse-receipt")
 async def parse_receipt(payload: dict, current_user: dict = Depends(get_current_user)):
-    from app.ocr_utils import extract_receipt_data
+    from app.ocr_utils import cached_receipt, extract_receipt_data, receipt_key, remember_receipt
     image_base64 = payload.get("image")
     if not image_base64:
         raise HTTPException(status_code=400, detail="No image provided")
     
-    data = await extract_receipt_data(image_base64, db=db)
+    # The same photo sent again (a retry, another device) skips OCR and its slot
+    key = receipt_key(image_base64)
+    data = await cached_receipt(key)
+    if data is not None:
+        return data
+    async with admission("ocr", current_user["id"], cost=max(1, base64_megabytes(image_base64))):
+        data = await extract_receipt_data(image_base64, db=db)
+    await remember_receipt(key, data)
     return data
 
 @router.post("/parse-sms")
@@ -121,10 +267,18 @@ async def parse_sms(payload: dict, current_user: dict = Depends(get_current_user
 
 @router.post("/parse-pdf")
 async def parse_pdf(payload: dict, current_user: dict = Depends(get_current_user)):
-    from app.pdf_utils import parse_bank_statement_pdf
+    from app.pdf_utils import cached_statement, parse_bank_statement_pdf, remember_statement, statement_key
     pdf_base64 = payload.get("pdf")
     if not pdf_base64:
         raise HTTPException(status_code=400, detail="No PDF data provided")
     
-    expenses = parse_bank_statement_pdf(pdf_base64)
+    # A re-upload is answered from the cache without taking a parsing slot
+    key = statement_key(pdf_base64)
+    expenses = await cached_statement(key) if key else None
+    if expenses is not None:
+        return expenses
+    async with admission("statement", current_user["id"], cost=pdf_pages(pdf_base64)):
+        expenses = parse_bank_statement_pdf(pdf_base64)
+    if key and expenses:
+        await remember_statement(key, expenses)
     return expenses
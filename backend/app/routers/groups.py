@@ -0,0 +1,183 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from app.models import (
+    GroupCreate, Group, GroupMemberCreate, GroupExpenseCreate, GroupExpense, GroupPaymentCreate, SplitType, Transfer,
+)
+from app.database import get_database
+from app.routers.expenses import get_current_user
+from app.json_utils import ORJSONResponse, trusted
+from app.ledger_utils import SplitError, compute_shares, deltas, inc_update, merge, settle, to_major
+from datetime import datetime
+from typing import List
+import uuid
+
+router = APIRouter(prefix="/groups", tags=["groups"])
+db = get_database()
+
+def _group_out(group: dict) -> dict:
+    group["balances"] = {m: to_major(v) for m, v in group.get("balances", {}).items() if v}
+    return trusted(group, Group)
+
+def _expense_out(expense: dict) -> dict:
+    expense["shares"] = {m: to_major(v) for m, v in expense["shares"].items()}
+    return trusted(expense, GroupExpense)
+
+async def _member_group(group_id: str, current_user: dict) -> dict:
+    group = await db.groups.find_one({"id": group_id, "members.user_id": current_user["id"]}, {"_id": 0})
+    if group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return group
+
+def _shares(group: dict, expense: GroupExpenseCreate) -> dict:
+    member_ids = [m["id"] for m in group["members"]]
+    if expense.paid_by not in member_ids:
+        raise HTTPException(status_code=400, detail="The payer is not a member of this group")
+    try:
+        return compute_shares(expense.amount, expense.split_type, member_ids, expense.participants, expense.split)
+    except SplitError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _record(group: dict, expense: GroupExpenseCreate, current_user: dict, kind: str = "expense") -> dict:
+    expense_dict = expense.dict()
+    expense_dict.update(
+        id=str(uuid.uuid4()), group_id=group["id"], kind=kind, shares=_shares(group, expense),
+        created_by=current_user["id"], created_at=datetime.utcnow(), version=1,
+    )
+    await db.group_expenses.insert_one(expense_dict)
+    await db.groups.update_one({"id": group["id"]}, inc_update(deltas(expense_dict)))
+    return expense_dict
+
+@router.post("/", response_model=Group)
+async def create_group(group: GroupCreate, current_user: dict = Depends(get_current_user)):
+    emails = [m.email for m in group.members if m.email]
+    accounts = {u["email"]: u["id"] async for u in db.users.find({"email": {"$in": emails}}, {"_id": 0, "email": 1, "id": 1})}
+    members = [{"id": str(uuid.uuid4()), "name": current_user["name"], "email": current_user["email"], "user_id": current_user["id"]}]
+    for member in group.members:
+        if member.email and member.email == current_user["email"]:
+            continue
+        members.append({"id": str(uuid.uuid4()), "name": member.name, "email": member.email, "user_id": accounts.get(member.email)})
+
+    group_dict = {
+        "id": str(uuid.uuid4()),
+        "name": group.name,
+        "currency": group.currency,
+        "owner_id": current_user["id"],
+        "members": members,
+        "balances": {},
+        "created_at": datetime.utcnow(),
+    }
+    await db.groups.insert_one(group_dict)
+    return ORJSONResponse(_group_out(group_dict))
+
+@router.get("/", response_model=List[Group])
+async def get_groups(current_user: dict = Depends(get_current_user)):
+    cursor = db.groups.find({"members.user_id": current_user["id"]}, {"_id": 0}).sort("created_at", -1)
+    groups = await cursor.to_list(length=200)
+    return ORJSONResponse([_group_out(g) for g in groups])
+
+@router.get("/{group_id}", response_model=Group)
+async def get_group(group_id: str, current_user: dict = Depends(get_current_user)):
+    return ORJSONResponse(_group_out(await _member_group(group_id, current_user)))
+
+@router.post("/{group_id}/members", response_model=Group)
+async def add_member(group_id: str, member: GroupMemberCreate, current_user: dict = Depends(get_current_user)):
+    group = await _member_group(group_id, current_user)
+    if member.email and any(m.get("email") == member.email for m in group["members"]):
+        raise HTTPException(status_code=400, detail="Already a member")
+    account = await db.users.find_one({"email": member.email}, {"_id": 0, "id": 1}) if member.email else None
+    member_dict = {"id": str(uuid.uuid4()), "name": member.name, "email": member.email, "user_id": account["id"] if account else None}
+    await db.groups.update_one({"id": group_id}, {"$push": {"members": member_dict}})
+    group["members"].append(member_dict)
+    return ORJSONResponse(_group_out(group))
+
+@router.delete("/{group_id}/members/{member_id}")
+async def remove_member(group_id: str, member_id: str, current_user: dict = Depends(get_current_user)):
+    group = await _member_group(group_id, current_user)
+    member = next((m for m in group["members"] if m["id"] == member_id), None)
+    if member is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+    if member.get("user_id") == group["owner_id"]:
+        raise HTTPException(status_code=400, detail="The group owner cannot be removed")
+    # Editing or deleting an expense that still names them would bring their balance back
+    if await db.group_expenses.find_one(
+        {"group_id": group_id, "$or": [{"paid_by": member_id}, {f"shares.{member_id}": {"$exists": True}}]}, {"_id": 1}
+    ):
+        raise HTTPException(status_code=400, detail="Member still appears in the group's expenses")
+    # Only a settled member can leave; the balance check and the removal are one write
+    result = await db.groups.update_one(
+        {"id": group_id, "$or": [{f"balances.{member_id}": {"$exists": False}}, {f"balances.{member_id}": 0}]},
+        {"$pull": {"members": {"id": member_id}}, "$unset": {f"balances.{member_id}": ""}},
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=400, detail="Member has an unsettled balance")
+    return {"status": "removed"}
+
+@router.post("/{group_id}/expenses", response_model=GroupExpense)
+async def create_group_expense(group_id: str, expense: GroupExpenseCreate, current_user: dict = Depends(get_current_user)):
+    group = await _member_group(group_id, current_user)
+    return ORJSONResponse(_expense_out(await _record(group, expense, current_user)))
+
+@router.get("/{group_id}/expenses", response_model=List[GroupExpense])
+async def get_group_expenses(
+    group_id: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    await _member_group(group_id, current_user)
+    cursor = db.group_expenses.find({"group_id": group_id}, {"_id": 0}).sort("date", -1).skip((page - 1) * page_size).limit(page_size)
+    expenses = await cursor.to_list(length=page_size)
+    return ORJSONResponse([_expense_out(e) for e in expenses])
+
+@router.put("/{group_id}/expenses/{expense_id}", response_model=GroupExpense)
+async def update_group_expense(group_id: str, expense_id: str, expense: GroupExpenseCreate, current_user: dict = Depends(get_current_user)):
+    group = await _member_group(group_id, current_user)
+    old = await db.group_expenses.find_one({"id": expense_id, "group_id": group_id, "kind": "expense"}, {"_id": 0})
+    if old is None:
+        raise HTTPException(status_code=404, detail="Expense not found")
+
+    new = {**old, **expense.dict(), "shares": _shares(group, expense), "version": old["version"] + 1}
+    # The version guard makes a concurrent edit fail instead of undoing the same old split twice
+    result = await db.group_expenses.replace_one({"id": expense_id, "version": old["version"]}, new)
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Expense was changed concurrently, reload and retry")
+    change = merge(deltas(old, -1), deltas(new))
+    if change:
+        await db.groups.update_one({"id": group_id}, inc_update(change))
+    return ORJSONResponse(_expense_out(new))
+
+@router.delete("/{group_id}/expenses/{expense_id}")
+async def delete_group_expense(group_id: str, expense_id: str, current_user: dict = Depends(get_current_user)):
+    await _member_group(group_id, current_user)
+    old = await db.group_expenses.find_one({"id": expense_id, "group_id": group_id}, {"_id": 0})
+    if old is None:
+        raise HTTPException(status_code=404, detail="Expense not found")
+    result = await db.group_expenses.delete_one({"id": expense_id, "version": old["version"]})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=409, detail="Expense was changed concurrently, reload and retry")
+    await db.groups.update_one({"id": group_id}, inc_update(deltas(old, -1)))
+    return {"status": "deleted"}
+
+@router.post("/{group_id}/payments", response_model=GroupExpense)
+async def record_payment(group_id: str, payment: GroupPaymentCreate, current_user: dict = Depends(get_current_user)):
+    # A settlement transfer is an expense paid by one member, owed entirely by the other
+    group = await _member_group(group_id, current_user)
+    if payment.from_member == payment.to_member:
+        raise HTTPException(status_code=400, detail="A payment needs two different members")
+    expense = GroupExpenseCreate(
+        amount=payment.amount,
+        description="Payment",
+        date=payment.date or datetime.utcnow(),
+        paid_by=payment.from_member,
+        split_type=SplitType.EXACT,
+        split={payment.to_member: payment.amount},
+    )
+    return ORJSONResponse(_expense_out(await _record(group, expense, current_user, kind="payment")))
+
+@router.get("/{group_id}/settlement", response_model=List[Transfer])
+async def get_settlement(group_id: str, current_user: dict = Depends(get_current_user)):
+    group = await _member_group(group_id, current_user)
+    transfers = settle(group.get("balances", {}))
+    return ORJSONResponse([
+        trusted({"from_member": debtor, "to_member": creditor, "amount": to_major(amount)}, Transfer)
+        for debtor, creditor, amount in transfers
+    ])
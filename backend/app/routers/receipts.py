@@ -0,0 +1,116 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from app.database import get_database
+from app.routers.expenses import get_current_user
+from app.image_utils import DERIVATIVE_SIZES, decode_base64_image, generate_receipt_derivatives
+from app.currency import BASE_CURRENCY
+from app.json_utils import ORJSONResponse
+from app.archive_utils import archived_blob, archived_receipt_count, newest_archived
+from app.http_utils import data_etag, etag_headers, etag_matches
+
+router = APIRouter(prefix="/receipts", tags=["receipts"])
+db = get_database()
+
+# Listed derivative URLs carry their content hash (?v=), so such a URL never changes content
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+# An unversioned URL changes content when the receipt does; revalidate with the ETag
+REVALIDATE_CACHE = "private, max-age=300"
+
+HAS_RECEIPT = {"$nin": [None, ""]}
+
+@router.get("/")
+async def list_receipts(
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(30, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    etag = data_etag(request, current_user)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    query = {"user_id": current_user["id"], "receipt_image_base64": HAS_RECEIPT}
+    offset = (page - 1) * page_size
+    archived_total = await archived_receipt_count(db, current_user["id"])
+    total = await db.expenses.count_documents(query) + archived_total
+    # Never pull the full-size base64 blobs for a listing
+    cursor = db.expenses.find(
+        query,
+        {"_id": 0, "id": 1, "vendor": 1, "date": 1, "amount": 1, "currency": 1, "category": 1}
+    ).sort("date", -1)
+    if not archived_total:
+        expenses = await cursor.skip(offset).limit(page_size).to_list(length=page_size)
+    else:
+        # Archived months are usually older, but a backdated receipt can sort among
+        # them, so both sides are merged up to the end of this page
+        expenses = await cursor.limit(offset + page_size).to_list(length=None)
+        expenses += await newest_archived(db, current_user["id"], offset + page_size, receipts_only=True)
+        expenses = sorted(expenses, key=lambda e: e["date"], reverse=True)[offset:offset + page_size]
+
+    ids = [e["id"] for e in expenses]
+    derivatives = await db.receipt_derivatives.find(
+        {"expense_id": {"$in": ids}}, {"_id": 0, "expense_id": 1, "size": 1, "etag": 1, "width": 1, "height": 1}
+    ).to_list(length=None)
+    versions = {(d["expense_id"], d["size"]): d for d in derivatives}
+
+    items = []
+    for e in expenses:
+        item = {
+            "id": e["id"],
+            "vendor": e.get("vendor"),
+            "date": e["date"],
+            "amount": e["amount"],
+            "currency": e.get("currency", BASE_CURRENCY),
+            "category": e.get("category"),
+            "full_url": f"/receipts/{e['id']}/full",
+        }
+        for size in DERIVATIVE_SIZES:
+            d = versions.get((e["id"], size))
+            item[f"{size}_url"] = f"/receipts/{e['id']}/{size}" + (f"?v={d['etag']}" if d else "")
+        items.append(item)
+
+    return ORJSONResponse(
+        {"items": items, "page": page, "page_size": page_size, "total": total},
+        headers=etag_headers(etag)
+    )
+
+@router.get("/{expense_id}/{size}")
+async def get_receipt_image(
+    expense_id: str,
+    size: str,
+    request: Request,
+    v: str = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    if size != "full" and size not in DERIVATIVE_SIZES:
+        raise HTTPException(status_code=404, detail="Unknown receipt size")
+
+    if size == "full":
+        expense = await db.expenses.find_one(
+            {"id": expense_id, "user_id": current_user["id"]}, {"_id": 0, "receipt_image_base64": 1}
+        ) or await archived_blob(db, current_user["id"], expense_id)
+        if not expense or not expense.get("receipt_image_base64"):
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        return Response(
+            content=decode_base64_image(expense["receipt_image_base64"]),
+            media_type="image/jpeg",
+            headers={"Cache-Control": "private, max-age=3600"}
+        )
+
+    derivative = await db.receipt_derivatives.find_one({"expense_id": expense_id, "size": size, "user_id": current_user["id"]})
+    if derivative is None:
+        # Receipts saved before derivatives existed are rendered on first view
+        expense = await db.expenses.find_one({"id": expense_id, "user_id": current_user["id"]})
+        if expense is None:
+            blob = await archived_blob(db, current_user["id"], expense_id)
+            expense = blob and {"id": expense_id, "user_id": current_user["id"], "receipt_image_base64": blob.get("receipt_image_base64")}
+        if not expense or not expense.get("receipt_image_base64"):
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        generated = await generate_receipt_derivatives(db, expense)
+        if size not in generated:
+            raise HTTPException(status_code=422, detail="Receipt image could not be processed")
+        derivative = generated[size]
+
+    etag = f'"{derivative["etag"]}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE if v == derivative["etag"] else REVALIDATE_CACHE}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=bytes(derivative["data"]), media_type=derivative["mime"], headers=headers)
@@ -1,17 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import StreamingResponse, FileResponse
 from app.database import get_database
 from app.routers.expenses import get_current_user
 from datetime import datetime
 import io
 import csv
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.graphics.charts.legends import Legend
+from app.loaders import reportlab
+from app.currency import BASE_CURRENCY, get_fx_table, currency_symbol
+from app.archive_utils import archived_expenses
+from app.admission_utils import admission
+from app.http_utils import data_etag, etag_headers, etag_matches
+from app.forecast_utils import get_forecast, projected_spent
+from app.cache_utils import namespace
 from typing import List, Dict
 import os
 import collections
@@ -19,12 +19,20 @@ import collections
 router = APIRouter(prefix="/reports", tags=["reports"])
 db = get_database()
 
+# Rendered PDFs, shared by the workers. The key carries the user's data_version and the
+# day (the projection moves daily), so a changed report is a new entry, never a stale one
+_reports = namespace("pdf_reports", max_entries=32, ttl=3600, shared=True)
+
 @router.get("/csv")
 async def get_csv_report(
+    request: Request,
     month: int = Query(...), 
     year: int = Query(...), 
     current_user: dict = Depends(get_current_user)
 ):
+    etag = data_etag(request, current_user)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
     start_date = datetime(year, month, 1)
     if month == 12:
         end_date = datetime(year + 1, 1, 1)
@@ -37,10 +45,12 @@ async def get_csv_report(
     }).sort("date", 1)
     
     expenses = await cursor.to_list(length=None)
+    expenses += await archived_expenses(db, current_user["id"], start_date, end_date)
+    expenses.sort(key=lambda e: e["date"])
     
     output = io.StringIO()
     writer = csv.writer(output)
-    writer.writerow(["Date", "Vendor", "Category", "Amount", "Description", "Payment Mode", "Source"])
+    writer.writerow(["Date", "Vendor", "Category", "Amount", "Currency", "Description", "Payment Mode", "Source"])
     
     for exp in expenses:
         writer.writerow([
@@ -48,6 +58,7 @@ async def get_csv_report(
             exp.get("vendor", "N/A"),
             exp["category"],
             exp["amount"],
+            exp.get("currency", BASE_CURRENCY),
             exp.get("description", ""),
             exp.get("payment_mode", "upi"),
             exp.get("source", "manual")
@@ -57,7 +68,7 @@ async def get_csv_report(
     return StreamingResponse(
         io.BytesIO(output.getvalue().encode()),
         media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=expenses_{year}_{month}.csv"}
+        headers={"Content-Disposition": f"attachment; filename=expenses_{year}_{month}.csv", **etag_headers(etag)}
     )
 
 @router.get("/pdf")
@@ -66,6 +77,20 @@ async def get_pdf_report(
     year: int = Query(...), 
     current_user: dict = Depends(get_current_user)
 ):
+    key = f"{current_user['id']}:{current_user.get('data_version', 0)}:{year}-{month}:{datetime.utcnow().date()}"
+    pdf = await _reports.get(key)
+    if pdf is None:
+        # Held for the whole render, which runs on the event loop
+        async with admission("report", current_user["id"]):
+            pdf = await _render_pdf_report(current_user, month, year)
+        await _reports.set(key, pdf)
+    return StreamingResponse(
+        io.BytesIO(pdf),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=statement_{year}_{month}.pdf"}
+    )
+
+async def _render_pdf_report(current_user: dict, month: int, year: int) -> bytes:
     start_date = datetime(year, month, 1)
     if month == 12:
         end_date = datetime(year + 1, 1, 1)
@@ -74,34 +99,61 @@ async def get_pdf_report(
 
     cursor = db.expenses.find({
         "user_id": current_user["id"],
-        "date": {"$gte": start_date, "$lt": end_date}
+        "date": {"$gte": start_date, "$lt": end_date},
+        "duplicate_of": None
     }).sort("date", 1)
     
     expenses = await cursor.to_list(length=None)
+    expenses += [e for e in await archived_expenses(db, current_user["id"], start_date, end_date) if not e["duplicate_of"]]
+    expenses.sort(key=lambda e: e["date"])
     
-    # Financial Insights
+    # Financial Insights, in the user's currency
+    currency = current_user.get("currency", BASE_CURRENCY)
+    symbol = currency_symbol(currency)
+    converted = get_fx_table().convert(
+        [e["amount"] for e in expenses], [e.get("currency") for e in expenses], [e["date"] for e in expenses], currency
+    )
     category_totals = collections.defaultdict(float)
-    for e in expenses:
-        category_totals[e["category"]] += e["amount"]
+    for e, amount in zip(expenses, converted):
+        e["converted_amount"] = float(amount)
+        category_totals[e["category"]] += e["converted_amount"]
     
     total_spent = sum(category_totals.values())
     top_category = max(category_totals.items(), key=lambda x: x[1])[0] if category_totals else "N/A"
-    avg_daily = total_spent / 30 # Simplified
+    # Average over the days of the month so far (all of them for a past month)
+    today = datetime.utcnow().date()
+    elapsed_days = min((end_date.date() - start_date.date()).days, max((today - start_date.date()).days + 1, 1))
+    avg_daily = total_spent / elapsed_days
+
+    # Month-end projection from the stored forecast; a past month is simply its total
+    forecast = await get_forecast(db, current_user)
+    if forecast is not None and forecast.get("currency") != currency:
+        forecast = None
+    if end_date.date() <= today:
+        projected_total = total_spent
+    elif forecast is not None:
+        projected_total = sum(
+            projected_spent(forecast, category, month, year, category_totals.get(category, 0.0), today)
+            for category in set(category_totals) | set(forecast["categories"])
+        )
+    else:
+        projected_total = None
     
+    rl = reportlab() # imported on first render, see app.loaders
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=40, bottomMargin=40)
+    doc = rl.SimpleDocTemplate(buffer, pagesize=rl.A4, rightMargin=40, leftMargin=40, topMargin=40, bottomMargin=40)
     elements = []
     
-    styles = getSampleStyleSheet()
+    styles = rl.getSampleStyleSheet()
     
     # Custom Styles
-    title_style = ParagraphStyle(
-        'TitleStyle', parent=styles['Heading1'], fontSize=28, textColor=colors.HexColor("#00D1FF"),
+    title_style = rl.ParagraphStyle(
+        'TitleStyle', parent=styles['Heading1'], fontSize=28, textColor=rl.colors.HexColor("#00D1FF"),
         alignment=0, spaceAfter=2
     )
-    metric_label_style = ParagraphStyle('MetricLabel', parent=styles['Normal'], fontSize=9, textColor=colors.grey, textTransform='uppercase', letterSpacing=1)
-    metric_value_style = ParagraphStyle('MetricValue', parent=styles['Normal'], fontSize=16, textColor=colors.black, fontWeight='bold')
-    section_header_style = ParagraphStyle('SectionHeader', parent=styles['Heading2'], fontSize=14, textColor=colors.black, spaceBefore=20, spaceAfter=10)
+    metric_label_style = rl.ParagraphStyle('MetricLabel', parent=styles['Normal'], fontSize=9, textColor=rl.colors.grey, textTransform='uppercase', letterSpacing=1)
+    metric_value_style = rl.ParagraphStyle('MetricValue', parent=styles['Normal'], fontSize=16, textColor=rl.colors.black, fontWeight='bold')
+    section_header_style = rl.ParagraphStyle('SectionHeader', parent=styles['Heading2'], fontSize=14, textColor=rl.colors.black, spaceBefore=20, spaceAfter=10)
 
     # Header Row (Title + Mascot)
     mascot_path = "/Users/suryansh/.gemini/antigravity/brain/1b3d340c-5a26-436f-8b09-760521de636a/report_mascot_owl_monthly_statement_inr_1769350970462.png"
@@ -109,39 +161,43 @@ async def get_pdf_report(
     header_data = [
         [
             [
-                Paragraph("MONTHLY", ParagraphStyle('SubTitle', parent=styles['Normal'], fontSize=12, textColor=colors.grey, letterSpacing=4)),
-                Paragraph("STATEMENT", title_style),
-                Paragraph(f"{datetime(year, month, 1).strftime('%B %Y')}", ParagraphStyle('MonthStyle', parent=styles['Normal'], fontSize=10, textColor=colors.grey)),
+                rl.Paragraph("MONTHLY", rl.ParagraphStyle('SubTitle', parent=styles['Normal'], fontSize=12, textColor=rl.colors.grey, letterSpacing=4)),
+                rl.Paragraph("STATEMENT", title_style),
+                rl.Paragraph(f"{datetime(year, month, 1).strftime('%B %Y')}", rl.ParagraphStyle('MonthStyle', parent=styles['Normal'], fontSize=10, textColor=rl.colors.grey)),
             ],
-            Image(mascot_path, width=100, height=100) if os.path.exists(mascot_path) else ""
+            rl.Image(mascot_path, width=100, height=100) if os.path.exists(mascot_path) else ""
         ]
     ]
-    header_table = Table(header_data, colWidths=[350, 150])
-    header_table.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'CENTER'), ('ALIGN', (1,0), (1,0), 'RIGHT')]))
+    header_table = rl.Table(header_data, colWidths=[350, 150])
+    header_table.setStyle(rl.TableStyle([('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('ALIGN', (1,0), (1,0), 'RIGHT')]))
     elements.append(header_table)
-    elements.append(Spacer(1, 40))
+    elements.append(rl.Spacer(1, 40))
 
     # Metrics Row
     metrics_data = [
-        [Paragraph("TOTAL SPENT", metric_label_style), Paragraph("TOP CATEGORY", metric_label_style), Paragraph("DAILY AVG", metric_label_style)],
-        [Paragraph(f"₹{total_spent:,.0f}", metric_value_style), Paragraph(top_category, metric_value_style), Paragraph(f"₹{avg_daily:,.0f}", metric_value_style)]
+        [rl.Paragraph("TOTAL SPENT", metric_label_style), rl.Paragraph("TOP CATEGORY", metric_label_style), rl.Paragraph("DAILY AVG", metric_label_style), rl.Paragraph("PROJECTED", metric_label_style)],
+        [
+            rl.Paragraph(f"{symbol}{total_spent:,.0f}", metric_value_style), rl.Paragraph(top_category, metric_value_style),
+            rl.Paragraph(f"{symbol}{avg_daily:,.0f}", metric_value_style),
+            rl.Paragraph(f"{symbol}{projected_total:,.0f}" if projected_total is not None else "N/A", metric_value_style),
+        ]
     ]
-    metrics_table = Table(metrics_data, colWidths=[166, 166, 166])
-    metrics_table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,-1), colors.whitesmoke),
+    metrics_table = rl.Table(metrics_data, colWidths=[125, 125, 124, 124])
+    metrics_table.setStyle(rl.TableStyle([
+        ('BACKGROUND', (0,0), (-1,-1), rl.colors.whitesmoke),
         ('ROUNDEDCORNERS', [10, 10, 10, 10]),
         ('TOPPADDING', (0,0), (-1,-1), 15),
         ('BOTTOMPADDING', (0,0), (-1,-1), 15),
         ('LEFTPADDING', (0,0), (-1,-1), 15),
     ]))
     elements.append(metrics_table)
-    elements.append(Spacer(1, 40))
+    elements.append(rl.Spacer(1, 40))
 
     # Spending Chart Section
-    elements.append(Paragraph("Category Breakdown", section_header_style))
+    elements.append(rl.Paragraph("Category Breakdown", section_header_style))
     
-    drawing = Drawing(400, 200)
-    pc = Pie()
+    drawing = rl.Drawing(400, 200)
+    pc = rl.Pie()
     pc.x = 150
     pc.y = 50
     pc.width = 150
@@ -150,17 +206,17 @@ async def get_pdf_report(
     pc.labels = list(category_totals.keys())
     
     # Custom vibrant colors for the pie
-    chart_colors = [colors.HexColor("#00D1FF"), colors.HexColor("#FF4444"), colors.HexColor("#FFD700"), colors.HexColor("#BB86FC"), colors.HexColor("#03DAC6")]
+    chart_colors = [rl.colors.HexColor("#00D1FF"), rl.colors.HexColor("#FF4444"), rl.colors.HexColor("#FFD700"), rl.colors.HexColor("#BB86FC"), rl.colors.HexColor("#03DAC6")]
     for i, color in enumerate(chart_colors):
         if i < len(pc.data):
             pc.slices[i].fillColor = color
-            pc.slices[i].strokeColor = colors.white
+            pc.slices[i].strokeColor = rl.colors.white
             pc.slices[i].strokeWidth = 0.5
 
     drawing.add(pc)
     
     # Legend
-    lp = Legend()
+    lp = rl.Legend()
     lp.x = 320
     lp.y = 150
     lp.fontSize = 8
@@ -170,44 +226,38 @@ async def get_pdf_report(
     drawing.add(lp)
     
     elements.append(drawing)
-    elements.append(Spacer(1, 20))
+    elements.append(rl.Spacer(1, 20))
 
     # Detailed Transactions Table
-    elements.append(Paragraph("Detailed Transactions", section_header_style))
+    elements.append(rl.Paragraph("Detailed Transactions", section_header_style))
     data = [["DATE", "VENDOR", "CATEGORY", "AMOUNT"]]
     for exp in expenses:
         data.append([
             exp["date"].strftime("%d %b"),
             exp.get("vendor", "N/A")[:20].upper(),
             exp["category"].upper(),
-            f"₹{exp['amount']:,.2f}"
+            f"{symbol}{exp['converted_amount']:,.2f}"
         ])
     
-    table = Table(data, colWidths=[80, 160, 150, 110])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#0A0A0A")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    table = rl.Table(data, colWidths=[80, 160, 150, 110])
+    table.setStyle(rl.TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), rl.colors.HexColor("#0A0A0A")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), rl.colors.white),
         ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
         ('FONTSIZE', (0, 0), (-1, 0), 9),
         ('FONTSIZE', (0, 1), (-1, -1), 9),
         ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 0.1, colors.lightgrey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke])
+        ('GRID', (0, 0), (-1, -1), 0.1, rl.colors.lightgrey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [rl.colors.white, rl.colors.whitesmoke])
     ]))
     
     elements.append(table)
     
     # Footer
-    elements.append(Spacer(1, 50))
-    elements.append(Paragraph("This report exists to help you build better financial habits.", ParagraphStyle('FooterQuote', italic=True, fontSize=9, textColor=colors.grey, alignment=1)))
-    elements.append(Paragraph(f"Generated on {datetime.now().strftime('%d %b %Y %H:%M')}", ParagraphStyle('Timestamp', fontSize=7, textColor=colors.lightgrey, alignment=1)))
+    elements.append(rl.Spacer(1, 50))
+    elements.append(rl.Paragraph("This report exists to help you build better financial habits.", rl.ParagraphStyle('FooterQuote', italic=True, fontSize=9, textColor=rl.colors.grey, alignment=1)))
+    elements.append(rl.Paragraph(f"Generated on {datetime.now().strftime('%d %b %Y %H:%M')}", rl.ParagraphStyle('Timestamp', fontSize=7, textColor=rl.colors.lightgrey, alignment=1)))
     
     doc.build(elements)
-    
-    buffer.seek(0)
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=statement_{year}_{month}.pdf"}
-    )
+    return buffer.getvalue()
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from app.database import get_database
+from app.routers.expenses import get_current_user
+from app.transfer_utils import InvalidArchive, export_archive, import_archive
+from datetime import datetime
+import os
+import tempfile
+
+router = APIRouter(tags=["transfer"])
+db = get_database()
+
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(2 * 1024 ** 3)))
+# Uploads stay in memory up to this size, then spill to disk
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+@router.get("/export")
+async def export_account(current_user: dict = Depends(get_current_user)):
+    """The whole account as a zip of NDJSON files and receipt images, streamed as it is read."""
+    filename = f"expenses-export-{datetime.utcnow():%Y%m%d}.zip"
+    return StreamingResponse(
+        export_archive(db, current_user),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+@router.post("/import")
+async def import_account(request: Request, current_user: dict = Depends(get_current_user)):
+    """Imports a GET /export archive sent as the raw request body."""
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as spool:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Archive too large")
+            spool.write(chunk)
+        spool.seek(0)
+        try:
+            return await import_archive(db, current_user, spool)
+        except InvalidArchive as e:
+            raise HTTPException(status_code=400, detail=str(e))
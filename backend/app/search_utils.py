@@ -0,0 +1,106 @@
+import re
+from collections import Counter
+from app.cache_utils import namespace
+
+# Characters OCR commonly reads in place of letters ("UNIQL0", "AMAZ0N", "5TARBUCKS")
+OCR_CONFUSABLES = str.maketrans({"0": "o", "1": "l", "5": "s", "8": "b", "|": "l", "$": "s"})
+
+MIN_RECALL = 0.6       # share of the query's trigrams a vendor must contain
+MAX_FUZZY_VENDORS = 20
+MAX_CANDIDATES = 1000  # per source, before ranking
+TEXT_WEIGHT = 0.6
+FUZZY_WEIGHT = 0.4
+
+INDEX_TTL_SECONDS = 600
+MAX_INDEXED_USERS = 500
+
+def normalize(text: str) -> str:
+    tokens = re.findall(r"[a-z0-9|$]+", (text or "").lower())
+    # Digits inside words are OCR slips; pure numbers (store numbers, amounts) stay as they are
+    return " ".join(t.translate(OCR_CONFUSABLES) if re.search(r"[a-z]", t) else t for t in tokens)
+
+def trigrams(text: str) -> set:
+    grams = set()
+    for token in normalize(text).split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class VendorIndex:
+    """Trigram postings over one user's distinct vendor names."""
+
+    def __init__(self, vendors=()):
+        self.vendors = []
+        self.sizes = []
+        self.postings = {}
+        self.known = set()
+        for vendor in vendors:
+            self.add(vendor)
+
+    def add(self, vendor: str):
+        if not vendor or vendor in self.known:
+            return
+        self.known.add(vendor)
+        grams = trigrams(vendor)
+        vendor_id = len(self.vendors)
+        self.vendors.append(vendor)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(vendor_id)
+
+    def match(self, query: str, limit: int = MAX_FUZZY_VENDORS):
+        """[(vendor, similarity)] best first; similarity mixes query recall with Dice overlap."""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        results = []
+        for vendor_id, n in shared.items():
+            recall = n / len(grams)
+            if recall >= MIN_RECALL:
+                dice = 2 * n / (len(grams) + self.sizes[vendor_id])
+                results.append((self.vendors[vendor_id], 0.7 * recall + 0.3 * dice))
+        results.sort(key=lambda r: -r[1])
+        return results[:limit]
+
+# Per worker, kept current in place; other workers' writes drop an entry
+_indexes = namespace("vendor_index", max_entries=MAX_INDEXED_USERS, ttl=INDEX_TTL_SECONDS, by_user=True)
+
+async def get_vendor_index(db, user_id: str) -> VendorIndex:
+    index = _indexes.get_local(user_id)
+    if index is None:
+        index = VendorIndex(await db.expenses.distinct("vendor", {"user_id": user_id}))
+        _indexes.set_local(user_id, index)
+    return index
+
+def note_vendor(user_id: str, vendor: str):
+    """Keeps a cached index current when an expense is written; deleted vendors age out with the TTL."""
+    index = _indexes.peek(user_id)
+    if index is not None:
+        index.add(vendor)
+
+def forget_vendor_index(user_id: str):
+    """Drops a cached index after bulk changes; the next search rebuilds it."""
+    _indexes.drop(user_id)
+
+def text_query(user_id: str, q: str) -> dict:
+    return {"user_id": user_id, "$text": {"$search": q}}
+
+def rank(text_hits, fuzzy_hits, vendor_scores: dict) -> list:
+    """
+    Merges $text hits (doc, textScore) with fuzzy vendor hits into one list,
+    best first: normalised text score and vendor similarity are blended, so a
+    document found both ways outranks one found either way alone.
+    """
+    best_text = max((score for _, score in text_hits), default=0) or 1.0
+    merged = {}
+    for doc, score in text_hits:
+        merged[doc["id"]] = [doc, TEXT_WEIGHT * score / best_text]
+    for doc in fuzzy_hits:
+        merged.setdefault(doc["id"], [doc, 0.0])
+    for entry in merged.values():
+        entry[1] += FUZZY_WEIGHT * vendor_scores.get(entry[0].get("vendor"), 0.0)
+    ranked = sorted(merged.values(), key=lambda e: (-e[1], -e[0]["date"].timestamp()))
+    return [(doc, round(score, 4)) for doc, score in ranked]
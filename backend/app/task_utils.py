@@ -0,0 +1,173 @@
+"""
+In-process background queue for write side effects.
+
+Routes enqueue work that does not have to land before the response:
+
+    enqueue("ocr_learning", entry, key=current_user["id"])
+
+One worker task per process wakes on the first item, waits
+TASK_FLUSH_SECONDS for more to gather, and hands each kind's items (up to
+TASK_BATCH_SIZE per round) to that kind's handler in one call, so the
+handler can write them with one insert_many / bulk_write. Handlers are
+registered next to the logic they run:
+
+    @handler("ocr_learning")
+    async def store_learning(db, entries: list): ...
+
+A batch that raises is set aside and retried once TASK_RETRY_SECONDS have
+passed, doubling, up to TASK_MAX_ATTEMPTS times, then logged and dropped;
+the worker carries on with other items meanwhile. Handlers must be safe to
+run twice. One whose writes are not (an $inc) registers a `retry`
+function that repairs instead of repeating. Shutdown drains the queue.
+
+`settled(kind, key)` waits until no item of `kind` for `key` is queued or
+running, for reads that should see a request's own side effects.
+
+The queue is per worker process and in memory: items still queued when a
+process is killed are lost, as with FastAPI BackgroundTasks. A durable
+Mongo-backed queue would keep this enqueue/handler interface.
+"""
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import os
+import time
+from app.database import get_database
+
+TASK_BATCH_SIZE = int(os.getenv("TASK_BATCH_SIZE", "500"))
+TASK_FLUSH_SECONDS = float(os.getenv("TASK_FLUSH_SECONDS", "0.02"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "5"))
+TASK_RETRY_SECONDS = 0.5
+TASK_SETTLE_SECONDS = 2.0   # longest a read waits for its own side effects
+TASK_DRAIN_SECONDS = 15.0
+
+Handler = collections.namedtuple("Handler", "run retry")
+
+logger = logging.getLogger("app.tasks")
+
+_handlers = {}
+_queue = collections.deque()           # (kind, key, payload)
+_delayed = []                          # heap of (not_before, seq, kind, attempt, items) failed batches
+_sequence = itertools.count()
+_pending = collections.Counter()       # (kind, key) -> items queued, running or awaiting a retry
+_waiters = {}                          # (kind, key) -> futures resolved when it reaches 0
+_metrics = {}                          # kind -> counters
+_wakeup = None
+_worker = None
+_stopping = False
+
+def handler(kind: str, retry=None):
+    """Registers `async def fn(db, payloads)` for `kind`; `retry` (same signature) runs on later attempts."""
+    def register(fn):
+        _handlers[kind] = Handler(fn, retry or fn)
+        _metrics[kind] = collections.Counter()
+        return fn
+    return register
+
+def enqueue(kind: str, payload, key: str = None):
+    """Queues one item; must be called from the event loop."""
+    global _wakeup, _worker
+    if kind not in _handlers:
+        raise ValueError(f"No handler for background task {kind!r}")
+    loop = asyncio.get_running_loop()
+    if _worker is None or _worker.done() or _worker.get_loop() is not loop:
+        _wakeup = asyncio.Event()
+        _worker = loop.create_task(_run())
+    _queue.append((kind, key, payload))
+    _pending[(kind, key)] += 1
+    _metrics[kind]["enqueued"] += 1
+    _wakeup.set()
+
+async def settled(kind: str, key: str) -> bool:
+    """Waits (up to TASK_SETTLE_SECONDS) for `key`'s items of `kind`; returns whether there were any."""
+    if not _pending.get((kind, key)):
+        return False
+    future = asyncio.get_running_loop().create_future()
+    _waiters.setdefault((kind, key), []).append(future)
+    try:
+        await asyncio.wait_for(future, TASK_SETTLE_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Background tasks still pending", extra={"kind": kind})
+    return True
+
+def _done(kind: str, key: str):
+    _pending[(kind, key)] -= 1
+    if _pending[(kind, key)] <= 0:
+        del _pending[(kind, key)]
+        for future in _waiters.pop((kind, key), ()):
+            if not future.done():
+                future.set_result(None)
+
+async def _process(db, kind: str, items: list, attempt: int = 1):
+    entry, counters = _handlers[kind], _metrics[kind]
+    payloads = [payload for _, payload in items]
+    started = time.perf_counter()
+    try:
+        await (entry.run if attempt == 1 else entry.retry)(db, payloads)
+    except Exception:
+        if attempt < TASK_MAX_ATTEMPTS:
+            counters["retries"] += 1
+            logger.warning("Background task batch failed, retrying", extra={"kind": kind, "attempt": attempt}, exc_info=True)
+            # The items stay pending, so settled() still waits for them
+            not_before = time.monotonic() + TASK_RETRY_SECONDS * 2 ** (attempt - 1)
+            heapq.heappush(_delayed, (not_before, next(_sequence), kind, attempt + 1, items))
+            return
+        counters["dropped"] += len(payloads)
+        logger.exception("Background task batch dropped", extra={"kind": kind, "items": len(payloads)})
+    else:
+        counters["processed"] += len(payloads)
+    finally:
+        counters["batches"] += 1
+        counters["busy_ms"] += round((time.perf_counter() - started) * 1000)
+    for key, _ in items:
+        _done(kind, key)
+
+async def _run():
+    db = get_database()
+    while True:
+        while _delayed and _delayed[0][0] <= time.monotonic():
+            _, _, kind, attempt, items = heapq.heappop(_delayed)
+            await _process(db, kind, items, attempt)
+        if not _queue:
+            if _stopping and not _delayed:
+                return
+            _wakeup.clear()
+            try:
+                # Sleep until new work arrives or the next retry is due
+                await asyncio.wait_for(_wakeup.wait(), _delayed[0][0] - time.monotonic() if _delayed else None)
+            except asyncio.TimeoutError:
+                continue
+            if not _stopping:
+                # Let the rest of a burst arrive so it goes out as one write
+                await asyncio.sleep(TASK_FLUSH_SECONDS)
+        batches = {}
+        for _ in range(min(len(_queue), TASK_BATCH_SIZE)):
+            kind, key, payload = _queue.popleft()
+            batches.setdefault(kind, []).append((key, payload))
+        for kind, items in batches.items():
+            await _process(db, kind, items)
+
+async def drain():
+    """Processes everything queued, retries included, then stops the worker (shutdown)."""
+    global _stopping, _worker
+    if _worker is None or _worker.get_loop() is not asyncio.get_running_loop():
+        _worker = None
+        return
+    _stopping = True
+    _wakeup.set()
+    try:
+        await asyncio.wait_for(_worker, TASK_DRAIN_SECONDS)
+    except asyncio.TimeoutError:
+        logger.error("Background tasks not drained", extra={"items": len(_queue) + sum(len(items) for *_, items in _delayed)})
+    finally:
+        _stopping = False
+        _worker = None
+
+def task_metrics() -> dict:
+    return {
+        "queued": len(_queue),
+        "awaiting_retry": sum(len(items) for *_, items in _delayed),
+        "kinds": {kind: dict(counters) for kind, counters in _metrics.items()},
+    }
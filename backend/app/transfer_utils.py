@@ -0,0 +1,273 @@
+"""
+Whole-account export and import.
+
+An export is a zip, written while it streams out, of:
+
+    expenses.ndjson       one expense per line, hot and archived, without receipt images
+    budgets.ndjson
+    ocr_learning.ndjson   the account's OCR corrections
+    receipts/<expense id> receipt images, decoded
+    manifest.json         format, source account and counts, written last
+
+Every collection is read through a Motor cursor and written as it arrives,
+so memory stays flat whatever the account size. The zip uses data
+descriptors, so it needs no seeking while it is written.
+
+An import spools the upload to a temporary file (zip needs its central
+directory, which comes last), then reads each member line by line and
+writes it in batches: one insert_many for rows new to the account and one
+bulk update for rows it already has. Rows are validated like POST /expenses/. An id
+is kept only where the importing account already has it (re-importing its
+own export), and otherwise derived from (account, original id), so
+importing the same archive twice upserts rather than duplicates. Derived data (budget totals, recurring detection,
+thumbnails, the archive tier) is rebuilt afterwards by the usual jobs.
+"""
+import base64
+import io
+import time
+import uuid
+import zipfile
+from datetime import datetime
+import orjson
+from pymongo import ReplaceOne, UpdateOne
+from app.models import BudgetCreate, ExpenseCreate
+from app.archive_utils import archive_cutoff, archive_user, bucket_rows, restore_expenses
+
+FORMAT = "expense-tracker-export/1"
+FLUSH_BYTES = 256 * 1024
+IMPORT_BATCH = 1000
+IMPORT_BATCH_BYTES = 16 * 1024 * 1024  # receipt images count against it
+
+class InvalidArchive(ValueError):
+    """The upload is not a readable export."""
+
+class _Sink(io.RawIOBase):
+    """Write-only, unseekable file that keeps what zipfile wrote until it is drained."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+def _line(doc: dict) -> bytes:
+    doc.pop("_id", None)
+    return orjson.dumps(doc, default=str) + b"\n"
+
+def _member(name: str, compress: bool = True) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    return info
+
+async def export_archive(db, user: dict):
+    """Async generator of zip bytes for StreamingResponse."""
+    user_id = user["id"]
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED)
+    counts = {"expenses": 0, "budgets": 0, "ocr_learning": 0, "receipts": 0}
+
+    with archive.open(_member("expenses.ndjson"), "w", force_zip64=True) as out:
+        cursor = db.expenses.find({"user_id": user_id}, {"_id": 0, "receipt_image_base64": 0})
+        async for expense in cursor:
+            out.write(_line(expense))
+            counts["expenses"] += 1
+            if sink.size >= FLUSH_BYTES:
+                yield sink.drain()
+        # Archived months, one bucket at a time; their OCR payloads live with the blobs
+        async for bucket in db.expense_archive.find({"user_id": user_id}, {"_id": 0, "totals": 0}):
+            rows = bucket_rows(bucket)
+            blobs = {
+                b["expense_id"]: b async for b in db.expense_blobs.find(
+                    {"expense_id": {"$in": [r["id"] for r in rows]}, "original_ocr_data": {"$ne": None}},
+                    {"_id": 0, "expense_id": 1, "original_ocr_data": 1},
+                )
+            }
+            for row in rows:
+                row.pop("has_receipt", None)
+                row["original_ocr_data"] = blobs.get(row["id"], {}).get("original_ocr_data")
+                out.write(_line(row))
+                counts["expenses"] += 1
+            if sink.size >= FLUSH_BYTES:
+                yield sink.drain()
+
+    for name, collection in (("budgets", db.budgets), ("ocr_learning", db.ocr_learning)):
+        with archive.open(_member(f"{name}.ndjson"), "w", force_zip64=True) as out:
+            async for doc in collection.find({"user_id": user_id}, {"_id": 0}):
+                out.write(_line(doc))
+                counts[name] += 1
+                if sink.size >= FLUSH_BYTES:
+                    yield sink.drain()
+
+    # Images are already compressed; store them as they are
+    receipts = db.expenses.find(
+        {"user_id": user_id, "receipt_image_base64": {"$nin": [None, ""]}}, {"_id": 0, "id": 1, "receipt_image_base64": 1}
+    )
+    archived_receipts = db.expense_blobs.find(
+        {"user_id": user_id, "receipt_image_base64": {"$nin": [None, ""]}}, {"_id": 0, "expense_id": 1, "receipt_image_base64": 1}
+    )
+    for cursor, id_field in ((receipts, "id"), (archived_receipts, "expense_id")):
+        async for doc in cursor:
+            with archive.open(_member(f"receipts/{doc[id_field]}", compress=False), "w", force_zip64=True) as out:
+                out.write(base64.b64decode(doc["receipt_image_base64"]))
+            counts["receipts"] += 1
+            if sink.size >= FLUSH_BYTES:
+                yield sink.drain()
+
+    manifest = {
+        "format": FORMAT,
+        "exported_at": datetime.utcnow(),
+        "user_id": user_id,
+        "email": user.get("email"),
+        "currency": user.get("currency"),
+        "counts": counts,
+    }
+    archive.writestr(_member("manifest.json"), orjson.dumps(manifest, default=str))
+    archive.close()
+    yield sink.drain()
+
+def _when(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value or datetime.utcnow()
+
+def _lines(archive: zipfile.ZipFile, name: str):
+    if name not in archive.NameToInfo:
+        return
+    with archive.open(name) as member:
+        for line in member:
+            if line.strip():
+                yield orjson.loads(line)
+
+async def _write_expenses(db, user_id: str, batch: list, derive_id):
+    """
+    Inserts rows not yet in the account and updates the rest, one round trip each.
+    An exported id is kept only where this account already has it; any other
+    becomes derive_id(id), since archive contents are client-supplied.
+    """
+    wanted = {e["id"] for e in batch} | {e["duplicate_of"] for e in batch if e.get("duplicate_of")}
+    wanted |= {derive_id(i) for i in wanted}
+    existing = {
+        d["id"] async for d in db.expenses.find({"id": {"$in": list(wanted)}, "user_id": user_id}, {"_id": 0, "id": 1})
+    }
+    # Archived rows come back first so they are updated rather than duplicated
+    existing |= await restore_expenses(db, user_id, wanted - existing)
+
+    def own(old):
+        return old if old in existing else derive_id(old)
+
+    for e in batch:
+        e["id"] = own(e["id"])
+        e["duplicate_of"] = e["duplicate_of"] and own(e["duplicate_of"])
+    fresh = [e for e in batch if e["id"] not in existing]
+    if fresh:
+        await db.expenses.insert_many(fresh, ordered=False)
+    updates = [UpdateOne({"id": e["id"], "user_id": user_id}, {"$set": e}) for e in batch if e["id"] in existing]
+    if updates:
+        await db.expenses.bulk_write(updates, ordered=False)
+
+async def import_archive(db, user: dict, spool) -> dict:
+    """Imports an export read from the file object `spool` into `user`'s account."""
+    from app.budget_events import invalidate_user_budgets
+    from app.search_utils import forget_vendor_index
+    from app.http_utils import bump_data_version
+
+    try:
+        archive = zipfile.ZipFile(spool)
+        manifest = orjson.loads(archive.read("manifest.json"))
+    except (zipfile.BadZipFile, KeyError, orjson.JSONDecodeError):
+        raise InvalidArchive("Not an expense export archive")
+    if manifest.get("format") != FORMAT:
+        raise InvalidArchive(f"Unsupported export format: {manifest.get('format')}")
+
+    user_id = user["id"]
+    namespace = uuid.uuid5(uuid.NAMESPACE_URL, f"expense-tracker:{user_id}")
+
+    def derive_id(old):
+        return str(uuid.uuid5(namespace, old))
+
+    counts = {"expenses": 0, "budgets": 0, "ocr_learning": 0, "receipts": 0}
+    try:
+        batch, batch_bytes = [], 0
+        for row in _lines(archive, "expenses.ndjson"):
+            expense = ExpenseCreate(**row).dict()
+            expense["id"] = str(row["id"])
+            expense["user_id"] = user_id
+            expense["created_at"] = _when(row.get("created_at"))
+            expense["duplicate_of"] = row.get("duplicate_of") and str(row["duplicate_of"])
+            expense["duplicate_score"] = row.get("duplicate_score")
+            # Members are random access once the central directory is read
+            receipt = f"receipts/{row['id']}"
+            if receipt in archive.NameToInfo:
+                expense["receipt_image_base64"] = base64.b64encode(archive.read(receipt)).decode()
+                batch_bytes += len(expense["receipt_image_base64"])
+                counts["receipts"] += 1
+            else:
+                # Keep an image already stored by an earlier import
+                expense.pop("receipt_image_base64")
+            batch.append(expense)
+            if len(batch) >= IMPORT_BATCH or batch_bytes >= IMPORT_BATCH_BYTES:
+                await _write_expenses(db, user_id, batch, derive_id)
+                counts["expenses"] += len(batch)
+                batch, batch_bytes = [], 0
+        if batch:
+            await _write_expenses(db, user_id, batch, derive_id)
+            counts["expenses"] += len(batch)
+
+        ops = []
+        for row in _lines(archive, "budgets.ndjson"):
+            budget = BudgetCreate(**row).dict()
+            key = {"user_id": user_id, "category": budget["category"], "month": budget["month"], "year": budget["year"]}
+            ops.append(UpdateOne(
+                key,
+                {"$set": {"monthly_limit": budget["monthly_limit"], "spent_synced": False},
+                 "$setOnInsert": {"id": derive_id(str(row["id"])) if row.get("id") else str(uuid.uuid4()), "current_spent": 0.0}},
+                upsert=True,
+            ))
+        if ops:
+            await db.budgets.bulk_write(ops, ordered=False)
+            counts["budgets"] = len(ops)
+
+        entries = []
+        for row in _lines(archive, "ocr_learning.ndjson"):
+            entry = {k: row.get(k) for k in ("vendor", "raw_text", "discrepancies")}
+            entry["created_at"] = _when(row.get("created_at"))
+            entry["id"] = str(row["id"]) if row.get("id") else str(uuid.uuid4())
+            entry["user_id"] = user_id
+            entries.append(entry)
+        ids = [e["id"] for e in entries]
+        owned = {
+            d["id"] async for d in db.ocr_learning.find({"id": {"$in": ids}, "user_id": user_id}, {"_id": 0, "id": 1})
+        }
+        ops = []
+        for entry in entries:
+            if entry["id"] not in owned:
+                entry["id"] = derive_id(entry["id"])
+            ops.append(ReplaceOne({"id": entry["id"], "user_id": user_id}, entry, upsert=True))
+        if ops:
+            await db.ocr_learning.bulk_write(ops, ordered=False)
+            counts["ocr_learning"] = len(ops)
+
+    except (ValueError, KeyError, TypeError, zipfile.BadZipFile) as e:
+        raise InvalidArchive(f"Import stopped after {counts}: {e}")
+
+    # Old months go back to the archive tier so hot rows stay newer than archived ones
+    archived = await archive_user(db, user_id, archive_cutoff())
+    await invalidate_user_budgets(db, user_id)
+    forget_vendor_index(user_id)
+    await bump_data_version(db, user_id)
+    return {"imported": counts, "archived": archived["archived"]}
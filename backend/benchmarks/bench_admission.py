@@ -0,0 +1,94 @@
+"""
+Noisy-neighbour latency with and without admission control.
+
+One user loops on 200-row statement uploads (POST /expenses/parse-pdf) from
+--greedy concurrent clients, retrying after Retry-After like the app does,
+while a second user sends a GET /expenses/ every second and a statement
+upload every five. Reports the quiet user's latencies and the greedy
+user's admitted and refused counts, with app.admission_utils turned off
+and then on.
+
+    python -m benchmarks.bench_admission [--seconds S] [--greedy C]
+"""
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import time
+from collections import Counter
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+async def scenario(client, ctx, pdf: str, seconds: float, greedy: int):
+    greedy_user, quiet_user = ctx.users[0], ctx.users[1]
+    stop = time.perf_counter() + seconds
+    greedy_statuses = Counter()
+    quiet = {"parse-pdf": [], "list": []}
+
+    async def flood():
+        while time.perf_counter() < stop:
+            response = await client.post("/api/expenses/parse-pdf", json={"pdf": pdf}, headers=ctx.auth(greedy_user))
+            greedy_statuses[response.status_code] += 1
+            if response.status_code == 429:
+                await asyncio.sleep(min(float(response.headers["retry-after"]), max(0.0, stop - time.perf_counter())))
+
+    async def timed(name, method, path, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, path, headers=ctx.auth(quiet_user), **kwargs)
+        if response.status_code == 200:
+            quiet[name].append(time.perf_counter() - started)
+
+    async def steady():
+        second = 0
+        while time.perf_counter() < stop:
+            tick = time.perf_counter()
+            await timed("list", "GET", "/api/expenses/")
+            if second % 5 == 0:
+                await timed("parse-pdf", "POST", "/api/expenses/parse-pdf", json={"pdf": pdf})
+            second += 1
+            await asyncio.sleep(max(0.0, 1.0 - (time.perf_counter() - tick)))
+
+    await asyncio.gather(steady(), *(flood() for _ in range(greedy)))
+    return quiet, greedy_statuses
+
+async def run(args):
+    from benchmarks.memory_motor import install
+    install()
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+    import httpx
+    import main
+    from app import admission_utils
+    from app.database import get_database
+    from benchmarks.datagen import Dataset
+    from benchmarks.load import Context
+
+    data = Dataset(users=2, years=1, per_month=30)
+    pdf = data.statements[200]
+    pdf = pdf if isinstance(pdf, str) else base64.b64encode(pdf).decode()
+    async with main.app.router.lifespan_context(main.app):
+        await data.load_into(get_database())
+        ctx = Context(data, seed=0)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            print(f"{args.greedy} greedy clients on parse-pdf (~{admission_utils.pdf_pages(pdf)} pages), {args.seconds:.0f}s per run")
+            for enabled in (False, True):
+                admission_utils.ADMISSION_ENABLED = enabled
+                admission_utils._classes = {n: admission_utils.RouteClass(n, l) for n, l in admission_utils.LIMITS.items()}
+                quiet, statuses = await scenario(client, ctx, pdf, args.seconds, args.greedy)
+                print(f"admission {'on' if enabled else 'off'}")
+                for name, latencies in quiet.items():
+                    ms = [t * 1000 for t in latencies]
+                    print(f"  quiet {name:<10} n={len(ms):<3} p50 {statistics.median(ms) if ms else float('nan'):8.1f}ms  p95 {percentile(ms, 0.95):8.1f}ms")
+                print(f"  greedy statuses {dict(statuses)}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--greedy", type=int, default=8)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
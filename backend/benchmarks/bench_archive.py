@@ -0,0 +1,98 @@
+"""
+Storage and scan time before and after archiving old months.
+
+Seeds one user's multi-year history into the in-memory Motor stand-in,
+then times the scans behind GET /expenses/summary, a twelve-month budget
+recompute and a monthly CSV report, before and after app.archive_utils
+compacts everything older than the horizon. Storage is the summed BSON
+size of the documents in each collection. Storage engine compression
+comes on top of that against a real mongod.
+
+    python -m benchmarks.bench_archive [--years Y] [--per-month N] [--days HORIZON]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+import bson
+
+async def collection_bytes(db, name: str) -> int:
+    return sum([len(bson.encode(doc)) async for doc in db[name].find({})])
+
+async def timed(fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+async def measure(db, user, budgets):
+    from app.archive_utils import archived_expenses, archived_total
+    from app.budget_events import recompute_spent, month_range
+    from app.currency import aggregate_total
+
+    async def summary():
+        await aggregate_total(db.expenses, {"user_id": user["id"], "duplicate_of": None}, "INR")
+        await archived_total(db, user["id"], "INR")
+
+    async def budget_recompute():
+        for b in budgets:
+            await recompute_spent(db, b, "INR")
+
+    async def old_month_report():
+        # What the CSV report reads for a month inside the archive horizon
+        start, end = month_range(3, 2024)
+        await db.expenses.find({"user_id": user["id"], "date": {"$gte": start, "$lt": end}}).to_list(length=None)
+        await archived_expenses(db, user["id"], start, end)
+
+    sizes = {name: await collection_bytes(db, name) for name in ("expenses", "expense_archive", "expense_blobs")}
+    return {
+        "summary": await timed(summary),
+        "budgets (12 months)": await timed(budget_recompute),
+        "csv month (archived)": await timed(old_month_report),
+    }, sizes
+
+async def run(args):
+    from benchmarks.memory_motor import install
+    install()
+    from app.database import get_database, ensure_indexes
+    from app.archive_utils import archive_user, archive_cutoff
+    from benchmarks.datagen import make_users, make_expenses, make_budgets
+
+    db = get_database()
+    await ensure_indexes()
+    user = make_users(1, password_hash="x")[0]
+    expenses = make_expenses(user, args.years, args.per_month, end=datetime(2026, 10, 1), receipt_rate=args.receipt_rate)
+    budgets = [b for b in make_budgets(user, 12) if b["category"] == "Food"]
+    await db.expenses.insert_many(expenses)
+    await db.budgets.insert_many([dict(b) for b in budgets])
+
+    before, before_sizes = await measure(db, user, budgets)
+    cutoff = archive_cutoff(now=datetime(2026, 10, 1), days=args.days)
+    started = time.perf_counter()
+    result = await archive_user(db, user["id"], cutoff)
+    archive_s = time.perf_counter() - started
+    after, after_sizes = await measure(db, user, budgets)
+
+    print(f"{len(expenses)} expenses over {args.years}y, {args.receipt_rate:.0%} with receipts; "
+          f"archived {result['archived']} into {result['buckets']} buckets (before {cutoff:%Y-%m}) in {archive_s * 1000:.0f}ms")
+    print("storage (BSON bytes)")
+    for name in before_sizes:
+        print(f"  {name:<16} {before_sizes[name]:>12,} -> {after_sizes[name]:>12,}")
+    hot_before = before_sizes["expenses"]
+    print(f"  {'hot total':<16} {hot_before:>12,} -> {after_sizes['expenses'] + after_sizes['expense_archive']:>12,}  (excluding cold blobs)")
+    print("scan time (best of 3)")
+    for name in before:
+        print(f"  {name:<22} {before[name] * 1000:9.1f}ms -> {after[name] * 1000:9.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-month", type=int, default=60)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--receipt-rate", type=float, default=0.05)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cache tiers and cross-worker invalidation.
+
+Parses a --rows bank statement once, then reads it back the way a worker
+would: from its own LRU, and from the shared Mongo tier as a worker that
+has not seen it yet (local tier cleared). Then fills the per-user vendor
+index namespace for --users users, stamps a batch of them as changed by
+another worker, and measures how long polling takes to drop them.
+
+    python -m benchmarks.bench_cache [--rows N] [--users N]
+"""
+import argparse
+import asyncio
+import base64
+import os
+import time
+from datetime import datetime
+
+def _best(times: list) -> str:
+    return f"{min(times) * 1e3:8.2f} ms"
+
+async def run(args):
+    from benchmarks.memory_motor import install
+    install()
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+    from app import cache_utils
+    from app.database import get_database
+    from app.pdf_utils import _statements, cached_statement, parse_bank_statement_pdf, remember_statement, statement_key
+    from app.search_utils import VendorIndex, _indexes
+    from benchmarks.datagen import make_users, statement_pdf
+
+    db = get_database()
+    pdf_base64 = base64.b64encode(statement_pdf(args.rows, layout="ledger")).decode()
+    key = statement_key(pdf_base64)
+    started = time.perf_counter()
+    rows = parse_bank_statement_pdf(pdf_base64)
+    parse_s = time.perf_counter() - started
+    await remember_statement(key, rows)
+
+    local, shared = [], []
+    for _ in range(5):
+        started = time.perf_counter()
+        await cached_statement(key)
+        local.append(time.perf_counter() - started)
+        _statements.entries.clear()
+        started = time.perf_counter()
+        await cached_statement(key)
+        shared.append(time.perf_counter() - started)
+    print(f"statement, {len(rows)} rows")
+    print(f"  parse                 {parse_s * 1e3:8.2f} ms")
+    print(f"  local LRU hit         {_best(local)}")
+    print(f"  shared tier hit       {_best(shared)}  (another worker's first re-upload)")
+
+    cache_utils.CACHE_POLL_SECONDS = 0.1
+    users = make_users(args.users, password_hash="x")
+    await db.users.insert_many([dict(u) for u in users])
+    await db.users.create_index("data_changed_at", sparse=True)
+    for user in users:
+        _indexes.set_local(user["id"], VendorIndex(["Swiggy", "Uber", "Amazon"]))
+    follower = asyncio.create_task(cache_utils.follow_invalidations(db))
+    await asyncio.sleep(0.2)
+
+    changed = [u["id"] for u in users[:args.users // 10]]
+    await db.users.update_many(
+        {"id": {"$in": changed}},
+        {"$inc": {"data_version": 1}, "$set": {"data_changed_at": datetime.utcnow(), "data_changed_by": "other-worker"}},
+    )
+    started = time.perf_counter()
+    while any(_indexes.peek(u) is not None for u in changed):
+        await asyncio.sleep(0.005)
+    dropped_s = time.perf_counter() - started
+    follower.cancel()
+    kept = sum(_indexes.peek(u["id"]) is not None for u in users)
+    print(f"vendor index, {args.users:,} users cached, {len(changed):,} changed by another worker")
+    print(f"  dropped everywhere in {dropped_s * 1e3:.0f} ms (poll every {cache_utils.CACHE_POLL_SECONDS * 1e3:.0f} ms); {kept:,} untouched entries kept")
+    print(f"  metrics: {cache_utils.cache_metrics()['namespaces']['vendor_index']}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--users", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
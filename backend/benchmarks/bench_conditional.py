@@ -0,0 +1,92 @@
+"""
+Bytes on the wire and server CPU for repeated dashboard loads.
+
+One dashboard load is the GETs the mobile app makes on refresh:
+/expenses/, /expenses/summary, /budgets/, /expenses/recurring,
+/receipts/ and /auth/me, for a user with --years of history. Each load is
+repeated --loads times in four ways: without compression, with gzip, with
+brotli, and revalidating with If-None-Match against the ETags of the first
+load (nothing changed in between, as on most refreshes). CPU is the
+process time of the whole in-process round trip, app and client.
+
+    python -m benchmarks.bench_conditional [--years Y] [--per-month N] [--loads N]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+DASHBOARD = [
+    "/api/expenses/",
+    "/api/expenses/summary",
+    "/api/budgets/",
+    "/api/expenses/recurring",
+    "/api/receipts/",
+    "/api/auth/me",
+]
+
+async def load(client, headers: dict, etags: dict = None):
+    """One dashboard load; returns (body bytes received, statuses, ETags seen)."""
+    wire, statuses, seen = 0, [], {}
+    for path in DASHBOARD:
+        h = dict(headers)
+        if etags is not None:
+            h["If-None-Match"] = etags[path]
+        response = await client.get(path, headers=h)
+        await response.aread()
+        wire += response.num_bytes_downloaded
+        statuses.append(response.status_code)
+        seen[path] = response.headers.get("etag", "")
+    return wire, statuses, seen
+
+async def run(args):
+    from benchmarks.memory_motor import install
+    install()
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+    import httpx
+    import main
+    from app.database import get_database
+    from app.http_utils import brotli
+    from benchmarks.datagen import Dataset
+    from benchmarks.load import Context
+
+    data = Dataset(users=1, years=args.years, per_month=args.per_month)
+    async with main.app.router.lifespan_context(main.app):
+        await data.load_into(get_database())
+        ctx = Context(data, seed=0)
+        auth = ctx.auth(ctx.users[0])
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # Warm up: lazy budget sync, recurring analysis, imports
+            await load(client, {**auth, "Accept-Encoding": "identity"})
+            await asyncio.sleep(0.1)
+
+            modes = [("identity", {"Accept-Encoding": "identity"}, False), ("gzip", {"Accept-Encoding": "gzip"}, False)]
+            if brotli is not None:
+                modes.append(("br", {"Accept-Encoding": "br"}, False))
+            modes.append(("304 (br)" if brotli is not None else "304 (gzip)", {"Accept-Encoding": "br, gzip"}, True))
+
+            print(f"{data.expense_count} expenses; {args.loads} dashboard loads of {len(DASHBOARD)} GETs each")
+            print(f"  {'mode':<12} {'body B/load':>12} {'cpu ms/load':>12} {'wall ms/load':>13}  statuses")
+            baseline = None
+            for name, headers, revalidate in modes:
+                _, _, seen = await load(client, {**auth, **headers})
+                etags = seen if revalidate else None
+                cpu, wall = time.process_time(), time.perf_counter()
+                for _ in range(args.loads):
+                    wire, statuses, _ = await load(client, {**auth, **headers}, etags)
+                cpu = (time.process_time() - cpu) / args.loads
+                wall = (time.perf_counter() - wall) / args.loads
+                baseline = baseline or wire
+                print(f"  {name:<12} {wire:>12,} {cpu * 1000:>12.1f} {wall * 1000:>13.1f}  "
+                      f"{sorted(set(statuses))}  ({wire / baseline:.1%} of identity)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--per-month", type=int, default=40)
+    parser.add_argument("--loads", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
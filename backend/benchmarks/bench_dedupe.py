@@ -0,0 +1,62 @@
+"""
+Duplicate detection over a full history, and the insert-time check.
+
+Times find_duplicates (the /expenses/dedupe/backfill scan) over --years of
+synthetic history, then best_match for new expenses against their stored
+candidates the way POST /expenses/ does. New expenses are built through
+ExpenseCreate from "...Z" dates, as the app's AddExpense screen sends them
+(Date.toISOString()), while stored candidates carry naive dates as Mongo
+returns them; the two must compare without error.
+
+    python -m benchmarks.bench_dedupe [--years N] [--per-month N]
+"""
+import argparse
+import random
+import time
+from datetime import timedelta, timezone
+from app.dedupe_utils import AMOUNT_TOLERANCE, DATE_WINDOW_DAYS, best_match, find_duplicates
+from app.models import ExpenseCreate
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-month", type=int, default=300)
+    args = parser.parse_args()
+
+    from benchmarks.datagen import make_expenses
+    expenses = sorted(make_expenses({"id": "bench"}, args.years, args.per_month), key=lambda e: e["date"])
+
+    started = time.perf_counter()
+    flagged = sum(1 for _ in find_duplicates(expenses))
+    scan_s = time.perf_counter() - started
+
+    # A second copy of some stored expenses, arriving from another source with a UTC "Z" date
+    rng = random.Random("dedupe")
+    probes = rng.sample(expenses, min(2_000, len(expenses)))
+    matched, started = 0, time.perf_counter()
+    for stored in probes:
+        source = "receipt" if stored.get("source") != "receipt" else "sms"
+        new = ExpenseCreate(
+            amount=stored["amount"], category=stored["category"], vendor=stored.get("vendor"), source=source,
+            date=(stored["date"] + timedelta(hours=2)).isoformat(timespec="milliseconds") + "Z",
+        ).model_dump()
+        assert new["date"].tzinfo is None, "ExpenseCreate kept a tz-aware date"
+        window = timedelta(days=DATE_WINDOW_DAYS)
+        candidates = [
+            e for e in expenses
+            if abs(e["amount"] - new["amount"]) <= AMOUNT_TOLERANCE and abs(e["date"] - new["date"]) <= window
+        ]
+        original, _ = best_match(new, candidates)
+        matched += original is not None
+    match_s = time.perf_counter() - started
+    # Dicts that bypass the model (parsers, imports) may still carry an offset
+    aware = dict(new, date=new["date"].replace(tzinfo=timezone.utc))
+    assert best_match(aware, candidates)[0] is original, "tz-aware date scored differently"
+
+    print(f"{len(expenses):,} expenses over {args.years} years")
+    print(f"  backfill scan       {scan_s * 1e3:8.1f} ms  ({flagged:,} flagged)")
+    print(f"  insert-time check   {match_s / len(probes) * 1e6:8.1f} us/expense incl. candidate filter "
+          f"({matched:,} of {len(probes):,} cross-source copies matched)")
+
+if __name__ == "__main__":
+    main()
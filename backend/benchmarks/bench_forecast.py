@@ -0,0 +1,98 @@
+"""
+Full-batch forecast runtime.
+
+Builds the per-day history rows the batch job reads from Mongo (one row per
+user, category, currency and day, as the $group in app.forecast_utils
+returns them) for --users users over the forecast window, plus recurring
+docs, and times build_forecasts in chunks of BATCH_USERS: the whole
+fitting and document assembly of `python -m app.forecast_utils` except the
+database round trips. Then runs refresh_forecasts end to end on in-memory
+Mongo for --e2e-users users to show what the reads and writes add per user.
+
+    python -m benchmarks.bench_forecast [--users N] [--e2e-users N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+def history(users: list, now: datetime, days: int, seed: int = 0):
+    from benchmarks.datagen import VENDORS
+    rng = random.Random(f"{seed}:forecast")
+    categories = list(VENDORS)
+    rows, recurring = [], []
+    for user in users:
+        # 3-6 categories per user, each with its own activity level and weekend bias
+        for category in rng.sample(categories, rng.randint(3, 6)):
+            per_day = rng.uniform(0.1, 0.9)
+            weekend = rng.uniform(0.5, 2.5)
+            _, lo, hi = rng.choice(VENDORS[category])
+            for d in range(days, -1, -1):
+                day = now - timedelta(days=d)
+                chance = per_day * (weekend if day.weekday() >= 5 else 1)
+                if rng.random() < chance:
+                    rows.append((user["id"], category, user.get("currency", "INR"), day.strftime("%Y-%m-%d"), round(rng.uniform(lo, hi), 2)))
+        if rng.random() < 0.6:
+            recurring.append({
+                "user_id": user["id"], "category": "Bills", "expected_amount": 499.0, "interval_days": 30.4,
+                "next_expected_date": now + timedelta(days=rng.randint(-3, 30)),
+            })
+    return rows, recurring
+
+async def end_to_end(n_users: int, now: datetime):
+    from benchmarks.memory_motor import install
+    install()
+    from app.database import get_database
+    from app.forecast_utils import HISTORY_DAYS, refresh_forecasts
+    from benchmarks.datagen import make_users, make_expenses
+
+    db = get_database()
+    users = make_users(n_users, password_hash="x")
+    await db.users.insert_many([dict(u) for u in users])
+    expenses = []
+    for user in users:
+        expenses += [e for e in make_expenses(user, 1, 30, end=now) if e["date"] >= now - timedelta(days=HISTORY_DAYS)]
+    await db.expenses.insert_many(expenses)
+    started = time.perf_counter()
+    written = await refresh_forecasts(db, [{"id": u["id"], "currency": u.get("currency")} for u in users], now)
+    return written, len(expenses), time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--e2e-users", type=int, default=200)
+    args = parser.parse_args()
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+
+    from app.forecast_utils import BATCH_USERS, HISTORY_DAYS, build_forecasts
+    from benchmarks.datagen import make_users
+
+    now = datetime(2026, 10, 19, 2, 0)
+    users = [{"id": u["id"], "currency": u.get("currency")} for u in make_users(args.users, password_hash="x")]
+    started = time.perf_counter()
+    rows, recurring = history(users, now, HISTORY_DAYS)
+    print(f"{args.users:,} users, {len(rows):,} day rows over {HISTORY_DAYS} days, {len(recurring):,} recurring "
+          f"(generated in {time.perf_counter() - started:.1f}s)")
+
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row[0], []).append(row)
+    started = time.perf_counter()
+    docs = 0
+    for i in range(0, len(users), BATCH_USERS):
+        chunk = users[i:i + BATCH_USERS]
+        ids = {u["id"] for u in chunk}
+        docs += len(build_forecasts(
+            chunk, [r for u in chunk for r in by_user.get(u["id"], ())], [r for r in recurring if r["user_id"] in ids], now
+        ))
+    batch = time.perf_counter() - started
+    print(f"  build_forecasts  {batch:6.2f}s for {docs:,} forecasts  ({batch / args.users * 1e6:,.0f} us/user, chunks of {BATCH_USERS})")
+
+    written, n_expenses, seconds = asyncio.run(end_to_end(args.e2e_users, now))
+    print(f"  end to end on in-memory Mongo: {args.e2e_users} users, {n_expenses:,} expenses: {seconds:.2f}s "
+          f"({seconds / written * 1e3:.1f} ms/user, mostly mongomock's aggregation)")
+
+if __name__ == "__main__":
+    main()
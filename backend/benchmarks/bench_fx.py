@@ -0,0 +1,62 @@
+"""
+Currency conversion overhead when summing 100k mixed-currency expenses.
+Also checks that a currency without FX rates is refused on input, and that
+a total asked for in one (stored before that check) comes out in INR rather
+than as an unconverted mix.
+
+    python -m benchmarks.bench_fx [n_expenses]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from app.currency import get_fx_table, total_in
+
+CURRENCIES = ["INR"] * 6 + ["USD", "EUR", "GBP", "AED", "SGD", "JPY"]
+
+def synthetic_expenses(n: int, seed: int = 11):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "amount": round(rng.uniform(10, 5000), 2),
+            "currency": rng.choice(CURRENCIES),
+            "date": start + timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+        }
+        for _ in range(n)
+    ]
+
+def timed(fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    expenses = synthetic_expenses(n)
+    fx = get_fx_table()
+
+    raw_ms, raw_total = timed(lambda: sum(e["amount"] for e in expenses))
+    vec_ms, vec_total = timed(lambda: total_in(expenses, "INR"))
+    loop_ms, loop_total = timed(lambda: sum(fx.convert_one(e["amount"], e["currency"], e["date"], "INR") for e in expenses), repeat=1)
+
+    print(f"expenses={n}")
+    print(f"  raw sum (no conversion)      {raw_ms:8.1f}ms  total={raw_total:,.0f}")
+    print(f"  vectorized total_in          {vec_ms:8.1f}ms  total={vec_total:,.0f}  overhead={vec_ms - raw_ms:.1f}ms")
+    print(f"  per-row convert_one loop     {loop_ms:8.1f}ms  total={loop_total:,.0f}")
+
+    from pydantic import ValidationError
+    from app.models import ExpenseCreate, UserUpdate
+    for model, fields in ((UserUpdate, {}), (ExpenseCreate, {"amount": 1, "date": datetime(2026, 1, 1), "category": "Other"})):
+        try:
+            model(currency="CHF", **fields)
+        except ValidationError:
+            continue
+        raise AssertionError(f"{model.__name__} accepted a currency without FX rates")
+    assert abs(total_in(expenses, "CHF") - vec_total) < 1e-6 * vec_total, "unsupported target left amounts unconverted"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Group ledger at scale.
+
+Creates one group with --members members through the API, posts
+--expenses shared expenses (a mix of equal splits over random subsets,
+exact and weighted splits), edits and deletes a slice of them, then times
+GET /groups/{id} and the settlement, which read only the stored balances.
+Checks the incrementally kept balances against a rebuild from every stored
+expense, that the settlement clears them, and how many transfers greedy
+needs against the n - 1 bound. Finally times settle() alone on larger
+random ledgers.
+
+    python -m benchmarks.bench_groups [--members N] [--expenses N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+def _expense(rng, member_ids: list) -> dict:
+    amount = round(rng.uniform(50, 20_000), 2)
+    body = {"amount": amount, "description": "bench", "date": "2026-10-01T12:00:00", "paid_by": rng.choice(member_ids)}
+    kind = rng.random()
+    if kind < 0.6:
+        body["participants"] = rng.sample(member_ids, rng.randint(2, min(30, len(member_ids))))
+    elif kind < 0.8:
+        # Exact split over a few members; the cents are worked out like a client would
+        picked = rng.sample(member_ids, rng.randint(2, 6))
+        cents = round(amount * 100)
+        cuts = sorted(rng.sample(range(1, cents), len(picked) - 1))
+        parts = [b - a for a, b in zip([0] + cuts, cuts + [cents])]
+        body.update(split_type="exact", split={m: p / 100 for m, p in zip(picked, parts)})
+    else:
+        picked = rng.sample(member_ids, rng.randint(2, 10))
+        body.update(split_type="shares", split={m: rng.randint(1, 4) for m in picked})
+    return body
+
+def _ms(samples: list) -> str:
+    samples = sorted(samples)
+    return f"median {statistics.median(samples) * 1e3:6.2f} ms  p95 {samples[int(len(samples) * 0.95)] * 1e3:6.2f} ms"
+
+async def run(args):
+    from benchmarks.memory_motor import install
+    install()
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+    import httpx
+    import main
+    from app.auth.utils import create_access_token
+    from app.database import get_database
+    from app.ledger_utils import rebuild_balances, settle, to_minor
+    from benchmarks.datagen import make_users
+
+    rng = random.Random("groups")
+    db = get_database()
+    owner = make_users(1, password_hash="x")[0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': owner['email']})}"}
+
+    async with main.app.router.lifespan_context(main.app):
+        await db.users.insert_one(dict(owner))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            members = [{"name": f"Member {i}"} for i in range(args.members - 1)]
+            group = (await client.post("/api/groups/", json={"name": "Bench", "members": members}, headers=headers)).json()
+            gid = group["id"]
+            member_ids = [m["id"] for m in group["members"]]
+
+            posted, add = [], []
+            for _ in range(args.expenses):
+                started = time.perf_counter()
+                response = await client.post(f"/api/groups/{gid}/expenses", json=_expense(rng, member_ids), headers=headers)
+                add.append(time.perf_counter() - started)
+                posted.append(response.json()["id"])
+
+            edit = []
+            for eid in rng.sample(posted, args.expenses // 20):
+                started = time.perf_counter()
+                await client.put(f"/api/groups/{gid}/expenses/{eid}", json=_expense(rng, member_ids), headers=headers)
+                edit.append(time.perf_counter() - started)
+            for eid in rng.sample(posted, args.expenses // 50):
+                await client.delete(f"/api/groups/{gid}/expenses/{eid}", headers=headers)
+
+            read, settlement = [], []
+            for _ in range(20):
+                started = time.perf_counter()
+                balances = (await client.get(f"/api/groups/{gid}", headers=headers)).json()["balances"]
+                read.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                transfers = (await client.get(f"/api/groups/{gid}/settlement", headers=headers)).json()
+                settlement.append(time.perf_counter() - started)
+
+        stored = await db.group_expenses.find({"group_id": gid}, {"_id": 0}).to_list(length=None)
+        started = time.perf_counter()
+        rebuilt = rebuild_balances(stored)
+        rebuild_s = time.perf_counter() - started
+
+    incremental = {m: to_minor(v) for m, v in balances.items()}
+    assert incremental == {m: v for m, v in rebuilt.items() if v}, "incremental balances drifted from a rebuild"
+    left = dict(incremental)
+    for t in transfers:
+        left[t["from_member"]] += to_minor(t["amount"])
+        left[t["to_member"]] -= to_minor(t["amount"])
+    assert not any(left.values()), "settlement does not clear the balances"
+
+    print(f"{args.members} members, {len(stored):,} stored expenses ({len(edit)} edited, {args.expenses // 50} deleted)")
+    print(f"  POST expense     {_ms(add)}")
+    print(f"  PUT expense      {_ms(edit)}")
+    print(f"  GET group        {_ms(read)}")
+    print(f"  GET settlement   {_ms(settlement)}  ->  {len(transfers)} transfers for {len(incremental)} open balances (bound {len(incremental) - 1})")
+    print(f"  rebuild from all expenses {rebuild_s * 1e3:.1f} ms; incremental balances match exactly")
+
+    for n in (1_000, 10_000, 100_000):
+        balances = {str(i): rng.randint(-500_000, 500_000) for i in range(n - 1)}
+        balances[str(n - 1)] = -sum(balances.values())
+        started = time.perf_counter()
+        transfers = settle(balances)
+        print(f"  settle() alone, {n:>7,} members: {(time.perf_counter() - started) * 1e3:8.1f} ms, {len(transfers):,} transfers")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=300)
+    parser.add_argument("--expenses", type=int, default=5_000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Caller-side logging cost per request: the old open-and-append log_debug,
+a synchronous JSON file handler, and the queue-based handler from
+app.logging_utils (file sink drained by the listener thread).
+
+Each simulated request emits one INFO access line and four DEBUG lines,
+like the receipt OCR path. Requests are paced at --rate per second so the
+listener thread drains between them as it would under real traffic; only
+the time spent inside the logging calls is counted.
+
+    python -m benchmarks.bench_logging [--requests N] [--rate R]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from app import logging_utils
+
+def _paced(n, rate, emit_one):
+    """Calls emit_one(i) n times at `rate` per second; returns total time spent inside emit_one."""
+    interval = 1.0 / rate if rate else 0.0
+    spent = 0.0
+    next_slot = time.perf_counter()
+    for i in range(n):
+        started = time.perf_counter()
+        emit_one(i)
+        spent += time.perf_counter() - started
+        next_slot += interval
+        delay = next_slot - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return spent
+
+def legacy(path, n, rate):
+    def log_debug(msg):
+        with open(path, "a") as f:
+            f.write(f"{msg}\n")
+
+    def emit_one(i):
+        for step in range(4):
+            log_debug(f"step {step} of request {i}")
+        log_debug(f"REQUEST: POST /api/expenses/parse-receipt - STATUS: 200 - TIME: 12.00ms")
+    return _paced(n, rate, emit_one)
+
+def sync_handler(path, n, rate):
+    logger = logging.getLogger("bench.sync")
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging_utils.JsonFormatter())
+    handler.addFilter(logging_utils.ContextFilter())
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    elapsed = _paced(n, rate, lambda i: _emit_request(logger, i))
+    handler.close()
+    return elapsed
+
+def queued(path, n, rate, sample_rate):
+    logging_utils.shutdown_logging()
+    logging_utils.setup_logging(level="DEBUG", sinks=f"file:{path}", sample_rate=sample_rate)
+    logger = logging.getLogger("app.bench")
+    elapsed = _paced(n, rate, lambda i: _emit_request(logger, i))
+    logging_utils.shutdown_logging()
+    return elapsed
+
+def _emit_request(logger, i):
+    token = logging_utils.request_id_var.set(f"req-{i}")
+    for step in range(4):
+        logger.debug("ocr step", extra={"step": step})
+    logger.info("request", extra={"method": "POST", "path": "/api/expenses/parse-receipt", "status": 200, "duration_ms": 12.0})
+    logging_utils.request_id_var.reset(token)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=500, help="requests per second; 0 = unpaced burst")
+    args = parser.parse_args()
+    n, rate = args.requests, args.rate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            ("open+append per line (old log_debug)", legacy(os.path.join(tmp, "legacy.log"), n, rate)),
+            ("sync JSON FileHandler", sync_handler(os.path.join(tmp, "sync.log"), n, rate)),
+            ("queue handler, debug sampled 100%", queued(os.path.join(tmp, "q1.log"), n, rate, 1.0)),
+            ("queue handler, debug sampled 10%", queued(os.path.join(tmp, "q2.log"), n, rate, 0.1)),
+        ]
+    print(f"requests={n} at {rate:g}/s (5 log lines each)")
+    for label, elapsed in results:
+        print(f"  {label:<38} {elapsed / n * 1e6:8.1f}us/request on the caller")
+    print(f"  dropped records: {logging_utils.DroppingQueueHandler.dropped}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Recurring-expense detection on a synthetic 100k-expense history.
+
+    python -m benchmarks.bench_recurring [n_expenses]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from app.recurring_utils import detect_recurring
+
+SUBSCRIPTIONS = [("Netflix", 649, 30), ("Jio Recharge", 299, 28), ("House Rent", 25000, 30), ("Spotify", 119, 30), ("Gym", 1500, 30), ("Insurance", 12000, 365)]
+
+def synthetic_history(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    expenses = []
+    for vendor, amount, every in SUBSCRIPTIONS:
+        day = start
+        while day < start + timedelta(days=3 * 365):
+            expenses.append({"vendor": vendor, "amount": amount, "date": day + timedelta(hours=rng.randint(0, 20)), "category": "Bills"})
+            day += timedelta(days=every)
+    vendors = [f"Merchant {i}" for i in range(5000)]
+    while len(expenses) < n:
+        expenses.append({
+            "vendor": rng.choice(vendors),
+            "amount": round(rng.uniform(20, 5000), 2),
+            "date": start + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60)),
+            "category": "Shopping",
+        })
+    return expenses
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    expenses = synthetic_history(n)
+    started = time.perf_counter()
+    results = detect_recurring(expenses, "bench-user")
+    elapsed = time.perf_counter() - started
+    print(f"expenses={len(expenses)} recurring={len(results)} time={elapsed * 1000:.1f}ms")
+    for r in results[:10]:
+        print(f"  {r['vendor']:<15} {r['period']:<9} every {r['interval_days']:>6.1f}d  next {r['next_expected_date']:%Y-%m-%d}  ~{r['expected_amount']:,.0f}")
+
+if __name__ == "__main__":
+    main()
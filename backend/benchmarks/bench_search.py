@@ -0,0 +1,71 @@
+"""
+Fuzzy vendor matching cost behind GET /expenses/search.
+
+Builds app.search_utils.VendorIndex over the distinct vendors of a
+100k-expense account (the generator's vendors plus OCR-style and branch
+variants of them), then times `match` for clean, misspelt and OCR-mangled
+queries, and a brute-force difflib scan over the same vendors for
+comparison. The $text half of the route runs inside mongod and is not
+measured here.
+
+    python -m benchmarks.bench_search [--expenses N] [--vendors V]
+"""
+import argparse
+import difflib
+import random
+import time
+from app.search_utils import MAX_CANDIDATES, VendorIndex, normalize
+from benchmarks.datagen import VENDORS, SUBSCRIPTIONS
+
+QUERIES = ["UNIQL0", "uniqlo", "starbuks", "5TARBUCKS", "amazn", "swigy", "BIG BAZAAR", "d-mart", "zomat0", "qwertyuiop"]
+
+def vendor_names(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    base = [v[0] for group in VENDORS.values() for v in group] + [s[0] for s in SUBSCRIPTIONS] + ["UNIQLO", "Big Bazaar", "DMart"]
+    names = set(base)
+    ocr = str.maketrans({"o": "0", "l": "1", "s": "5", "O": "0", "S": "5"})
+    while len(names) < n:
+        vendor = rng.choice(base)
+        roll = rng.random()
+        if roll < 0.3:
+            names.add(vendor.translate(ocr))
+        elif roll < 0.6:
+            names.add(f"{vendor} {rng.choice(['Store', 'Outlet', 'Pvt Ltd', 'India'])} #{rng.randint(1, 999)}")
+        else:
+            names.add(f"{vendor.upper()} {rng.choice(['MG Road', 'Koramangala', 'Andheri', 'Salt Lake'])} {rng.randint(1, 99)}")
+    return sorted(names)
+
+def timed(fn, repeat: int = 50):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--vendors", type=int, default=3000)
+    args = parser.parse_args()
+
+    vendors = vendor_names(args.vendors)
+    # The route fetches matching vendors' expenses with $in on (user_id, vendor); this is
+    # how many rows that pulls (capped at MAX_CANDIDATES) when expenses spread evenly over vendors
+    per_vendor = args.expenses / len(vendors)
+
+    build = timed(lambda: VendorIndex(vendors), repeat=5)
+    index = VendorIndex(vendors)
+    normalized = [normalize(v) for v in vendors]
+
+    print(f"{len(vendors)} distinct vendors (~{args.expenses:,} expenses); index build {build * 1000:.1f}ms")
+    print(f"  {'query':<14} {'trigram':>9} {'difflib':>9}  hits  best match")
+    for q in QUERIES:
+        hits = index.match(q)
+        fast = timed(lambda: index.match(q))
+        slow = timed(lambda: difflib.get_close_matches(normalize(q), normalized, n=20, cutoff=0.6), repeat=3)
+        best = f"{hits[0][0]} ({hits[0][1]:.2f})" if hits else "-"
+        print(f"  {q:<14} {fast * 1000:8.2f}ms {slow * 1000:8.1f}ms  {len(hits):>4}  {best}  (~{min(len(hits) * per_vendor, MAX_CANDIDATES):,.0f} rows)")
+
+if __name__ == "__main__":
+    main()
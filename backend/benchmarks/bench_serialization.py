@@ -0,0 +1,103 @@
+"""
+Response serialization cost for GET /expenses/ with 1000 expenses.
+
+Compares, per 1000 documents:
+  - the response_model path FastAPI takes for a returned list of dicts
+    (validate into List[Expense], then dump to JSON bytes),
+  - jsonable_encoder + stdlib json (what JSONResponse does without a model),
+  - trusted_list + ORJSONResponse from app.json_utils on documents fetched
+    with projection(Expense), as the route now does,
+and the same three as whole routes on a bare FastAPI app over ASGI, so the
+framework's own overhead is included.
+
+    python -m benchmarks.bench_serialization [n_expenses]
+"""
+import asyncio
+import json
+import sys
+import time
+from typing import List
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.json_utils import ORJSONResponse, projection, trusted_list
+from app.models import Expense
+from benchmarks.datagen import make_expenses, make_users
+
+def documents(n: int):
+    user = make_users(1, password_hash="x")[0]
+    expenses = make_expenses(user, years=max(1, n // 400 + 1), per_month=40, receipt_rate=0)[:n]
+    # As Motor returns them: with an ObjectId and the write-side bookkeeping fields
+    for e in expenses:
+        e["_id"] = ObjectId()
+        e["updated_at"] = e["created_at"]
+    return expenses
+
+def projected(docs):
+    fields = projection(Expense)
+    return [{k: v for k, v in d.items() if fields.get(k)} for d in docs]
+
+def timed(fn, repeat: int = 20):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def build_app(docs):
+    app = FastAPI()
+    fetched = projected(docs)
+
+    @app.get("/validated", response_model=List[Expense])
+    async def validated():
+        return [dict(d) for d in docs]
+
+    @app.get("/encoded")
+    async def encoded():
+        return [{k: v for k, v in d.items() if k != "_id"} for d in docs]
+
+    @app.get("/trusted", response_model=List[Expense])
+    async def trusted():
+        return ORJSONResponse(trusted_list(fetched, Expense))
+
+    return app
+
+async def route_timings(app, repeat: int = 20):
+    import httpx
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path in ("/validated", "/encoded", "/trusted"):
+            await client.get(path)
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = await client.get(path)
+                best = min(best, time.perf_counter() - started)
+            results[path] = (best, len(response.content))
+    return results
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    docs = documents(n)
+    adapter = TypeAdapter(List[Expense])
+    no_id = [{k: v for k, v in d.items() if k != "_id"} for d in docs]
+    fetched = projected(docs)
+
+    validated = timed(lambda: adapter.dump_json(adapter.validate_python(no_id)))
+    encoded = timed(lambda: json.dumps(jsonable_encoder(no_id)).encode())
+    fast = timed(lambda: ORJSONResponse(trusted_list(fetched, Expense)).body)
+
+    per_1000 = 1000 / len(docs)
+    print(f"{len(docs)} expenses, best of 20 (ms per 1000 expenses)")
+    print(f"  response_model validate + dump_json   {validated * 1000 * per_1000:8.2f}")
+    print(f"  jsonable_encoder + json.dumps         {encoded * 1000 * per_1000:8.2f}")
+    print(f"  trusted_list + orjson                 {fast * 1000 * per_1000:8.2f}")
+
+    print("whole route over ASGI (ms per request, response bytes)")
+    for path, (best, size) in asyncio.run(route_timings(build_app(docs))).items():
+        print(f"  GET {path:<12} {best * 1000:8.2f}ms  {size:>9,}B")
+
+if __name__ == "__main__":
+    main()
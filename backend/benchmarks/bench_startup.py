@@ -0,0 +1,61 @@
+"""
+Worker cold-start audit: import time of `main` (via -X importtime) and RSS
+after import, with the heavy libraries lazy (default) and preloaded.
+
+    python -m benchmarks.bench_startup [--runs N] [--top N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import resource, time
+t = time.perf_counter()
+import main
+{preload}
+elapsed = time.perf_counter() - t
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def run_probe(preload: bool):
+    code = PROBE.format(preload="from app.loaders import preload; preload(['reportlab', 'pdfplumber', 'pil', 'pytesseract'])" if preload else "")
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+    elapsed, rss_kb = out.split()
+    return float(elapsed), int(rss_kb)
+
+def importtime_report(top: int):
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative_us), int(self_us), name))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for label, preload in (("lazy (default)", False), ("preloaded", True)):
+        samples = [run_probe(preload) for _ in range(args.runs)]
+        times = [s[0] * 1000 for s in samples]
+        rss = [s[1] / 1024 for s in samples]
+        print(f"{label:<15} import main: median {statistics.median(times):7.1f}ms   max RSS: median {statistics.median(rss):6.1f}MB")
+
+    print(f"\nTop {args.top} imports by cumulative time (-X importtime, lazy):")
+    for cumulative_us, self_us, name in importtime_report(args.top):
+        print(f"  {cumulative_us / 1000:8.1f}ms  {self_us / 1000:7.1f}ms self  {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Statement parsing throughput and yield, layout parser against the text scan.
+
+For each statement layout from benchmarks.datagen (a UPI-app export and a
+bank ledger with debit/credit columns), parses a --rows statement with the
+text scan the parser used before (extract_text and a regex over the page,
+now its fallback for statements without a header) and with the layout
+parser, reporting pages/sec and how many of the debits each one found.
+Then times a re-upload of the same PDF, which is answered from the cache
+(this worker's LRU; benchmarks.bench_cache covers the shared tier).
+Last, a statement whose first page lists recent debits as plain text ahead
+of the table must yield those debits as well as the table's.
+
+    python -m benchmarks.bench_statement [--rows N] [--repeat N]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import time
+
+def text_scan(pdf_bytes: bytes) -> list:
+    from app.loaders import pdfplumber
+    from app.pdf_utils import _parse_text_page
+    expenses, last_date = [], [None]
+    with pdfplumber().open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text()
+            if text:
+                _parse_text_page(text, expenses, last_date)
+    return expenses
+
+def best_of(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from benchmarks.memory_motor import install
+    install()
+    from app.loaders import pdfplumber
+    from app import pdf_utils
+    from benchmarks.datagen import statement_pdf
+
+    print(f"{args.rows} debits per statement, best of {args.repeat}")
+    print(f"  {'layout':<8} {'parser':<8} {'pages':>5} {'pages/s':>8} {'found':>11}")
+    for layout in ("upi", "ledger"):
+        pdf_bytes = statement_pdf(args.rows, layout=layout)
+        with pdfplumber().open(io.BytesIO(pdf_bytes)) as pdf:
+            pages = len(pdf.pages)
+        parsers = [("text", lambda: text_scan(pdf_bytes)), ("layout", lambda: pdf_utils._parse(pdf_bytes))]
+        for name, fn in parsers:
+            seconds, rows = best_of(fn, args.repeat)
+            print(f"  {layout:<8} {name:<8} {pages:>5} {pages / seconds:>8.1f} {len(rows):>5}/{args.rows}")
+
+        pdf_base64 = base64.b64encode(pdf_bytes).decode()
+        key = pdf_utils.statement_key(pdf_base64)
+        asyncio.run(pdf_utils.remember_statement(key, pdf_utils.parse_bank_statement_pdf(pdf_base64)))
+        seconds, _ = best_of(lambda: asyncio.run(pdf_utils.cached_statement(pdf_utils.statement_key(pdf_base64))), args.repeat)
+        print(f"  {layout:<8} {'cached':<8} {pages:>5} {pages / seconds:>8.0f}  re-upload {seconds * 1000:.2f}ms")
+
+    summary = min(10, args.rows)
+    found = pdf_utils._parse(statement_pdf(args.rows, layout="upi", summary=summary))
+    print(f"  {'summary':<8} {'layout':<8} {'':>5} {'':>8} {len(found):>5}/{args.rows}")
+    assert len(found) == args.rows, f"{args.rows - len(found)} debits lost before the header"
+
+if __name__ == "__main__":
+    main()
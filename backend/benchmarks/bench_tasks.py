@@ -0,0 +1,100 @@
+"""
+Batched background side effects against per-item writes.
+
+Queues --items OCR learning captures and budget updates (spread over
+--users users) and times how long the task queue takes to drain them,
+against doing the same writes one awaited call per item the way
+create_expense used to on the request path. Then checks that a batch
+failing and waiting for its retry does not hold up other kinds' items.
+
+    python -m benchmarks.bench_tasks [--items N] [--users N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+
+class _Saved:
+    """The fields of ExpenseCreate that capture_corrections reads."""
+    def __init__(self, rng):
+        self.vendor = rng.choice(["Cafe Coffee Day", "Big Bazaar", "Dominos"])
+        self.amount = round(rng.uniform(50, 2000), 2)
+        self.gst_details = {"cgst": 4.5, "sgst": 4.5, "igst": 0, "total_gst": 9.0}
+        self.original_ocr_data = {"amount": self.amount + 1, "raw_text": "TOTAL", "gst_details": {"cgst": 4.5, "sgst": 4.5, "igst": 0, "total_gst": 9.5}}
+
+async def run(args):
+    from benchmarks.memory_motor import install
+    install()
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+    from app import task_utils
+    from app.budget_events import apply_rollups, on_expense_change
+    from app.database import get_database
+    from app.ocr_utils import capture_corrections, ocr_corrections
+    from benchmarks.datagen import make_users
+
+    db = get_database()
+    rng = random.Random("tasks")
+    users = make_users(args.users, password_hash="x")
+    await db.users.insert_many([dict(u) for u in users])
+    await db.budgets.insert_many([
+        {"id": f"{u['id']}:{c}", "user_id": u["id"], "category": c, "month": 10, "year": 2026,
+         "monthly_limit": 50_000.0, "current_spent": 0.0, "spent_synced": True}
+        for u in users for c in ("Food", "Shopping")
+    ])
+    saves = [(rng.choice(users)["id"], _Saved(rng), rng.choice(("Food", "Shopping"))) for _ in range(args.items)]
+
+    # Before: each save awaited its own learning insert and budget update
+    started = time.perf_counter()
+    for user_id, saved, category in saves:
+        discrepancies = ocr_corrections(saved.original_ocr_data, saved.amount, saved.gst_details)
+        await db.ocr_learning_before.insert_one({"user_id": user_id, "vendor": saved.vendor.upper(), "discrepancies": discrepancies})
+        await apply_rollups(db, [{"user_id": user_id, "currency": "INR", "deltas": {(category, 10, 2026): saved.amount}, "queued_at": datetime.utcnow()}])
+    inline = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for user_id, saved, category in saves:
+        capture_corrections(user_id, saved)
+        on_expense_change(user_id, new={"amount": saved.amount, "category": category, "date": datetime(2026, 10, 2)}, currency="INR")
+    enqueue_s = time.perf_counter() - started
+    await task_utils.drain()
+    queued = time.perf_counter() - started
+
+    stored = await db.ocr_learning.count_documents({})
+    metrics = task_utils.task_metrics()["kinds"]
+    print(f"{args.items:,} saves over {args.users} users (in-memory Mongo)")
+    print(f"  awaited per save   {inline:6.2f}s  ({inline / args.items * 1e3:.2f} ms/save on the request path)")
+    print(f"  queued + drained   {queued:6.2f}s  (enqueue {enqueue_s / args.items * 1e6:.1f} us/save on the request path; "
+          f"{metrics['ocr_learning']['batches']} learning batches, {metrics['budget_rollup']['batches']} rollup batches)")
+    print(f"  learning entries stored: {stored:,}")
+
+    # A failing kind backs off on its own; a read of another kind settles meanwhile
+    failures = []
+
+    @task_utils.handler("bench_flaky")
+    async def flaky(db, payloads):
+        if len(failures) < 2:
+            failures.append(time.perf_counter())
+            raise RuntimeError("bench failure")
+
+    task_utils.enqueue("bench_flaky", None, key="flaky")
+    await asyncio.sleep(task_utils.TASK_FLUSH_SECONDS * 3)
+    started = time.perf_counter()
+    user_id = users[0]["id"]
+    on_expense_change(user_id, new={"amount": 1.0, "category": "Food", "date": datetime(2026, 10, 2)}, currency="INR")
+    await task_utils.settled("budget_rollup", user_id)
+    settle_s = time.perf_counter() - started
+    await task_utils.drain()
+    print(f"  rollup settled in {settle_s * 1e3:.0f} ms behind a batch awaiting its retry")
+    assert settle_s < task_utils.TASK_RETRY_SECONDS, "a retrying batch held up the worker"
+    assert task_utils.task_metrics()["kinds"]["bench_flaky"]["processed"] == 1, "retried batch not drained"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5_000)
+    parser.add_argument("--users", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
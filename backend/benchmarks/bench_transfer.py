@@ -0,0 +1,86 @@
+"""
+Whole-account export and import at scale.
+
+Seeds one account with about --expenses expenses (--receipt-rate of them
+with a receipt image, the oldest --archived-years in the archive tier),
+streams GET /export through the app, then POSTs the archive to /import for
+a second account. Reports time, archive size and the peak resident memory
+above the pre-request level for each direction; a buffering
+implementation would grow with the account, a streaming one stays flat.
+
+    python -m benchmarks.bench_transfer [--expenses N] [--receipt-rate R]
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+from datetime import datetime
+
+async def run(args):
+    from benchmarks.memory_motor import install
+    install()
+    os.environ["LOG_LEVEL"] = "CRITICAL"
+    import httpx
+    import main
+    from app.auth.utils import create_access_token
+    from app.archive_utils import archive_user, archive_cutoff
+    from app.database import get_database
+    from benchmarks.datagen import make_users, make_expenses
+    from benchmarks.load import RssSampler
+
+    db = get_database()
+    source, target = make_users(2, password_hash="x")
+    years = 5
+    expenses = make_expenses(source, years, math.ceil(args.expenses / (12 * years)), end=datetime(2026, 10, 1), receipt_rate=args.receipt_rate)
+    sampler = RssSampler()
+    sampler.start()
+
+    async with main.app.router.lifespan_context(main.app):
+        await db.users.insert_many([dict(source), dict(target)])
+        for i in range(0, len(expenses), 10_000):
+            await db.expenses.insert_many(expenses[i:i + 10_000])
+        await archive_user(db, source["id"], archive_cutoff(now=datetime(2026, 10, 1), days=365 * (years - args.archived_years)))
+        del expenses
+        auth = lambda user: {"Authorization": f"Bearer {create_access_token({'sub': user['email']})}"}
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            sampler.take_peak()
+            base = sampler.current()
+            started = time.perf_counter()
+            chunks, size = [], 0
+            async with client.stream("GET", "/api/export", headers=auth(source)) as response:
+                async for chunk in response.aiter_raw():
+                    # Kept only to replay into /import; a client would write them to disk
+                    chunks.append(chunk)
+                    size += len(chunk)
+            export_s = time.perf_counter() - started
+            export_peak = sampler.take_peak() - base - size
+
+            async def body():
+                for chunk in chunks:
+                    yield chunk
+
+            base = sampler.current()
+            started = time.perf_counter()
+            response = await client.post("/api/import", content=body(), headers=auth(target))
+            import_s = time.perf_counter() - started
+            import_peak = sampler.take_peak() - base
+    sampler.stop()
+
+    result = response.json()
+    print(f"{result['imported']['expenses']:,} expenses, {result['imported']['receipts']:,} receipts; archive {size / 1e6:.1f} MB")
+    print(f"  export  {export_s:6.1f}s  {result['imported']['expenses'] / export_s:>9,.0f} expenses/s  peak RSS +{export_peak / 1e6:6.1f} MB (excluding the received archive)")
+    print(f"  import  {import_s:6.1f}s  {result['imported']['expenses'] / import_s:>9,.0f} expenses/s  peak RSS +{import_peak / 1e6:6.1f} MB")
+    print("  (in-memory Mongo: the import peak includes the stored documents themselves)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--receipt-rate", type=float, default=0.01)
+    parser.add_argument("--archived-years", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
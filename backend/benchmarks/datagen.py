@@ -0,0 +1,432 @@
+"""
+Deterministic synthetic data for the load and parser benchmarks.
+
+Everything is derived from a single seed so two runs (or two commits) see
+byte-identical users, expenses, budgets, OCR receipts, SMS batches and
+statement PDFs.
+
+    python -m benchmarks.datagen --out /tmp/bench-data [--users N] [--years Y] [--seed S]
+
+writes the corpora to disk for inspection or reuse by other tools.
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+# category -> [(vendor, min amount, max amount)]
+VENDORS = {
+    "Food": [("Swiggy", 150, 900), ("Zomato", 150, 1100), ("Dominos Pizza", 300, 1200), ("Haldiram Restaurant", 200, 800)],
+    "Coffee": [("Starbucks", 250, 650), ("Cafe Coffee Day", 120, 400), ("Third Wave Coffee", 180, 500)],
+    "Shopping": [("Amazon", 300, 6000), ("Flipkart", 300, 5000), ("Myntra", 700, 4000), ("Lifestyle Mall", 900, 5000)],
+    "Transport": [("Uber", 90, 700), ("Ola", 80, 600), ("Indian Oil Petrol", 500, 3000), ("Metro Card", 100, 500)],
+    "Groceries": [("BigBasket", 400, 3500), ("DMart", 500, 4000), ("Kirana Store", 80, 900)],
+    "Health": [("Apollo Pharmacy", 100, 2000), ("City Clinic", 500, 1500)],
+    "Bills": [("Electricity Bill", 800, 4000), ("Water Bill", 200, 600), ("Gas Bill", 500, 1100)],
+}
+
+# Fixed-amount, fixed-cadence charges so recurring detection has something to find
+SUBSCRIPTIONS = [
+    ("Netflix", "Entertainment", 649.0, 30),
+    ("Spotify", "Entertainment", 119.0, 30),
+    ("Jio Recharge", "Bills", 299.0, 28),
+    ("Airtel Broadband", "Bills", 999.0, 30),
+    ("Cult Fit", "Health", 1499.0, 30),
+    ("Amazon Prime", "Entertainment", 1499.0, 365),
+]
+
+FOREIGN_CURRENCIES = ["USD", "EUR", "GBP", "SGD", "AED"]
+PAYMENT_MODES = ["upi", "upi", "upi", "card", "cash"]
+BANKS = ["HDFC", "ICICI", "SBI", "Axis", "Kotak"]
+
+PASSWORD = "bench-password"
+
+def _round_amount(rng: random.Random, lo: float, hi: float) -> float:
+    return round(rng.uniform(lo, hi), 2)
+
+def make_users(n: int, seed: int = 0, password_hash: str = None):
+    """
+    User documents as the auth router stores them. bcrypt is slow by design,
+    so every user shares one hash of PASSWORD.
+    """
+    if password_hash is None:
+        from app.auth.utils import get_password_hash
+        password_hash = get_password_hash(PASSWORD)
+    rng = random.Random(seed)
+    users = []
+    for i in range(n):
+        users.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "email": f"bench{i}@example.com",
+            "name": f"Bench User {i}",
+            "phone": None,
+            "currency": "INR" if i % 5 else "USD",
+            "password_hash": password_hash,
+            "created_at": datetime(2023, 1, 1) + timedelta(days=i % 365),
+        })
+    return users
+
+def make_expenses(user: dict, years: int, per_month: int, seed: int = 0, end: datetime = None, receipt_rate: float = 0.05):
+    """
+    `years` of history ending at `end`: roughly `per_month` discretionary
+    expenses a month, the SUBSCRIPTIONS schedule, some foreign-currency
+    spend and a few SMS/PDF re-imports of manual entries (duplicates).
+    """
+    rng = random.Random(f"{seed}:{user['id']}")
+    end = end or datetime(2026, 10, 1)
+    start = end - timedelta(days=365 * years)
+    days = (end - start).days
+    total = per_month * 12 * years
+    categories = list(VENDORS)
+    expenses = []
+
+    def expense(when, category, vendor, amount, **extra):
+        doc = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": user["id"],
+            "amount": amount,
+            "date": when,
+            "category": category,
+            "description": vendor,
+            "platform": None,
+            "payment_mode": rng.choice(PAYMENT_MODES),
+            "tax_amount": round(amount * 0.05, 2) if category in ("Food", "Shopping") else 0.0,
+            "tax_type": "GST" if category in ("Food", "Shopping") else None,
+            "receipt_image_base64": None,
+            "vendor": vendor,
+            "items": None,
+            "line_items": None,
+            "gst_details": None,
+            "original_ocr_data": None,
+            "is_tax_deductible": category == "Health",
+            "source": "manual",
+            "currency": "INR",
+            "created_at": when,
+            "duplicate_of": None,
+            "duplicate_score": None,
+        }
+        doc.update(extra)
+        expenses.append(doc)
+        return doc
+
+    for _ in range(total):
+        category = rng.choice(categories)
+        vendor, lo, hi = rng.choice(VENDORS[category])
+        when = start + timedelta(days=rng.randrange(days), minutes=rng.randrange(24 * 60))
+        expense(when, category, vendor, _round_amount(rng, lo, hi))
+
+    for vendor, category, amount, every in rng.sample(SUBSCRIPTIONS, 3):
+        when = start + timedelta(days=rng.randrange(every))
+        while when < end:
+            expense(when, category, vendor, amount, payment_mode="card")
+            when += timedelta(days=every, hours=rng.randrange(-12, 12))
+
+    # Travel months: a burst of foreign-currency spend
+    for _ in range(years * 2):
+        trip = start + timedelta(days=rng.randrange(days))
+        currency = rng.choice(FOREIGN_CURRENCIES)
+        for d in range(rng.randrange(3, 8)):
+            category = rng.choice(["Food", "Transport", "Shopping"])
+            vendor, lo, hi = rng.choice(VENDORS[category])
+            expense(trip + timedelta(days=d), category, vendor, _round_amount(rng, lo / 80, hi / 80), currency=currency, payment_mode="card")
+
+    # Re-imports of a manual entry from SMS or a statement, a day later and a little off in amount
+    for original in rng.sample(expenses, max(1, len(expenses) // 50)):
+        if original["currency"] != "INR":
+            continue
+        expense(
+            original["date"] + timedelta(hours=rng.randrange(1, 36)),
+            original["category"],
+            original["vendor"].upper(),
+            round(original["amount"] + rng.choice([0.0, 0.0, 0.5]), 2),
+            source=rng.choice(["sms", "pdf"]),
+        )
+
+    if receipt_rate:
+        with_receipts = [e for e in expenses if e["source"] == "manual"]
+        for e in rng.sample(with_receipts, int(len(with_receipts) * receipt_rate)):
+            e["receipt_image_base64"] = base64.b64encode(render_receipt(receipt_text(rng, e["vendor"], e["amount"]), width=240)).decode()
+
+    expenses.sort(key=lambda e: e["date"])
+    return expenses
+
+def make_budgets(user: dict, months: int, end: datetime = None, seed: int = 0):
+    """A budget per spending category for each of the last `months` months."""
+    rng = random.Random(f"{seed}:budgets:{user['id']}")
+    end = end or datetime(2026, 10, 1)
+    budgets = []
+    month, year = end.month, end.year
+    for _ in range(months):
+        for category in VENDORS:
+            budgets.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_id": user["id"],
+                "category": category,
+                "monthly_limit": float(rng.choice([2000, 5000, 8000, 12000, 20000])),
+                "month": month,
+                "year": year,
+                "current_spent": 0.0,
+            })
+        month -= 1
+        if month == 0:
+            month, year = 12, year - 1
+    return budgets
+
+def receipt_text(rng: random.Random, vendor: str = None, total: float = None) -> str:
+    """A POS-style receipt as tesseract would return it."""
+    if vendor is None:
+        category = rng.choice(list(VENDORS))
+        vendor, lo, hi = rng.choice(VENDORS[category])
+        total = _round_amount(rng, lo, hi)
+    lines = [f"{vendor.upper()} PVT LTD", f"GSTIN 29AAB{rng.randrange(10000, 99999)}Z5", f"Date: {rng.randrange(1, 28):02d}/{rng.randrange(1, 13):02d}/2026", ""]
+    remaining = total
+    n_items = rng.randrange(1, 6)
+    for i in range(n_items):
+        price = remaining if i == n_items - 1 else round(remaining * rng.uniform(0.1, 0.5), 2)
+        remaining = round(remaining - price, 2)
+        lines.append(f"Item {rng.choice(['Paneer', 'Coffee', 'Bread', 'Soap', 'Charger', 'Notebook', 'Rice'])} {i + 1}  {price:.2f}")
+    lines += ["", f"TOTAL {total:.2f}", rng.choice(["VISA **** 4242", "UPI", "CASH", "RUPAY CHIP READ"]), "THANK YOU"]
+    return "\n".join(lines)
+
+def render_receipt(text: str, width: int = 480) -> bytes:
+    """Draws receipt text onto a white JPEG, roughly what a phone camera would upload."""
+    from PIL import Image, ImageDraw
+    lines = text.split("\n")
+    line_height = 14
+    image = Image.new("RGB", (width, line_height * (len(lines) + 2)), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((10, line_height * (i + 1)), line, fill="black")
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=80)
+    return out.getvalue()
+
+def sms_batch(n: int, seed: int = 0):
+    """Bank transaction alerts in the formats sms_utils understands, plus a few credits."""
+    rng = random.Random(f"{seed}:sms")
+    templates = [
+        "Rs.{amount} spent on your {bank} Bank Card XX{card} at {merchant} on {date}. Avl bal Rs.{balance}",
+        "INR {amount} debited from A/c XX{card} at {merchant} on {date}. Bank {bank}",
+        "Your A/c XX{card} is debited by Rs {amount} at {merchant}. Bank {bank}",
+        "Dear Customer, your A/c XX{card} is credited with INR {amount} on {date}. Bank {bank}",
+    ]
+    messages = []
+    for _ in range(n):
+        category = rng.choice(list(VENDORS))
+        merchant, lo, hi = rng.choice(VENDORS[category])
+        messages.append(rng.choice(templates).format(
+            amount=f"{_round_amount(rng, lo, hi):,.2f}",
+            bank=rng.choice(BANKS),
+            card=rng.randrange(1000, 9999),
+            merchant=merchant.upper(),
+            date=f"{rng.randrange(1, 28):02d}-{rng.choice(['Jan', 'Feb', 'Mar', 'Apr'])}-26",
+            balance=f"{_round_amount(rng, 1000, 90000):,.2f}",
+        ))
+    return messages
+
+# ReportLab's standard fonts have no rupee glyph; use a system font that does when one exists
+RUPEE_FONTS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+]
+
+def _statement_font():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    for path in [os.getenv("STATEMENT_FONT")] + RUPEE_FONTS:
+        if path and os.path.exists(path):
+            if "StatementFont" not in pdfmetrics.getRegisteredFontNames():
+                pdfmetrics.registerFont(TTFont("StatementFont", path))
+            return "StatementFont", "₹"
+    return "Helvetica", "INR "
+
+def statement_pdf(rows: int, seed: int = 0, bank: str = None, layout: str = "upi", summary: int = 0) -> bytes:
+    """
+    A statement of `rows` debits, paginated like the real exports.
+    layout "upi": a UPI-app export with date, details, type and amount
+    columns and a wrapped reference line; the first `summary` debits are
+    printed as plain lines on a cover page, before the first column header.
+    layout "ledger": a bank ledger with dd/mm/yy dates, narration, reference,
+    value date, right-aligned withdrawal, deposit and balance columns, and a
+    salary credit per page.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    if layout == "ledger":
+        return _ledger_pdf(rows, seed, bank)
+    rng = random.Random(f"{seed}:statement:{rows}")
+    bank = bank or rng.choice(BANKS)
+    font, rupee = _statement_font()
+    out = io.BytesIO()
+    pdf = canvas.Canvas(out, pagesize=A4)
+    width, height = A4
+    rows_per_page = 28
+    when = datetime(2026, 1, 1)
+
+    if summary:
+        pdf.setFont(font, 12)
+        pdf.drawString(40, height - 40, f"{bank} Bank - Account Summary")
+        pdf.setFont(font, 9)
+        y = height - 70
+        for _ in range(summary):
+            vendor, lo, hi = rng.choice(VENDORS[rng.choice(list(VENDORS))])
+            when += timedelta(hours=rng.randrange(2, 30))
+            pdf.drawString(40, y, f"{when:%d %b, %Y}  Paid to {vendor}  {rupee}{_round_amount(rng, lo, hi):,.2f}")
+            y -= 16
+        pdf.showPage()
+    for page_start in range(0, rows - summary, rows_per_page):
+        pdf.setFont(font, 12)
+        pdf.drawString(40, height - 40, f"{bank} Bank - Transaction Statement")
+        pdf.setFont(font, 9)
+        y = height - 70
+        for header, x in (("Date", 40), ("Transaction Details", 140), ("Type", 400), ("Amount", 480)):
+            pdf.drawString(x, y, header)
+        y -= 20
+        for _ in range(min(rows_per_page, rows - summary - page_start)):
+            category = rng.choice(list(VENDORS))
+            vendor, lo, hi = rng.choice(VENDORS[category])
+            when += timedelta(hours=rng.randrange(2, 30))
+            pdf.drawString(40, y, when.strftime("%d %b, %Y"))
+            pdf.drawString(140, y, f"Paid to {vendor}")
+            pdf.drawString(400, y, "DEBIT")
+            pdf.drawString(480, y, f"{rupee}{_round_amount(rng, lo, hi):,.2f}")
+            pdf.drawString(140, y - 10, f"{when.strftime('%I:%M %p')} UPI Ref {rng.randrange(10**11, 10**12)}")
+            y -= 24
+        pdf.showPage()
+    pdf.save()
+    return out.getvalue()
+
+def _ledger_pdf(rows: int, seed: int, bank: str = None) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(f"{seed}:ledger:{rows}")
+    bank = bank or rng.choice(BANKS)
+    out = io.BytesIO()
+    pdf = canvas.Canvas(out, pagesize=A4)
+    width, height = A4
+    rows_per_page = 40
+    when = datetime(2026, 1, 1)
+    balance = 150000.0
+    columns = (("Date", 30, "l"), ("Narration", 80, "l"), ("Chq./Ref.No.", 280, "l"), ("Value Dt", 350, "l"),
+               ("Withdrawal Amt.", 460, "r"), ("Deposit Amt.", 515, "r"), ("Closing Balance", 570, "r"))
+
+    def cell(text, x, align, y):
+        (pdf.drawRightString if align == "r" else pdf.drawString)(x, y, text)
+
+    for page_start in range(0, rows, rows_per_page):
+        pdf.setFont("Helvetica-Bold", 11)
+        pdf.drawString(30, height - 36, f"{bank} BANK LTD   Statement of account")
+        pdf.setFont("Helvetica", 7)
+        pdf.drawString(30, height - 50, f"Account No: XXXXXXXX{rng.randrange(1000, 9999)}   Currency: INR")
+        y = height - 74
+        for header, x, align in columns:
+            cell(header, x, align, y)
+        y -= 14
+        for i in range(min(rows_per_page, rows - page_start) + (1 if page_start % 120 == 0 else 0)):
+            when += timedelta(hours=rng.randrange(2, 30))
+            ref = f"{rng.randrange(10**11, 10**12)}"
+            if i == 0 and page_start % 120 == 0:
+                # A salary credit, which is not an expense
+                amount = 85000.0
+                balance += amount
+                values = (when.strftime("%d/%m/%y"), "NEFT CR-ACME PAYROLL-SALARY", ref, when.strftime("%d/%m/%y"), "", f"{amount:,.2f}", f"{balance:,.2f}")
+            else:
+                category = rng.choice(list(VENDORS))
+                vendor, lo, hi = rng.choice(VENDORS[category])
+                amount = _round_amount(rng, lo, hi)
+                balance -= amount
+                handle = vendor.lower().replace(" ", "")[:10]
+                narration = f"UPI-{vendor.upper()}-{handle}@okaxis"
+                values = (when.strftime("%d/%m/%y"), narration, ref, when.strftime("%d/%m/%y"), f"{amount:,.2f}", "", f"{balance:,.2f}")
+            for value, (_, x, align) in zip(values, columns):
+                cell(value, x, align, y)
+            y -= 12
+        pdf.showPage()
+    pdf.save()
+    return out.getvalue()
+
+class Dataset:
+    """A full synthetic population, generated once per benchmark run."""
+
+    def __init__(self, users: int = 20, years: int = 3, per_month: int = 30, seed: int = 0, receipt_rate: float = 0.05):
+        self.seed = seed
+        self.users = make_users(users, seed)
+        self.expenses = {}
+        self.budgets = []
+        for user in self.users:
+            self.expenses[user["id"]] = make_expenses(user, years, per_month, seed, receipt_rate=receipt_rate)
+            self.budgets += make_budgets(user, 12, seed=seed)
+        self._sync_budgets()
+        rng = random.Random(f"{seed}:corpora")
+        self.receipt_texts = [receipt_text(rng) for _ in range(50)]
+        self.receipt_images = [base64.b64encode(render_receipt(t)).decode() for t in self.receipt_texts[:10]]
+        self.sms = sms_batch(500, seed)
+        self.statements = {n: base64.b64encode(statement_pdf(n, seed)).decode() for n in (20, 200)}
+
+    def _sync_budgets(self):
+        """Fills current_spent the way the expense write path maintains it, so reads see steady state."""
+        from app.currency import BASE_CURRENCY, total_in
+        currencies = {u["id"]: u.get("currency", BASE_CURRENCY) for u in self.users}
+        spend = {}
+        for user_id, expenses in self.expenses.items():
+            for e in expenses:
+                if not e.get("duplicate_of"):
+                    spend.setdefault((user_id, e["category"], e["date"].month, e["date"].year), []).append(e)
+        for b in self.budgets:
+            matching = spend.get((b["user_id"], b["category"], b["month"], b["year"]), [])
+            b["current_spent"] = total_in(matching, currencies[b["user_id"]])
+            b["spent_synced"] = True
+
+    @property
+    def expense_count(self) -> int:
+        return sum(len(v) for v in self.expenses.values())
+
+    async def load_into(self, db):
+        """Bulk inserts users, expenses and budgets, bypassing the API."""
+        await db.users.insert_many([dict(u) for u in self.users])
+        for expenses in self.expenses.values():
+            if expenses:
+                await db.expenses.insert_many([dict(e) for e in expenses])
+        await db.budgets.insert_many([dict(b) for b in self.budgets])
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--per-month", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = Dataset(args.users, args.years, args.per_month, args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, "users.json"), "w") as f:
+        json.dump(data.users, f, default=_json_default)
+    with open(os.path.join(args.out, "expenses.ndjson"), "w") as f:
+        for expenses in data.expenses.values():
+            for e in expenses:
+                f.write(json.dumps(e, default=_json_default) + "\n")
+    with open(os.path.join(args.out, "budgets.json"), "w") as f:
+        json.dump(data.budgets, f, default=_json_default)
+    with open(os.path.join(args.out, "receipts.txt"), "w") as f:
+        f.write("\n\n---\n\n".join(data.receipt_texts))
+    with open(os.path.join(args.out, "sms.txt"), "w") as f:
+        f.write("\n".join(data.sms))
+    for rows, pdf in data.statements.items():
+        with open(os.path.join(args.out, f"statement_{rows}.pdf"), "wb") as f:
+            f.write(base64.b64decode(pdf))
+    print(f"users={len(data.users)} expenses={data.expense_count} budgets={len(data.budgets)} -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,610 @@
+"""
+End-to-end load test for every /api route.
+
+Seeds a synthetic population (benchmarks.datagen) into either the in-memory
+Motor stand-in or a local mongod, then drives the app in-process over ASGI:
+each route gets its own phase of --requests calls at --concurrency, followed
+by a mixed phase where a weighted blend of read and write routes run together.
+Per-endpoint throughput, latency percentiles and the peak RSS seen during the
+phase are written as JSON so runs can be compared across commits:
+
+    python -m benchmarks.load [--backend memory|mongo] [--users N] [--requests N] [--concurrency C]
+    python -m benchmarks.load --compare benchmarks/results/load-<old>.json
+
+Notes:
+- The in-process transport waits for the app to return, so the cost of
+  BackgroundTasks (receipt thumbnails, recurring refresh) is included in the
+  latency of the route that scheduled them.
+- GET /budgets/stream never completes; it is measured as time to first byte.
+- parse-receipt needs the tesseract binary; without it the route still
+  answers (with an error payload) and only the pre-OCR work is timed.
+- --backend mongo uses (and drops) the database bench_<seed> on MONGODB_URL.
+- Admission control (app.admission_utils) is off unless --admission is
+  given; with it, CPU-heavy phases measure 429s rather than the work.
+- Registered /api routes without a phase are listed under "uncovered" and
+  warned about (--strict fails the run); add a spec to `endpoints` for them.
+- GET /expenses/search needs Mongo's $text index; on the memory backend it
+  answers 500 and only --backend mongo measures it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+class RssSampler(threading.Thread):
+    """
+    Polls resident set size from a thread so the reading keeps moving while a
+    CPU-bound handler holds the event loop. `take_peak()` returns and resets
+    the maximum since the previous call.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self.stopping = threading.Event()
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def current(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page
+        except OSError:
+            # ru_maxrss is a lifetime high-water mark (kB on Linux, bytes on macOS)
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def take_peak(self) -> int:
+        peak, self.peak = max(self.peak, self.current()), self.current()
+        return peak
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+def summarize(latencies, statuses: Counter, elapsed: float, peak_rss: int = None) -> dict:
+    ms = np.asarray(latencies) * 1000
+    stats = {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+    }
+    if peak_rss is not None:
+        stats["peak_rss_mb"] = round(peak_rss / 2**20, 1)
+    return stats
+
+class Context:
+    """Everything the request builders need: seeded users, their tokens and ids created along the way."""
+
+    def __init__(self, data, seed: int):
+        from app.auth.utils import create_access_token
+        self.data = data
+        self.rng = random.Random(seed)
+        self.users = data.users
+        self.tokens = {u["id"]: create_access_token({"sub": u["email"]}) for u in self.users}
+        self.receipt_ids = {
+            u["id"]: [e["id"] for e in data.expenses[u["id"]] if e.get("receipt_image_base64")] for u in self.users
+        }
+        self.created_expenses = []
+        self.created_budgets = []
+        self.groups = {}  # user id -> a group they own
+        self.created_members = []
+        self.created_group_expenses = []
+        self.exports = {}  # user id -> their latest GET /export archive
+
+    def user(self, i: int) -> dict:
+        return self.users[i % len(self.users)]
+
+    @property
+    def admin(self) -> dict:
+        return self.users[0]
+
+    def auth(self, user: dict) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[user['id']]}"}
+
+    def new_expense(self) -> dict:
+        from benchmarks.datagen import VENDORS
+        category = self.rng.choice(list(VENDORS))
+        vendor, lo, hi = self.rng.choice(VENDORS[category])
+        when = datetime(2026, 9, 1) + timedelta(days=self.rng.randrange(30), minutes=self.rng.randrange(1440))
+        return {
+            "amount": round(self.rng.uniform(lo, hi), 2),
+            "date": when.isoformat(),
+            "category": category,
+            "vendor": vendor,
+            "description": vendor,
+            "payment_mode": "upi",
+            "source": self.rng.choice(["manual", "manual", "sms"]),
+        }
+
+def _remember(store):
+    def record(user, response):
+        if response.status_code == 200:
+            store.append((user, response.json()["id"]))
+    return record
+
+def endpoints(ctx: Context):
+    """
+    (name, method, path, build) in run order, where build(i) returns
+    (user, request kwargs, on_response or None). Writes that later phases
+    depend on (created expenses/budgets/groups, exports) come before the
+    routes that use them. A name is the route as FastAPI registers it, with
+    an optional " [variant]" suffix; see `uncovered`.
+    """
+    from benchmarks.datagen import PASSWORD
+    data = ctx.data
+
+    def simple(i):
+        return ctx.user(i), {}, None
+
+    def register(i):
+        return None, {"json": {"email": f"load{i}-{time.monotonic_ns()}@example.com", "name": "Load", "password": PASSWORD}}, None
+
+    def login(i):
+        user = ctx.user(i)
+        return user, {"data": {"username": user["email"], "password": PASSWORD}}, None
+
+    def reset_password(i):
+        return ctx.user(i), {"json": {"current_password": PASSWORD, "new_password": PASSWORD}}, None
+
+    def profile(i):
+        return ctx.user(i), {"json": {"name": f"Bench User {i}"}}, None
+
+    def create_expense(i):
+        return ctx.user(i), {"json": ctx.new_expense()}, _remember(ctx.created_expenses)
+
+    def update_expense(i):
+        user = ctx.user(i)
+        expense = ctx.rng.choice(data.expenses[user["id"]])
+        body = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in expense.items()
+                if k not in ("id", "user_id", "created_at", "duplicate_of", "duplicate_score", "_id")}
+        body["amount"] = round(expense["amount"] * ctx.rng.uniform(0.9, 1.1), 2)
+        return user, {"path": f"/api/expenses/{expense['id']}", "json": body}, None
+
+    def delete_expense(i):
+        user, expense_id = ctx.created_expenses.pop() if ctx.created_expenses else (ctx.user(i), "missing")
+        return user, {"path": f"/api/expenses/{expense_id}"}, None
+
+    def create_budget(i):
+        return ctx.user(i), {"json": {
+            # A fresh category each time; an existing (category, month, year) is updated in place
+            "category": f"Load {i}",
+            "monthly_limit": 5000.0,
+            "month": ctx.rng.randrange(1, 13),
+            "year": 2027,
+        }}, _remember(ctx.created_budgets)
+
+    def delete_budget(i):
+        user, budget_id = ctx.created_budgets.pop() if ctx.created_budgets else (ctx.user(i), "missing")
+        return user, {"path": f"/api/budgets/{budget_id}"}, None
+
+    def search(i):
+        from benchmarks.datagen import VENDORS
+        vendors = [v for options in VENDORS.values() for v, _, _ in options]
+        return ctx.user(i), {"params": {"q": vendors[i % len(vendors)].split()[0]}}, None
+
+    def export_account(i):
+        def keep(user, response):
+            if response.status_code == 200:
+                ctx.exports[user["id"]] = response.content
+        return ctx.user(i), {}, keep
+
+    def import_account(i):
+        user = ctx.user(i)
+        return user, {"content": ctx.exports.get(user["id"], b"")}, None
+
+    def group_path(user, suffix=""):
+        group = ctx.groups.get(user["id"])
+        return f"/api/groups/{group['id'] if group else 'missing'}{suffix}"
+
+    def create_group(i):
+        def keep(user, response):
+            if response.status_code == 200:
+                ctx.groups.setdefault(user["id"], response.json())
+        other = ctx.user(i + 1)
+        return ctx.user(i), {"json": {"name": f"Load {i}", "members": [{"name": other["name"], "email": other["email"]}]}}, keep
+
+    def get_group(i):
+        user = ctx.user(i)
+        return user, {"path": group_path(user)}, None
+
+    def add_member(i):
+        def keep(user, response):
+            if response.status_code == 200:
+                ctx.created_members.append((user, response.json()["members"][-1]["id"]))
+        user = ctx.user(i)
+        return user, {"path": group_path(user, "/members"), "json": {"name": f"Guest {i}"}}, keep
+
+    def remove_member(i):
+        user, member_id = ctx.created_members.pop() if ctx.created_members else (ctx.user(i), "missing")
+        return user, {"path": group_path(user, f"/members/{member_id}")}, None
+
+    def group_expense_body(user):
+        group = ctx.groups.get(user["id"])
+        members = group["members"] if group else [{"id": "missing"}]
+        return {
+            "amount": round(ctx.rng.uniform(100, 5000), 2),
+            "description": "Load",
+            "date": datetime(2026, 9, 1).isoformat(),
+            "paid_by": members[ctx.rng.randrange(len(members))]["id"],
+        }
+
+    def create_group_expense(i):
+        def keep(user, response):
+            if response.status_code == 200:
+                ctx.created_group_expenses.append((user, response.json()["id"]))
+        user = ctx.user(i)
+        return user, {"path": group_path(user, "/expenses"), "json": group_expense_body(user)}, keep
+
+    def list_group_expenses(i):
+        user = ctx.user(i)
+        return user, {"path": group_path(user, "/expenses")}, None
+
+    def update_group_expense(i):
+        user, expense_id = ctx.rng.choice(ctx.created_group_expenses) if ctx.created_group_expenses else (ctx.user(i), "missing")
+        return user, {"path": group_path(user, f"/expenses/{expense_id}"), "json": group_expense_body(user)}, None
+
+    def delete_group_expense(i):
+        user, expense_id = ctx.created_group_expenses.pop() if ctx.created_group_expenses else (ctx.user(i), "missing")
+        return user, {"path": group_path(user, f"/expenses/{expense_id}")}, None
+
+    def record_payment(i):
+        user = ctx.user(i)
+        group = ctx.groups.get(user["id"])
+        members = group["members"] if group else [{"id": "missing"}] * 2
+        return user, {"path": group_path(user, "/payments"), "json": {
+            "from_member": members[1]["id"], "to_member": members[0]["id"], "amount": round(ctx.rng.uniform(10, 500), 2),
+        }}, None
+
+    def settlement(i):
+        user = ctx.user(i)
+        return user, {"path": group_path(user, "/settlement")}, None
+
+    def as_admin(i):
+        return ctx.admin, {}, None
+
+    def admin_profile(i):
+        return ctx.admin, {"path": "/api/admin/profiles/missing"}, None
+
+    def month_report(i):
+        return ctx.user(i), {"params": {"month": 1 + i % 12, "year": 2026}}, None
+
+    def receipt_image(i):
+        user = ctx.user(i)
+        ids = ctx.receipt_ids[user["id"]] or ["missing"]
+        return user, {"path": f"/api/receipts/{ids[i % len(ids)]}/thumb"}, None
+
+    def parse(field, corpus):
+        return lambda i: (ctx.user(i), {"json": {field: corpus[i % len(corpus)]}}, None)
+
+    statements = data.statements
+    return [
+        ("POST /api/auth/register", "POST", "/api/auth/register", register),
+        ("POST /api/auth/login", "POST", "/api/auth/login", login),
+        ("GET /api/auth/me", "GET", "/api/auth/me", simple),
+        ("PUT /api/auth/profile", "PUT", "/api/auth/profile", profile),
+        ("POST /api/auth/reset-password", "POST", "/api/auth/reset-password", reset_password),
+        ("POST /api/expenses/", "POST", "/api/expenses/", create_expense),
+        ("GET /api/expenses/", "GET", "/api/expenses/", simple),
+        ("GET /api/expenses/search", "GET", "/api/expenses/search", search),
+        ("PUT /api/expenses/{expense_id}", "PUT", None, update_expense),
+        ("DELETE /api/expenses/{expense_id}", "DELETE", None, delete_expense),
+        ("GET /api/expenses/summary", "GET", "/api/expenses/summary", simple),
+        ("POST /api/expenses/archive", "POST", "/api/expenses/archive", simple),
+        ("POST /api/expenses/dedupe/backfill", "POST", "/api/expenses/dedupe/backfill", simple),
+        ("GET /api/expenses/recurring", "GET", "/api/expenses/recurring", simple),
+        ("POST /api/expenses/recurring/refresh", "POST", "/api/expenses/recurring/refresh", simple),
+        ("POST /api/expenses/parse-sms", "POST", "/api/expenses/parse-sms", parse("text", data.sms)),
+        ("POST /api/expenses/parse-receipt", "POST", "/api/expenses/parse-receipt", parse("image", data.receipt_images)),
+        ("POST /api/expenses/parse-pdf [20 rows]", "POST", "/api/expenses/parse-pdf", parse("pdf", [statements[20]])),
+        ("POST /api/expenses/parse-pdf [200 rows]", "POST", "/api/expenses/parse-pdf", parse("pdf", [statements[200]])),
+        ("POST /api/budgets/", "POST", "/api/budgets/", create_budget),
+        ("GET /api/budgets/", "GET", "/api/budgets/", simple),
+        ("DELETE /api/budgets/{budget_id}", "DELETE", None, delete_budget),
+        ("GET /api/reports/csv", "GET", "/api/reports/csv", month_report),
+        ("GET /api/reports/pdf", "GET", "/api/reports/pdf", month_report),
+        ("GET /api/receipts/", "GET", "/api/receipts/", simple),
+        ("GET /api/receipts/{expense_id}/{size}", "GET", None, receipt_image),
+        ("GET /api/export", "GET", "/api/export", export_account),
+        ("POST /api/import", "POST", "/api/import", import_account),
+        ("POST /api/groups/", "POST", "/api/groups/", create_group),
+        ("GET /api/groups/", "GET", "/api/groups/", simple),
+        ("GET /api/groups/{group_id}", "GET", None, get_group),
+        ("POST /api/groups/{group_id}/members", "POST", None, add_member),
+        ("DELETE /api/groups/{group_id}/members/{member_id}", "DELETE", None, remove_member),
+        ("POST /api/groups/{group_id}/expenses", "POST", None, create_group_expense),
+        ("GET /api/groups/{group_id}/expenses", "GET", None, list_group_expenses),
+        ("PUT /api/groups/{group_id}/expenses/{expense_id}", "PUT", None, update_group_expense),
+        ("POST /api/groups/{group_id}/payments", "POST", None, record_payment),
+        ("GET /api/groups/{group_id}/settlement", "GET", None, settlement),
+        ("DELETE /api/groups/{group_id}/expenses/{expense_id}", "DELETE", None, delete_group_expense),
+        ("GET /api/admin/admission", "GET", "/api/admin/admission", as_admin),
+        ("GET /api/admin/tasks", "GET", "/api/admin/tasks", as_admin),
+        ("GET /api/admin/cache", "GET", "/api/admin/cache", as_admin),
+        ("GET /api/admin/profiles", "GET", "/api/admin/profiles", as_admin),
+        ("GET /api/admin/profiles/{profile_id}", "GET", None, admin_profile),
+        ("POST /api/admin/profile-token", "POST", "/api/admin/profile-token", as_admin),
+    ]
+
+# Measured by their own phase rather than through endpoints()
+SEPARATE_PHASES = {"GET /api/budgets/stream"}
+
+def uncovered(app, specs) -> list:
+    """Registered /api routes ("METHOD /path/{param}") that no endpoint spec drives."""
+    covered = {spec[0].split(" [")[0] for spec in specs} | SEPARATE_PHASES
+    return [
+        f"{method.upper()} {path}"
+        for path, operations in app.openapi()["paths"].items() if path.startswith("/api/")
+        for method in operations
+        if f"{method.upper()} {path}" not in covered
+    ]
+
+# Routes whose side effects would skew every later phase (the backfill marks all
+# budgets for recomputation, archiving moves old expenses out), run after the mixed phase
+RUN_LAST = {"POST /api/expenses/dedupe/backfill", "POST /api/expenses/archive"}
+
+# Relative frequency of each route in the mixed phase, roughly what the mobile app generates
+MIXED_WEIGHTS = {
+    "GET /api/expenses/": 20,
+    "GET /api/budgets/": 15,
+    "GET /api/expenses/summary": 15,
+    "POST /api/expenses/": 10,
+    "PUT /api/expenses/{expense_id}": 5,
+    "GET /api/auth/me": 10,
+    "GET /api/receipts/": 5,
+    "GET /api/receipts/{expense_id}/{size}": 8,
+    "GET /api/expenses/recurring": 3,
+    "GET /api/expenses/search": 3,
+    "GET /api/groups/": 2,
+    "GET /api/groups/{group_id}/expenses": 2,
+    "POST /api/expenses/parse-sms": 5,
+    "POST /api/expenses/parse-pdf [20 rows]": 1,
+    "GET /api/reports/csv": 2,
+    "GET /api/reports/pdf": 1,
+}
+
+async def _send(client, ctx, method, path, build, i):
+    user, kwargs, on_response = build(i)
+    kwargs = dict(kwargs)
+    path = kwargs.pop("path", path)
+    headers = ctx.auth(user) if user else {}
+    started = time.perf_counter()
+    response = await client.request(method, path, headers=headers, **kwargs)
+    latency = time.perf_counter() - started
+    if on_response:
+        on_response(user, response)
+    return latency, response.status_code
+
+async def run_phase(client, ctx, spec, n, concurrency, sampler):
+    _, method, path, build = spec
+    latencies, statuses = [], Counter()
+    counter = iter(range(n))
+
+    async def worker():
+        for i in counter:
+            latency, status = await _send(client, ctx, method, path, build, i)
+            latencies.append(latency)
+            statuses[status] += 1
+
+    sampler.take_peak()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started, sampler.take_peak())
+
+async def run_mixed(client, ctx, specs, n, concurrency, sampler):
+    by_name = {s[0]: s for s in specs}
+    names = [name for name in MIXED_WEIGHTS if name in by_name]
+    schedule = ctx.rng.choices(names, weights=[MIXED_WEIGHTS[name] for name in names], k=n)
+    per_endpoint = {name: ([], Counter()) for name in names}
+    counter = iter(enumerate(schedule))
+
+    async def worker():
+        for i, name in counter:
+            _, method, path, build = by_name[name]
+            latency, status = await _send(client, ctx, method, path, build, i)
+            per_endpoint[name][0].append(latency)
+            per_endpoint[name][1][status] += 1
+
+    sampler.take_peak()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    peak = sampler.take_peak()
+
+    all_latencies = [l for latencies, _ in per_endpoint.values() for l in latencies]
+    all_statuses = sum((statuses for _, statuses in per_endpoint.values()), Counter())
+    result = summarize(all_latencies, all_statuses, elapsed, peak)
+    result["endpoints"] = {
+        name: summarize(latencies, statuses, elapsed) for name, (latencies, statuses) in per_endpoint.items() if latencies
+    }
+    return result
+
+async def sse_first_byte(app, ctx, n, sampler):
+    """Opens GET /budgets/stream n times and times the first chunk, then disconnects."""
+    latencies, statuses = [], Counter()
+    sampler.take_peak()
+    started_all = time.perf_counter()
+    for i in range(n):
+        user = ctx.user(i)
+        first_chunk = asyncio.Event()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/budgets/stream", "raw_path": b"/api/budgets/stream",
+            "query_string": b"", "root_path": "", "client": ("127.0.0.1", 0), "server": ("bench", 80),
+            "headers": [(b"host", b"bench"), (b"authorization", ctx.auth(user)["Authorization"].encode())],
+        }
+        received = {"sent": False}
+
+        async def receive():
+            if not received["sent"]:
+                received["sent"] = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses[message["status"]] += 1
+            elif message["type"] == "http.response.body" and not first_chunk.is_set():
+                latencies.append(time.perf_counter() - started)
+                first_chunk.set()
+
+        started = time.perf_counter()
+        await asyncio.wait_for(app(scope, receive, send), timeout=30)
+    return summarize(latencies, statuses, time.perf_counter() - started_all, sampler.take_peak())
+
+def git_revision() -> str:
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], stderr=subprocess.DEVNULL) != 0
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(baseline_path: str, current: dict, tolerance: float):
+    """Prints per-endpoint p95/throughput deltas against a baseline run; returns the regressed endpoints."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nvs {baseline['meta']['revision']} ({baseline_path})")
+    print(f"  {'endpoint':<42} {'p95 ms':>16}    {'req/s':>16}")
+    for name, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before:
+            continue
+        p95_change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        flag = "  <-- regression" if p95_change > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"  {name:<42} {before['p95_ms']:>8.1f} -> {now['p95_ms']:<7.1f} "
+              f"{before['throughput_rps']:>8.1f} -> {now['throughput_rps']:<7.1f}{flag}")
+    return regressions
+
+async def run(args):
+    if args.backend == "memory":
+        from benchmarks.memory_motor import install
+        install()
+    os.environ["DATABASE_NAME"] = f"bench_{args.seed}"
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ["ADMISSION_ENABLED"] = "1" if args.admission else "0"
+
+    import httpx
+    import main
+    from app.database import client as mongo_client, get_database
+    from benchmarks.datagen import Dataset
+
+    started = time.perf_counter()
+    data = Dataset(args.users, args.years, args.per_month, args.seed)
+    generated_s = time.perf_counter() - started
+    await mongo_client.drop_database(os.environ["DATABASE_NAME"])
+
+    sampler = RssSampler()
+    sampler.start()
+    results = {"endpoints": {}}
+    async with main.app.router.lifespan_context(main.app):
+        db = get_database()
+        await data.load_into(db)
+        ctx = Context(data, args.seed)
+        # The admin routes read ADMIN_EMAILS at import; the first seeded user calls them
+        from app.routers.admin import ADMIN_EMAILS
+        ADMIN_EMAILS.add(ctx.admin["email"].lower())
+        specs = endpoints(ctx)
+        only = set(args.only.split(",")) if args.only else None
+        missing = uncovered(main.app, specs)
+        if missing:
+            print(f"warning: no load phase for {', '.join(missing)}", file=sys.stderr, flush=True)
+            if args.strict:
+                sys.exit(f"{len(missing)} routes not covered")
+        results["uncovered"] = missing
+
+        # A route that raises counts as a 500 instead of ending the run
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def phase(spec):
+                results["endpoints"][spec[0]] = stats = await run_phase(client, ctx, spec, args.requests, args.concurrency, sampler)
+                print(f"  {spec[0]:<42} {json.dumps({k: stats[k] for k in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')})}", flush=True)
+
+            selected = [s for s in specs if not only or s[0] in only]
+            for spec in selected:
+                if spec[0] not in RUN_LAST:
+                    await phase(spec)
+            if not only or "GET /api/budgets/stream" in only:
+                results["endpoints"]["GET /api/budgets/stream [first byte]"] = await sse_first_byte(main.app, ctx, min(args.requests, 20), sampler)
+            if args.mixed_requests and not only:
+                results["mixed"] = await run_mixed(client, ctx, specs, args.mixed_requests, args.concurrency, sampler)
+            for spec in selected:
+                if spec[0] in RUN_LAST:
+                    await phase(spec)
+        await mongo_client.drop_database(os.environ["DATABASE_NAME"])
+    sampler.stop()
+
+    results["meta"] = {
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "seed": args.seed,
+        "users": len(data.users),
+        "expenses": data.expense_count,
+        "budgets": len(data.budgets),
+        "requests_per_endpoint": args.requests,
+        "concurrency": args.concurrency,
+        "mixed_requests": args.mixed_requests,
+        "datagen_s": round(generated_s, 2),
+        "admission": args.admission,
+    }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--per-month", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint phase")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mixed-requests", type=int, default=1000)
+    parser.add_argument("--log-level", default="CRITICAL", help="app log level during the run")
+    parser.add_argument("--admission", action="store_true", help="keep per-user admission control on")
+    parser.add_argument("--only", help="comma separated endpoint names to run")
+    parser.add_argument("--strict", action="store_true", help="fail when a registered /api route has no phase")
+    parser.add_argument("--out", help="JSON output path (default benchmarks/results/load-<revision>.json)")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="p95 increase flagged as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{results['meta']['revision']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {out}")
+
+    if args.compare and compare(args.compare, results, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
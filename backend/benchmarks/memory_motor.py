@@ -0,0 +1,27 @@
+"""
+In-memory stand-in for Motor, for running the load benchmark without a mongod.
+
+Wraps mongomock-motor (see benchmarks/requirements.txt). `install()` must run
+before `app.database` is imported so the app binds to the in-memory client.
+Latencies measured against it reflect the Python side of each route only;
+compare runs on the same backend.
+"""
+
+def install():
+    import motor.motor_asyncio
+    import mongomock.collection
+    from mongomock_motor import AsyncMongoMockClient
+
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+    # Recent pymongo passes `sort` to bulk update/replace builders; mongomock predates it
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        original = getattr(builder, name)
+        if getattr(original, "_accepts_sort", False):
+            continue
+
+        def without_sort(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+        without_sort._accepts_sort = True
+        setattr(builder, name, without_sort)
@@ -1,8 +1,17 @@
 from fastapi import FastAPI, Request
-from app.routers import auth, expenses, budgets, reports
+from app.routers import auth, expenses, budgets, reports, receipts, admin, transfer, groups
+from app.logging_utils import setup_logging, shutdown_logging, request_id_var
+from app.profiling_utils import PROFILE_ENABLED, ProfilingMiddleware
+from app.http_utils import CompressionMiddleware
+import asyncio
+import logging
 import time
+import uuid
 from fastapi.middleware.cors import CORSMiddleware
 
+setup_logging()
+logger = logging.getLogger("app.main")
+
 app = FastAPI(title="Expense Tracker API")
 
 app.add_middleware(
@@ -12,29 +21,89 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+
+if PROFILE_ENABLED:
+    # Added before log_requests so it runs inside it, on the same task as the route
+    app.add_middleware(ProfilingMiddleware)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = (time.time() - start_time) * 1000
-    print(f"REQUEST: {request.method} {request.url.path} - STATUS: {response.status_code} - TIME: {process_time:.2f}ms")
-    return response
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    start_time = time.perf_counter()
+    try:
+        response = await call_next(request)
+        process_time = (time.perf_counter() - start_time) * 1000
+        logger.info("request", extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration_ms": round(process_time, 2),
+        })
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        request_id_var.reset(token)
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(expenses.router, prefix="/api")
 app.include_router(budgets.router, prefix="/api")
 app.include_router(reports.router, prefix="/api")
+app.include_router(receipts.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(transfer.router, prefix="/api")
+app.include_router(groups.router, prefix="/api")
 
 @app.on_event("startup")
 async def startup_db_client():
     try:
-        from app.database import client
+        from app.database import client, ensure_indexes
         # ping the database to check if it's connected
         await client.admin.command('ping')
-        print("Connected to MongoDB!")
+        logger.info("Connected to MongoDB")
+        await ensure_indexes()
     except Exception as e:
-        print(f"Failed to connect to MongoDB: {e}")
+        logger.error("Failed to connect to MongoDB", extra={"error": str(e)})
+
+    # Startup runs in each worker after the fork, so this doubles as a post-fork preload hook
+    try:
+        from app.loaders import preload
+        loaded = preload()
+        if loaded:
+            logger.info("Preloaded heavy libraries", extra={"groups": loaded})
+    except Exception as e:
+        logger.error("Failed to preload libraries", extra={"error": str(e)})
+
+@app.on_event("startup")
+async def start_cache_invalidation():
+    # Drops this worker's per-user cache entries when another worker changes that user's data
+    from app.cache_utils import follow_invalidations
+    from app.database import get_database
+    app.state.cache_invalidation = asyncio.create_task(follow_invalidations(get_database()))
+
+@app.on_event("startup")
+async def start_budget_event_relay():
+    # Budget updates applied on another worker reach this worker's /budgets/stream clients
+    from app.budget_events import relay_events
+    from app.database import get_database
+    app.state.budget_event_relay = asyncio.create_task(relay_events(get_database()))
+
+@app.on_event("shutdown")
+async def stop_change_followers():
+    for name in ("cache_invalidation", "budget_event_relay"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+
+@app.on_event("shutdown")
+async def drain_background_tasks():
+    from app.task_utils import drain
+    await drain()
+
+@app.on_event("shutdown")
+async def shutdown_logging_listener():
+    shutdown_logging()
 
 @app.get("/")
 async def root():
@@ -3,6 +3,7 @@ import { View, Text, StyleSheet, ScrollView, RefreshControl, TouchableOpacity, A
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { COLORS } from '../../theme/colors';
 import client from '../../api/client';
+import { subscribeToBudgetAlerts } from '../../utils/notifications';
 import { useStore } from '../../store/useStore';
 import { useFocusEffect } from '@react-navigation/native';
 import { TrendingUp, ArrowUpRight, ArrowDownLeft, ShoppingBag, Coffee, Car, Utensils, Trash2, Edit2, ChevronDown, ChevronRight, PieChart, AlertTriangle, Sun, Sunrise, MoonStar, Users } from 'lucide-react-native';
@@ -15,10 +16,19 @@ if (Platform.OS === 'android' && UIManager.setLayoutAnimationEnabledExperimental
 
 const Dashboard = ({ navigation }: { navigation: any }) => {
     const swipeableRefs = React.useRef<{ [key: string]: any }>({});
-    const { expenses, setExpenses, removeExpense, user, budgets, setBudgets } = useStore();
+    const { expenses, setExpenses, removeExpense, user, budgets, setBudgets, token } = useStore();
     const [summary, setSummary] = useState({ total_spent: 0 });
     const [refreshing, setRefreshing] = useState(false);
 
+    // Budget progress and alerts are pushed by the server instead of re-polled
+    useEffect(() => {
+        if (!token) return;
+        return subscribeToBudgetAlerts(client.defaults.baseURL!, token, (event) => {
+            const current = useStore.getState().budgets;
+            setBudgets(current.map(b => b.id === event.budget_id ? { ...b, current_spent: event.current_spent } : b));
+        });
+    }, [token]);
+
     const fetchData = async () => {
         try {
             const [summaryRes, expensesRes, budgetsRes] = await Promise.all([
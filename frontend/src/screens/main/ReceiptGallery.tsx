@@ -1,31 +1,75 @@
-import React, { useState } from 'react';
-import { View, Text, StyleSheet, FlatList, Image, TouchableOpacity, Modal, Dimensions } from 'react-native';
+import React, { useCallback, useEffect, useState } from 'react';
+import { View, Text, StyleSheet, FlatList, Image, TouchableOpacity, Modal, Dimensions, ActivityIndicator } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useStore } from '../../store/useStore';
+import client from '../../api/client';
 import { COLORS } from '../../theme/colors';
 import { X, Receipt, Search, ZoomIn } from 'lucide-react-native';
 import { format } from 'date-fns';
 
 const { width } = Dimensions.get('window');
 // Removing grid constants since we are moving to a list
-import { FileText, ChevronRight } from 'lucide-react-native';
+import { ChevronRight } from 'lucide-react-native';
+
+const PAGE_SIZE = 30;
+
+interface ReceiptItem {
+    id: string;
+    vendor?: string;
+    date: string;
+    amount: number;
+    currency: string;
+    thumb_url: string;
+    medium_url: string;
+    full_url: string;
+}
 
 const ReceiptGallery = () => {
-    const { expenses } = useStore();
+    const { token } = useStore();
+    const [receipts, setReceipts] = useState<ReceiptItem[]>([]);
+    const [total, setTotal] = useState(0);
+    const [page, setPage] = useState(1);
+    const [loading, setLoading] = useState(false);
     const [selectedImage, setSelectedImage] = useState<string | null>(null);
 
-    // Filter expenses that have receipts
-    const receiptExpenses = expenses.filter(e => e.receipt_image_base64);
+    // Receipt images are served as small cached derivatives instead of inline base64
+    const imageSource = (path: string) => ({
+        uri: `${client.defaults.baseURL}${path}`,
+        headers: { Authorization: `Bearer ${token}` },
+    });
+
+    const fetchPage = useCallback(async (nextPage: number) => {
+        if (loading) return;
+        setLoading(true);
+        try {
+            const res = await client.get('/receipts/', { params: { page: nextPage, page_size: PAGE_SIZE } });
+            setReceipts(prev => nextPage === 1 ? res.data.items : [...prev, ...res.data.items]);
+            setTotal(res.data.total);
+            setPage(nextPage);
+        } catch (error) {
+            console.error('Failed to fetch receipts', error);
+        } finally {
+            setLoading(false);
+        }
+    }, [loading]);
+
+    useEffect(() => {
+        fetchPage(1);
+    }, []);
+
+    const loadMore = () => {
+        if (receipts.length < total) fetchPage(page + 1);
+    };
 
     const renderItem = ({ item }: { item: any }) => (
         <TouchableOpacity
             style={styles.transactionItem}
-            onPress={() => setSelectedImage(item.receipt_image_base64)}
+            onPress={() => setSelectedImage(item.medium_url)}
             activeOpacity={0.7}
         >
             <View style={styles.itemLeft}>
                 <View style={styles.iconContainer}>
-                    <FileText color={COLORS.primary} size={20} />
+                    <Image source={imageSource(item.thumb_url)} style={styles.thumbnail} />
                 </View>
                 <View style={styles.txInfo}>
                     <Text style={styles.txVendor}>{item.vendor || 'Unknown Vendor'}</Text>
@@ -44,21 +88,24 @@ const ReceiptGallery = () => {
             <View style={styles.header}>
                 <View>
                     <Text style={styles.title}>RECEIPT GALLERY</Text>
-                    <Text style={styles.subtitle}>{receiptExpenses.length} SCANNED RECEIPTS</Text>
+                    <Text style={styles.subtitle}>{total} SCANNED RECEIPTS</Text>
                 </View>
                 <TouchableOpacity style={styles.iconButton}>
                     <Search color={COLORS.text} size={20} />
                 </TouchableOpacity>
             </View>
 
-            {receiptExpenses.length > 0 ? (
+            {receipts.length > 0 ? (
                 <FlatList
-                    data={receiptExpenses}
+                    data={receipts}
                     renderItem={renderItem}
                     keyExtractor={(item) => item.id}
                     numColumns={1}
                     contentContainerStyle={styles.listContent}
                     showsVerticalScrollIndicator={false}
+                    onEndReached={loadMore}
+                    onEndReachedThreshold={0.5}
+                    ListFooterComponent={loading ? <ActivityIndicator color={COLORS.primary} style={{ marginVertical: 20 }} /> : null}
                 />
             ) : (
                 <View style={styles.emptyContainer}>
@@ -78,7 +125,7 @@ const ReceiptGallery = () => {
                     </TouchableOpacity>
                     {selectedImage && (
                         <Image
-                            source={{ uri: `data:image/jpeg;base64,${selectedImage}` }}
+                            source={imageSource(selectedImage)}
                             style={styles.fullImage}
                             resizeMode="contain"
                         />
@@ -151,6 +198,11 @@ const styles = StyleSheet.create({
         alignItems: 'center',
         borderWidth: 1,
         borderColor: '#111',
+        overflow: 'hidden',
+    },
+    thumbnail: {
+        width: 44,
+        height: 44,
     },
     txInfo: {
         gap: 4,
@@ -60,3 +60,58 @@ export async function sendLocalNotification(title: string, body: string) {
     });
     console.log('Notification scheduled!');
 }
+
+type BudgetEvent = {
+    type: 'budget_update' | 'budget_threshold';
+    budget_id: string;
+    category: string;
+    monthly_limit: number;
+    current_spent: number;
+    threshold?: number;
+};
+
+// Listens to the server's budget event stream (SSE over XHR, since React Native has no EventSource)
+export function subscribeToBudgetAlerts(baseURL: string, token: string, onEvent: (event: BudgetEvent) => void) {
+    let xhr: XMLHttpRequest | null = null;
+    let retryTimer: ReturnType<typeof setTimeout> | null = null;
+    let closed = false;
+
+    const connect = () => {
+        let offset = 0;
+        let buffer = '';
+        xhr = new XMLHttpRequest();
+        xhr.open('GET', `${baseURL}/budgets/stream`);
+        xhr.setRequestHeader('Authorization', `Bearer ${token}`);
+        xhr.setRequestHeader('Accept', 'text/event-stream');
+        xhr.onprogress = () => {
+            if (!xhr) return;
+            buffer += xhr.responseText.slice(offset);
+            offset = xhr.responseText.length;
+            const chunks = buffer.split('\n\n');
+            buffer = chunks.pop() || '';
+            for (const chunk of chunks) {
+                const data = chunk.split('\n').find(line => line.startsWith('data: '));
+                if (!data) continue;
+                const event: BudgetEvent = JSON.parse(data.slice(6));
+                if (event.type === 'budget_threshold') {
+                    sendLocalNotification(
+                        event.threshold! >= 100 ? 'Budget exceeded' : 'Budget alert',
+                        `${event.category}: ₹${event.current_spent.toLocaleString()} of ₹${event.monthly_limit.toLocaleString()} (${event.threshold}%)`
+                    );
+                }
+                onEvent(event);
+            }
+        };
+        xhr.onloadend = () => {
+            if (!closed) retryTimer = setTimeout(connect, 5000);
+        };
+        xhr.send();
+    };
+
+    connect();
+    return () => {
+        closed = true;
+        if (retryTimer) clearTimeout(retryTimer);
+        xhr?.abort();
+    };
+}